@@ -1,27 +1,55 @@
-import os
-from flask import Flask, jsonify, request, g
+from flask import Flask, Request, jsonify, request, g
 from flask_cors import CORS
-import jwt
-from .config import PORT, MAX_CONTENT_LENGTH_MB
-from .db import engine
-from .models import Base
+from .config import (
+    PORT, MAX_CONTENT_LENGTH_MB, METRICS_ENABLED, AUTO_MIGRATE, JSON_ENCODER,
+    CORS_ORIGINS, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS,
+)
+from .db import engine, replica_engine
 from .controllers import register_controllers
-from .bootstrap import ensure_indexes, ensure_schema, ensure_extensions
+from .commands import register_commands
+from .migrations import check_schema
+from .services.metrics import install_metrics
+from .services.json_provider import json_provider_class
+from .services.auth_tokens import auth_required as _auth_required, user_id_from_authorization
+
+class AppRequest(Request):
+    """
+    A route may raise the body limit before it reads the body
+    (``request.max_content_length = ...``); Flask 3.1 has this built in.
+    """
+    _max_content_length: int | None = None
+
+    @property
+    def max_content_length(self) -> int | None:
+        if self._max_content_length is not None:
+            return self._max_content_length
+        return super().max_content_length
+
+    @max_content_length.setter
+    def max_content_length(self, value: int | None) -> None:
+        self._max_content_length = value
+
 
 def create_app():
     app = Flask(__name__)
+    app.request_class = AppRequest
+    app.json = json_provider_class(JSON_ENCODER)(app)
     CORS(
         app,
-        resources={r"/api/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173", "https://dataroom-mvp.vercel.app"]}},
+        resources={r"/api/*": {"origins": CORS_ORIGINS}},
         supports_credentials=False,
-        allow_headers=["Content-Type", "Authorization"],
+        allow_headers=CORS_ALLOW_HEADERS,
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        expose_headers=["Content-Disposition"],
+        expose_headers=CORS_EXPOSE_HEADERS,
     )
+    # también corta cuerpos chunked (sin Content-Length); el batch sube su propio tope
     app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH_MB * 1024 * 1024
 
-    secret = os.getenv("SECRET_KEY", "dev-secret")
-    auth_required = os.getenv("AUTH_REQUIRED", "true").lower() == "true"
+    if METRICS_ENABLED:
+        # primero: también cronometra las respuestas que corta el auth
+        install_metrics(app, {"primary": engine, "replica": replica_engine})
+
+    auth_required = _auth_required()
 
     @app.before_request
     def _auth():
@@ -32,30 +60,24 @@ def create_app():
             return
         if p.startswith("/api/auth/"):
             return
-        if p == "/" or p.startswith("/static/"):
+        if p == "/" or p == "/metrics" or p.startswith("/static/"):
             return
-        h = request.headers.get("Authorization", "")
-        if not h.startswith("Bearer "):
-            return jsonify({"error": "unauthorized"}), 401
-        token = h.split(" ", 1)[1].strip()
-        try:
-            data = jwt.decode(token, secret, algorithms=["HS256"])
-            g.user_id = int(data["sub"])
-        except Exception:
+        uid = user_id_from_authorization(request.headers.get("Authorization"))
+        if uid is None:
             return jsonify({"error": "unauthorized"}), 401
+        g.user_id = uid
 
     @app.route("/")
     def index():
         return jsonify({"status": "ok", "message": "Backend running"})
 
     register_controllers(app)
+    register_commands(app)
     return app
 
 app = create_app()
-Base.metadata.create_all(bind=engine)
-ensure_extensions(engine)
-ensure_schema(engine)
-ensure_indexes(engine)
+# sin DDL al importar: sólo comprobamos la versión (flask db-upgrade migra)
+check_schema(engine, AUTO_MIGRATE)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=PORT, debug=True)
@@ -0,0 +1,275 @@
+# backend/asgi.py
+"""
+ASGI entry point for slow-client traffic: ``uvicorn backend.asgi:app``.
+
+PDF downloads (GET /api/files/<id>/stream) and single uploads
+(POST /api/folders/<id>/files) run on the event loop, so a reviewer on a
+slow link costs an open socket and a coroutine, not a sync worker for the
+whole transfer. Authorization, ownership, Range/conditional handling and
+blob storage are the same functions the Flask routes use. Blocking steps
+(one DB lookup, one chunk read or write) run on a bounded thread pool
+only for the duration of that step.
+
+Every other path goes to the Flask app through a2wsgi (optional
+dependency). Without a2wsgi this app serves only the two streaming routes
+and a proxy routes everything else to gunicorn.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .app import app as flask_app
+from .config import (
+    MAX_CONTENT_LENGTH_MB, ASGI_IO_THREADS, ASGI_CHUNK_SIZE, CORS_ORIGINS, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS,
+)
+from .db import session, read_session
+from .services.access import owned_file, owned_folder
+from .services.auth_tokens import user_id_from_authorization
+from .services.blobs import blob_writer, is_blob
+from .services.file_serving import plan_pdf, read_ranges
+from .services.metrics import REQUEST_SECONDS
+from .services.multipart import MultipartDecoder, MultipartError, boundary_of, disposition
+from .services.storage import NotPdfError, StagedPdf
+from .services.uploads import create_uploaded_file
+
+log = logging.getLogger(__name__)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self.t0 = time.perf_counter()
+        self.route = None
+
+    def header(self, name: str) -> str | None:
+        return self.headers.get(name.lower())
+
+
+def _cors(req: Request) -> dict:
+    origin = req.header("Origin")
+    if not origin or origin not in CORS_ORIGINS:
+        return {}
+    return {
+        "Access-Control-Allow-Origin": origin,
+        "Access-Control-Expose-Headers": ", ".join(CORS_EXPOSE_HEADERS),
+        "Vary": "Origin",
+    }
+
+
+def _wsgi_fallback():
+    try:
+        from a2wsgi import WSGIMiddleware  # dependencia opcional
+    except ImportError:
+        log.warning("a2wsgi not installed: backend.asgi serves only the streaming routes")
+        return None
+    return WSGIMiddleware(flask_app)
+
+
+class StreamingApp:
+    def __init__(self, fallback=None, threads: int = ASGI_IO_THREADS):
+        self.fallback = fallback
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi-io")
+        # (método, patrón, plantilla como la de Flask para las métricas, handler)
+        self.routes = [
+            ("GET", re.compile(r"^/api/files/(\d+)/stream$"), "/api/files/<int:fid>/stream", self.stream_file),
+            ("POST", re.compile(r"^/api/folders/(\d+)/files$"), "/api/folders/<int:fid>/files", self.upload),
+        ]
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        for method, pattern, template, handler in self.routes:
+            m = pattern.match(scope["path"])
+            if m and scope["method"] in (method, "OPTIONS"):
+                req = Request(scope)
+                req.route = template
+                try:
+                    if req.method == "OPTIONS":
+                        return await self._preflight(req, send, method)
+                    uid = user_id_from_authorization(req.header("Authorization"))
+                    if uid is None:
+                        raise HttpError(401, "unauthorized")
+                    return await handler(req, receive, send, int(m.group(1)), uid)
+                except HttpError as e:
+                    return await self._json(req, send, e.status, {"error": e.message})
+        if self.fallback is not None:
+            return await self.fallback(scope, receive, send)
+        await self._json(Request(scope), send, 404, {"error": "not found"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                self.pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ---- respuestas ----
+
+    async def _start(self, req: Request, send, status: int, headers: dict) -> None:
+        if req.route:
+            REQUEST_SECONDS.observe(time.perf_counter() - req.t0, req.method, req.route, str(status))
+        headers = {**headers, **_cors(req)}
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in headers.items()],
+        })
+
+    async def _json(self, req: Request, send, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        await self._start(req, send, status, {"Content-Type": "application/json", "Content-Length": len(body)})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _preflight(self, req: Request, send, method: str) -> None:
+        headers = {"Content-Length": 0}
+        if _cors(req):
+            headers["Access-Control-Allow-Methods"] = f"{method}, OPTIONS"
+            headers["Access-Control-Allow-Headers"] = ", ".join(CORS_ALLOW_HEADERS)
+        await self._start(req, send, 200, headers)
+        await send({"type": "http.response.body", "body": b""})
+
+    # ---- GET /api/files/<id>/stream ----
+
+    @staticmethod
+    def _plan_stream(fid: int, uid: int, header):
+        with read_session(replica=False) as db:
+            acc = owned_file(db, fid, uid)
+            if not acc:
+                raise HttpError(404, "not found")
+            f = acc.file
+            disk_path, checksum, name, immutable = acc.disk_path, f.checksum_sha256, f.name, is_blob(f.stored_name)
+        # la sesión ya se cerró: la transferencia no retiene conexiones del pool
+        if not os.path.exists(disk_path):
+            raise HttpError(410, "file missing on disk")
+        return disk_path, plan_pdf(disk_path, checksum, name, immutable, header)
+
+    async def stream_file(self, req: Request, receive, send, fid: int, uid: int):
+        disk_path, plan = await self.run(self._plan_stream, fid, uid, req.header)
+        await self._start(req, send, plan.status, plan.headers)
+        if plan.parts is None:
+            return await send({"type": "http.response.body", "body": b""})
+
+        disconnected = asyncio.Event()
+
+        async def watch():
+            # el cuerpo del GET ya llegó: lo próximo que entrega receive() es la desconexión
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch())
+        chunks = read_ranges(disk_path, plan.parts, "stream_read", ASGI_CHUNK_SIZE)
+        try:
+            while not disconnected.is_set():
+                chunk = await self.run(next, chunks, None)
+                if chunk is None:
+                    break
+                # send() espera a que el socket drene: un cliente lento frena la lectura
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+            await self.run(chunks.close)
+
+    # ---- POST /api/folders/<id>/files ----
+
+    @staticmethod
+    def _folder_exists(fid: int, uid: int) -> bool:
+        with read_session(replica=False) as db:
+            return owned_folder(db, fid, uid) is not None
+
+    @staticmethod
+    def _register(fid: int, uid: int, filename: str, staged: StagedPdf) -> dict:
+        with session() as db:
+            acc = owned_folder(db, fid, uid)
+            if not acc:
+                # carpeta borrada durante la subida: los bytes nunca entran al blob store
+                staged.discard()
+                raise HttpError(404, "folder not found")
+            return create_uploaded_file(db, acc.folder, uid, filename, staged)
+
+    async def upload(self, req: Request, receive, send, fid: int, uid: int):
+        limit = MAX_CONTENT_LENGTH_MB * 1024 * 1024
+        length = req.header("Content-Length")
+        if length and length.isdigit() and int(length) > limit:
+            raise HttpError(413, "file too large")
+        boundary = boundary_of(req.header("Content-Type"))
+        if boundary is None:
+            raise HttpError(400, "file is required")
+        if not await self.run(self._folder_exists, fid, uid):
+            raise HttpError(404, "folder not found")
+
+        decoder = MultipartDecoder(boundary)
+        writer, filename, staged = None, None, None
+        received = 0
+        complete = False
+        try:
+            while True:
+                msg = await receive()
+                if msg["type"] == "http.disconnect":
+                    return
+                body = msg.get("body", b"")
+                received += len(body)
+                if received > limit:
+                    raise HttpError(413, "file too large")
+                data = []
+                for event, value in decoder.feed(body):
+                    if event == "part":
+                        name, fname = disposition(value)
+                        if name == "file" and filename is None:
+                            if not fname or not fname.lower().endswith(".pdf"):
+                                raise HttpError(400, "only pdf allowed")
+                            filename = fname
+                            writer = await self.run(blob_writer)
+                    elif event == "data" and writer is not None:
+                        data.append(value)
+                    elif event == "end" and writer is not None:
+                        await self.run(writer.write, b"".join(data))
+                        data = []
+                        # una sola pasada: escribe, hashea, mide y valida %PDF (como el upload WSGI)
+                        staged = await self.run(writer.finish)
+                        writer = None
+                if data and writer is not None:
+                    await self.run(writer.write, b"".join(data))
+                if not msg.get("more_body"):
+                    break
+            complete = True
+        except NotPdfError:
+            raise HttpError(400, "only pdf allowed") from None
+        except MultipartError as e:
+            raise HttpError(400, str(e)) from None
+        finally:
+            if writer is not None:
+                await self.run(writer.abort)
+            if staged is not None and not complete:
+                # cuerpo cortado o inválido después del archivo: los bytes nunca entran al blob store
+                await self.run(staged.discard)
+        if staged is None:
+            raise HttpError(400, "file is required")
+
+        result = await self.run(self._register, fid, uid, filename, staged)
+        await self._json(req, send, 201, result)
+
+
+app = StreamingApp(fallback=_wsgi_fallback())
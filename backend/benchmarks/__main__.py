@@ -0,0 +1,164 @@
+# backend/benchmarks/__main__.py
+"""
+python -m backend.benchmarks run [options]       build a corpus, run scenarios, write JSON
+python -m backend.benchmarks compare OLD NEW     diff two result files
+
+In-process runs import the app after setting DATABASE_URL (default: a
+throwaway SQLite file) and UPLOAD_DIR, so the same command benchmarks
+Postgres with --database-url postgresql+psycopg://... . --url targets a
+running server instead (its extraction worker must be running for content
+search to return hits).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from .corpus import CorpusBuilder, CorpusSpec
+from .runner import SCENARIOS, run_scenario, summarize, compare
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _in_process_driver(args):
+    tmp = tempfile.mkdtemp(prefix="dataroom-bench-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite+pysqlite:///{tmp}/bench.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 32)
+    os.environ["AUTH_REQUIRED"] = "true"
+    os.environ["SEARCH_CACHE_SIZE"] = str(args.search_cache_size)
+    # base de datos del benchmark: la migramos al arrancar
+    os.environ["AUTO_MIGRATE"] = "true"
+    # la app lee la configuración al importarse
+    from ..app import app
+    from .drivers import InProcessDriver
+
+    return InProcessDriver(app), os.environ["DATABASE_URL"].split(":", 1)[0]
+
+
+def _wait_for_extraction(driver, corpus, in_process: bool, timeout: float) -> None:
+    if in_process:
+        from ..services.extraction import run_worker
+
+        run_worker(once=True)
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = driver.json("GET", f"/api/files/{corpus.files[-1]}").get("text_status")
+        if status != "pending":
+            return
+        time.sleep(1)
+    print("warning: extraction still pending; content search will have fewer hits", file=sys.stderr)
+
+
+def cmd_run(args) -> int:
+    if args.url:
+        from .drivers import HttpDriver
+
+        driver, database = HttpDriver(args.url), "remote"
+    else:
+        driver, database = _in_process_driver(args)
+    driver.login()
+
+    spec = CorpusSpec(args.rooms, args.depth, args.fanout, args.files, args.pages, args.words, args.seed)
+    t0 = time.perf_counter()
+    corpus = CorpusBuilder(spec).build(driver)
+    build_seconds = time.perf_counter() - t0
+    _wait_for_extraction(driver, corpus, not args.url, args.extraction_timeout)
+    print(f"corpus: {len(corpus.rooms)} rooms, {len(corpus.folders)} folders, "
+          f"{len(corpus.files)} files in {build_seconds:.1f}s", file=sys.stderr)
+
+    endpoints = {}
+    for name in args.scenarios:
+        if args.warmup:
+            run_scenario(name, driver, corpus, spec, args.warmup, args.concurrency, args.seed + 1)
+        samples, wall = run_scenario(name, driver, corpus, spec, args.iterations, args.concurrency, args.seed)
+        stats = summarize(samples, wall)
+        endpoints.update(stats)
+        for endpoint, s in stats.items():
+            print(f"{endpoint:28} {s['throughput_rps']:>9} req/s  p50 {s['p50_ms']:>8}ms  "
+                  f"p95 {s['p95_ms']:>8}ms  p99 {s['p99_ms']:>8}ms  errors {s['errors']}", file=sys.stderr)
+
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "target": args.url or "in-process",
+            "database": database,
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "search_cache_size": None if args.url else args.search_cache_size,
+        },
+        "corpus": {
+            **spec.__dict__,
+            "folder_count": len(corpus.folders),
+            "file_count": len(corpus.files),
+            "bytes": corpus.bytes,
+            "build_seconds": round(build_seconds, 3),
+        },
+        "endpoints": endpoints,
+    }
+    text = json.dumps(result, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+        print(f"results written to {args.out}", file=sys.stderr)
+    return 1 if any(s["errors"] for s in endpoints.values()) else 0
+
+
+def cmd_compare(args) -> int:
+    with open(args.old) as a, open(args.new) as b:
+        print(compare(json.load(a), json.load(b)))
+    return 0
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="python -m backend.benchmarks")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="build a synthetic corpus and benchmark the API")
+    target = r.add_mutually_exclusive_group()
+    target.add_argument("--url", help="benchmark a running server (e.g. http://localhost:5001)")
+    target.add_argument("--database-url", help="in-process: DATABASE_URL to use (default temporary SQLite)")
+    r.add_argument("--rooms", type=int, default=2)
+    r.add_argument("--depth", type=int, default=3, help="folder levels below each room root")
+    r.add_argument("--fanout", type=int, default=3, help="subfolders per folder")
+    r.add_argument("--files", type=int, default=5, help="files per folder")
+    r.add_argument("--pages", type=int, default=3, help="pages per PDF")
+    r.add_argument("--words", type=int, default=40, help="words per page")
+    r.add_argument("--iterations", type=int, default=200, help="actions per scenario")
+    r.add_argument("--warmup", type=int, default=10, help="unrecorded actions per scenario")
+    r.add_argument("--concurrency", type=int, default=1, help="client threads")
+    r.add_argument("--seed", type=int, default=1)
+    r.add_argument("--search-cache-size", type=int, default=0,
+                   help="in-process SEARCH_CACHE_SIZE (default 0: measure the queries themselves)")
+    r.add_argument("--extraction-timeout", type=float, default=300.0)
+    r.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    r.add_argument("--out", default="benchmark-results.json", help="JSON output path ('-' for stdout)")
+    r.set_defaults(func=cmd_run)
+
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("old")
+    c.add_argument("new")
+    c.set_defaults(func=cmd_compare)
+
+    args = p.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# backend/benchmarks/corpus.py
+"""
+Deterministic synthetic corpus: minimal multi-page PDFs with searchable
+text and room/folder trees of configurable shape.
+"""
+import random
+from dataclasses import dataclass, field
+
+# vocabulario fijo: las consultas del benchmark salen de aquí y siempre tienen resultados
+VOCABULARY = (
+    "agreement audit balance capital closing contract diligence escrow equity "
+    "finance guarantee indemnity invoice lease license merger pledge report "
+    "revenue schedule security share statement tax transfer valuation warrant"
+).split()
+
+
+def make_pdf(pages: list[str]) -> bytes:
+    """A valid PDF with one Helvetica text line per page."""
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + i * 2} 0 R" for i in range(len(pages)))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font = 3 + len(pages) * 2
+    for i, text in enumerate(pages):
+        safe = text.replace("\\", "").replace("(", "").replace(")", "")
+        stream = f"BT /F1 10 Tf 40 760 Td ({safe}) Tj ET"
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + i * 2} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objs.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+@dataclass
+class CorpusSpec:
+    rooms: int = 2
+    depth: int = 3  # niveles bajo la raíz
+    fanout: int = 3  # subcarpetas por carpeta
+    files: int = 5  # archivos por carpeta
+    pages: int = 3  # páginas por PDF
+    words: int = 40  # palabras por página
+    seed: int = 1
+
+
+@dataclass
+class Corpus:
+    rooms: list[int] = field(default_factory=list)
+    folders: list[int] = field(default_factory=list)
+    files: list[int] = field(default_factory=list)
+    bytes: int = 0
+
+
+class CorpusBuilder:
+    def __init__(self, spec: CorpusSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+    def pdf(self) -> bytes:
+        return make_pdf(
+            [" ".join(self.rng.choices(VOCABULARY, k=self.spec.words)) for _ in range(self.spec.pages)]
+        )
+
+    def build(self, driver) -> Corpus:
+        """Create rooms, folder trees and files through the API (batch uploads)."""
+        corpus = Corpus()
+        for r in range(self.spec.rooms):
+            room = driver.json("POST", "/api/datarooms", {"name": f"bench-room-{r}"})
+            corpus.rooms.append(room["id"])
+            level = [room["root_folder_id"]]
+            corpus.folders.append(room["root_folder_id"])
+            for depth in range(self.spec.depth):
+                nxt = []
+                for parent in level:
+                    for i in range(self.spec.fanout):
+                        f = driver.json(
+                            "POST", f"/api/datarooms/{room['id']}/folders",
+                            {"name": f"d{depth}-{i}", "parent_id": parent},
+                        )
+                        nxt.append(f["id"])
+                level = nxt
+                corpus.folders.extend(nxt)
+        for folder_id in corpus.folders:
+            parts = [(f"doc-{n}.pdf", self.pdf()) for n in range(self.spec.files)]
+            corpus.bytes += sum(len(b) for _, b in parts)
+            res = driver.upload(f"/api/folders/{folder_id}/files/batch", "files", parts)
+            corpus.files.extend(item["id"] for item in res["items"] if "id" in item)
+        return corpus
@@ -0,0 +1,105 @@
+# backend/benchmarks/drivers.py
+"""
+Two ways to hit the API with the same calls:
+
+    InProcessDriver   Flask test client (no network; DATABASE_URL picks SQLite/Postgres)
+    HttpDriver        http.client keep-alive connection to a running server
+
+Drivers are cheap to ``clone()``: each benchmark thread gets its own.
+"""
+import json
+import uuid
+import http.client
+from urllib.parse import urlsplit
+
+
+def encode_multipart(field: str, parts: list[tuple[str, bytes]]) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for filename, data in parts:
+        body += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode()
+        body += data + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+class Driver:
+    token: str | None = None
+
+    def request(self, method: str, path: str, body: bytes | None = None,
+                headers: dict | None = None) -> tuple[int, bytes]:
+        raise NotImplementedError
+
+    def clone(self) -> "Driver":
+        raise NotImplementedError
+
+    def _headers(self, extra: dict | None = None) -> dict:
+        h = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        h.update(extra or {})
+        return h
+
+    def json(self, method: str, path: str, payload=None, expect=(200, 201)):
+        body = json.dumps(payload).encode() if payload is not None else None
+        status, data = self.request(method, path, body, {"Content-Type": "application/json"} if body else None)
+        if status not in expect:
+            raise RuntimeError(f"{method} {path} -> {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def upload(self, path: str, field: str, parts: list[tuple[str, bytes]]):
+        body, ctype = encode_multipart(field, parts)
+        status, data = self.request("POST", path, body, {"Content-Type": ctype})
+        if status != 201:
+            raise RuntimeError(f"POST {path} -> {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def login(self) -> None:
+        """Register a throwaway user and keep its token."""
+        creds = {"email": f"bench-{uuid.uuid4().hex[:12]}@example.com", "password": uuid.uuid4().hex}
+        self.json("POST", "/api/auth/register", creds)
+        self.token = self.json("POST", "/api/auth/login", creds)["access_token"]
+
+
+class InProcessDriver(Driver):
+    def __init__(self, app, token: str | None = None):
+        self.app = app
+        self.client = app.test_client()
+        self.token = token
+
+    def request(self, method, path, body=None, headers=None):
+        resp = self.client.open(path, method=method, data=body, headers=self._headers(headers))
+        # consumimos el cuerpo (streams incluidos) como haría un cliente real
+        data = resp.get_data()
+        resp.close()
+        return resp.status_code, data
+
+    def clone(self):
+        return InProcessDriver(self.app, self.token)
+
+
+class HttpDriver(Driver):
+    def __init__(self, base_url: str, token: str | None = None, timeout: float = 60.0):
+        self.base_url = base_url
+        u = urlsplit(base_url)
+        cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+        self.conn = cls(u.hostname, u.port, timeout=timeout)
+        self.prefix = u.path.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, headers=None):
+        try:
+            self.conn.request(method, self.prefix + path, body=body, headers=self._headers(headers))
+            resp = self.conn.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            # conexión keep-alive cerrada por el servidor: reintento único
+            self.conn.close()
+            self.conn.request(method, self.prefix + path, body=body, headers=self._headers(headers))
+            resp = self.conn.getresponse()
+        return resp.status, resp.read()
+
+    def clone(self):
+        return HttpDriver(self.base_url, self.token, self.timeout)
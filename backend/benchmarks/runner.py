@@ -0,0 +1,176 @@
+# backend/benchmarks/runner.py
+"""
+Scenarios and measurement.
+
+Each scenario performs one logical user action (which may be several
+requests, e.g. paging through a folder) and returns one sample per
+request. Samples are aggregated per endpoint into throughput and
+latency percentiles.
+"""
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .corpus import VOCABULARY, CorpusBuilder
+
+
+def timed(driver, samples: list, endpoint: str, method: str, path: str, body=None, headers=None):
+    t0 = time.perf_counter()
+    status, data = driver.request(method, path, body, headers)
+    samples.append((endpoint, time.perf_counter() - t0, status < 400))
+    return status, data
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+# ---- escenarios: fn(driver, rng, corpus, spec, samples) ----
+
+def children(driver, rng, corpus, spec, samples):
+    fid = rng.choice(corpus.folders)
+    per_page = max(1, spec.files // 2)
+    cursor = ""
+    # tope de páginas: un cursor que no avanza no debe colgar el benchmark
+    for _ in range(spec.files // per_page + 2):
+        status, data = timed(
+            driver, samples, "children", "GET",
+            f"/api/folders/{fid}/children?limit_folders={per_page}&limit_files={per_page}"
+            + (f"&cursor_files={cursor}" if cursor else ""),
+        )
+        cursor = json.loads(data).get("next_cursor_files") if status == 200 else None
+        if not cursor:
+            return
+    samples.append(("children", None, False))  # paginación sin fin: error sin latencia
+
+
+def list_pages(driver, rng, corpus, spec, samples):
+    # páginas grandes (hasta 200 filas): el costo por fila pesa más que el de la consulta
+    for endpoint, path, keys in (
+        ("children_page", f"/api/folders/{rng.choice(corpus.folders)}/children?limit_folders=200&limit_files=200",
+         ("folders", "files")),
+        ("datarooms_page", "/api/datarooms?limit=200", ("items",)),
+    ):
+        t0 = time.perf_counter()
+        status, data = driver.request("GET", path)
+        secs = time.perf_counter() - t0
+        rows = sum(len(json.loads(data)[k]) for k in keys) if status == 200 else 0
+        samples.append((endpoint, secs, status < 400, rows))
+
+
+def search_meta(driver, rng, corpus, spec, samples):
+    status, data = timed(driver, samples, "search_meta", "GET",
+                         f"/api/search/meta?name=doc-{rng.randrange(spec.files)}&limit=20")
+    cursor = json.loads(data).get("next_cursor") if status == 200 else None
+    if cursor:
+        timed(driver, samples, "search_meta", "GET",
+              f"/api/search/meta?name=doc-{rng.randrange(spec.files)}&limit=20&cursor={cursor}")
+
+
+def _content(sort):
+    def run(driver, rng, corpus, spec, samples):
+        q = "+".join(rng.sample(VOCABULARY, rng.choice((1, 2))))
+        timed(driver, samples, f"search_content_{sort}", "GET",
+              f"/api/search/content?q={q}&limit=20&sort={sort}")
+    return run
+
+
+def stream_full(driver, rng, corpus, spec, samples):
+    timed(driver, samples, "stream_full", "GET", f"/api/files/{rng.choice(corpus.files)}/stream")
+
+
+def stream_range(driver, rng, corpus, spec, samples):
+    timed(driver, samples, "stream_range", "GET", f"/api/files/{rng.choice(corpus.files)}/stream",
+          headers={"Range": "bytes=0-1023"})
+
+
+def upload(driver, rng, corpus, spec, samples):
+    from .drivers import encode_multipart
+
+    body, ctype = encode_multipart("file", [(f"up-{rng.randrange(10**9)}.pdf", CorpusBuilder(spec).pdf())])
+    timed(driver, samples, "upload", "POST", f"/api/folders/{rng.choice(corpus.folders)}/files",
+          body, {"Content-Type": ctype})
+
+
+# upload al final: invalida la caché de búsqueda del usuario
+SCENARIOS = {
+    "children": children,
+    "list_pages": list_pages,
+    "search_meta": search_meta,
+    "search_content_created": _content("created"),
+    "search_content_relevance": _content("relevance"),
+    "stream_full": stream_full,
+    "stream_range": stream_range,
+    "upload": upload,
+}
+
+
+def run_scenario(name, driver, corpus, spec, iterations: int, concurrency: int, seed: int) -> tuple[list, float]:
+    fn = SCENARIOS[name]
+    samples: list = []
+    lock = threading.Lock()
+    counter = iter(range(iterations))
+
+    def worker(n):
+        d = driver.clone()
+        rng = random.Random(seed * 1000 + n)
+        local: list = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            fn(d, rng, corpus, spec, local)
+        return local
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for local in pool.map(worker, range(concurrency)):
+            samples.extend(local)
+    return samples, time.perf_counter() - t0
+
+
+def summarize(samples: list, wall: float) -> dict:
+    by_endpoint: dict[str, list] = {}
+    for endpoint, secs, ok, *rest in samples:
+        # cuarto campo opcional: filas devueltas
+        by_endpoint.setdefault(endpoint, []).append((secs, ok, rest[0] if rest else 0))
+    out = {}
+    for endpoint, rows in by_endpoint.items():
+        lat = sorted(s for s, _, _ in rows if s is not None) or [0.0]
+        returned = sum(n for _, _, n in rows)
+        out[endpoint] = {
+            "count": len(rows),
+            "errors": sum(1 for _, ok, _ in rows if not ok),
+            "throughput_rps": round(len(rows) / wall, 2) if wall else None,
+            "mean_ms": round(1000 * sum(lat) / len(lat), 3),
+            "p50_ms": round(1000 * percentile(lat, 50), 3),
+            "p95_ms": round(1000 * percentile(lat, 95), 3),
+            "p99_ms": round(1000 * percentile(lat, 99), 3),
+            "max_ms": round(1000 * lat[-1], 3),
+        }
+        if returned:
+            out[endpoint]["rows"] = returned
+            out[endpoint]["us_per_row"] = round(1e6 * sum(lat) / returned, 3)
+    return out
+
+
+def compare(old: dict, new: dict) -> str:
+    """Text table of p50/p95/p99 and throughput changes between two result files."""
+    lines = [f"{'endpoint':28} {'metric':15} {'old':>10} {'new':>10} {'change':>8}"]
+    for endpoint, cur in new["endpoints"].items():
+        prev = old["endpoints"].get(endpoint)
+        if not prev:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "us_per_row"):
+            a, b = prev.get(metric), cur.get(metric)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            lines.append(f"{endpoint:28} {metric:15} {a:>10} {b:>10} {change:>8}")
+    return "\n".join(lines)
@@ -1,44 +1,103 @@
 # backend/bootstrap.py
-from sqlalchemy.engine import Engine
-from sqlalchemy import text
+"""
+Idempotent DDL steps used by the baseline migration (see migrations.py).
+Every function runs on the caller's connection/transaction.
+"""
+from sqlalchemy.engine import Connection
+from sqlalchemy import text, inspect
 
 
-def ensure_extensions(engine: Engine) -> None:
+def ensure_extensions(conn: Connection) -> None:
     """Enable useful Postgres extensions (no-op on other DBs)."""
-    if engine.dialect.name == "postgresql":
-        with engine.begin() as conn:
-            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 
-def ensure_schema(engine: Engine) -> None:
+def ensure_schema(conn: Connection) -> None:
     """
-    Online, idempotent schema tweaks (adds columns if missing).
-    Uses ALTER TABLE ... IF EXISTS/IF NOT EXISTS on Postgres.
-    On SQLite intentamos y si ya existe, ignoramos el error.
+    Add columns introduced after a table was first created.
+    Postgres uses ADD COLUMN IF NOT EXISTS; SQLite has no such clause, so
+    the existing columns are read first and only missing ones are added.
     """
-    if engine.dialect.name == "postgresql":
+    if conn.dialect.name == "postgresql":
         stmts = [
             "ALTER TABLE IF EXISTS users "
             "ADD COLUMN IF NOT EXISTS theme VARCHAR(10) NOT NULL DEFAULT 'light'",
+            # filas previas ya fueron extraídas en el request de upload
+            "ALTER TABLE IF EXISTS file_texts "
+            "ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'done'",
+            "ALTER TABLE IF EXISTS users "
+            "ADD COLUMN IF NOT EXISTS search_generation INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE IF EXISTS folders ADD COLUMN IF NOT EXISTS path VARCHAR(1024)",
+            "ALTER TABLE IF EXISTS folders ADD COLUMN IF NOT EXISTS files_direct INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE IF EXISTS folders ADD COLUMN IF NOT EXISTS bytes_direct BIGINT NOT NULL DEFAULT 0",
+            "ALTER TABLE IF EXISTS folders ADD COLUMN IF NOT EXISTS files_total INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE IF EXISTS folders ADD COLUMN IF NOT EXISTS bytes_total BIGINT NOT NULL DEFAULT 0",
+            "ALTER TABLE IF EXISTS folders ADD COLUMN IF NOT EXISTS last_modified_at TIMESTAMPTZ",
+            # tsvector persistido (lo mantiene Postgres); lo usan búsqueda y ranking
+            "ALTER TABLE IF EXISTS file_texts "
+            "ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content_plain, ''))) STORED",
+            "ALTER TABLE IF EXISTS file_page_texts "
+            "ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED",
         ]
+        for s in stmts:
+            conn.execute(text(s))
     else:
-        # SQLite: no soporta IF NOT EXISTS en ADD COLUMN; ignoramos error si ya existe.
-        stmts = [
-            "ALTER TABLE users ADD COLUMN theme VARCHAR(10) DEFAULT 'light'",
+        # SQLite: sin IF NOT EXISTS en ADD COLUMN; miramos qué columnas hay
+        columns = [
+            ("users", "theme", "VARCHAR(10) DEFAULT 'light'"),
+            ("file_texts", "status", "VARCHAR(16) NOT NULL DEFAULT 'done'"),
+            ("users", "search_generation", "INTEGER NOT NULL DEFAULT 0"),
+            ("folders", "path", "VARCHAR(1024)"),
+            ("folders", "files_direct", "INTEGER NOT NULL DEFAULT 0"),
+            ("folders", "bytes_direct", "BIGINT NOT NULL DEFAULT 0"),
+            ("folders", "files_total", "INTEGER NOT NULL DEFAULT 0"),
+            ("folders", "bytes_total", "BIGINT NOT NULL DEFAULT 0"),
+            ("folders", "last_modified_at", "DATETIME"),
         ]
+        insp = inspect(conn)
+        existing: dict[str, set[str]] = {}
+        for table, column, ddl in columns:
+            if table not in existing:
+                existing[table] = {c["name"] for c in insp.get_columns(table)}
+            if column not in existing[table]:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
 
-    with engine.begin() as conn:
-        for s in stmts:
-            try:
-                conn.execute(text(s))
-            except Exception:
-                # columna ya existe u otra condición inofensiva
-                pass
+    _backfill_folder_paths(conn)
+    _backfill_folder_stats(conn)
+
+
+def _backfill_folder_paths(conn: Connection) -> None:
+    """Fill folders.path for rows created before it existed, one tree level per UPDATE."""
+    conn.execute(text(
+        "UPDATE folders SET path = '/' || CAST(id AS VARCHAR) || '/' "
+        "WHERE path IS NULL AND parent_id IS NULL"
+    ))
+    while conn.execute(text(
+        "UPDATE folders SET path = "
+        "(SELECT p.path FROM folders p WHERE p.id = folders.parent_id) || CAST(id AS VARCHAR) || '/' "
+        "WHERE path IS NULL AND parent_id IN (SELECT id FROM folders WHERE path IS NOT NULL)"
+    )).rowcount:
+        pass
 
 
-def ensure_indexes(engine: Engine) -> None:
+def _backfill_folder_stats(conn: Connection) -> None:
+    """Rebuild folder aggregates once, when files exist but no folder has counted them."""
+    from .services.folder_stats import reconcile
+
+    stale = conn.execute(text(
+        "SELECT 1 FROM files f JOIN folders d ON d.id = f.folder_id "
+        "WHERE d.files_direct = 0 LIMIT 1"
+    )).first()
+    if stale:
+        reconcile(conn)
+
+
+def ensure_indexes(conn: Connection) -> None:
     """Create performance indexes idempotently."""
-    dialect = engine.dialect.name
+    dialect = conn.dialect.name
 
     if dialect == "postgresql":
         stmts = [
@@ -50,9 +109,27 @@ def ensure_indexes(engine: Engine) -> None:
             "CREATE INDEX IF NOT EXISTS ix_files_folder_created_id "
             "ON files (folder_id, created_at DESC, id DESC)",
 
-            # búsqueda por contenido
-            "CREATE INDEX IF NOT EXISTS ix_file_texts_tsv "
-            "ON file_texts USING GIN (to_tsvector('simple', content_plain))",
+            # subárboles por prefijo de ruta (LIKE 'prefijo%' con cualquier collation)
+            "CREATE INDEX IF NOT EXISTS ix_folders_room_path "
+            "ON folders (dataroom_id, path varchar_pattern_ops)",
+
+            # cola de extracción
+            "CREATE INDEX IF NOT EXISTS ix_extraction_jobs_status_id "
+            "ON extraction_jobs (status, id)",
+
+            # dedup por contenido / GC de blobs
+            "CREATE INDEX IF NOT EXISTS ix_files_checksum "
+            "ON files (checksum_sha256)",
+            "CREATE INDEX IF NOT EXISTS ix_blobs_orphaned "
+            "ON blobs (orphaned_at) WHERE refcount <= 0",
+
+            # búsqueda por contenido (sobre la columna tsvector persistida)
+            "DROP INDEX IF EXISTS ix_file_texts_tsv",
+            "DROP INDEX IF EXISTS ix_file_page_texts_tsv",
+            "CREATE INDEX IF NOT EXISTS ix_file_texts_content_tsv "
+            "ON file_texts USING GIN (content_tsv)",
+            "CREATE INDEX IF NOT EXISTS ix_file_page_texts_content_tsv "
+            "ON file_page_texts USING GIN (content_tsv)",
 
             # búsqueda por nombre (trigram)
             "CREATE INDEX IF NOT EXISTS ix_files_name_trgm "
@@ -67,8 +144,81 @@ def ensure_indexes(engine: Engine) -> None:
             "ON folders (parent_id, created_at, id)",
             "CREATE INDEX IF NOT EXISTS ix_files_folder_created_id "
             "ON files (folder_id, created_at, id)",
+            "CREATE INDEX IF NOT EXISTS ix_folders_room_path "
+            "ON folders (dataroom_id, path)",
+            "CREATE INDEX IF NOT EXISTS ix_extraction_jobs_status_id "
+            "ON extraction_jobs (status, id)",
+            "CREATE INDEX IF NOT EXISTS ix_files_checksum "
+            "ON files (checksum_sha256)",
+            "CREATE INDEX IF NOT EXISTS ix_blobs_orphaned "
+            "ON blobs (orphaned_at) WHERE refcount <= 0",
+
+            # búsqueda por contenido (FTS5); rowid = files.id
+            "CREATE VIRTUAL TABLE IF NOT EXISTS file_fts "
+            "USING fts5(name, content, tokenize='unicode61 remove_diacritics 2')",
+            # rowid = file_id << 20 | page_no
+            "CREATE VIRTUAL TABLE IF NOT EXISTS file_page_fts "
+            "USING fts5(content, file_id UNINDEXED, page_no UNINDEXED, tokenize='unicode61 remove_diacritics 2')",
         ]
 
-    with engine.begin() as conn:
-        for s in stmts:
-            conn.execute(text(s))
+    for s in stmts:
+        conn.execute(text(s))
+
+    if dialect == "sqlite":
+        _backfill_fts(conn)
+
+
+def ensure_sort_indexes(conn: Connection) -> None:
+    """Composite (scope, sort column, id) indexes behind every listing sort (utils/pagination.py)."""
+    # legado: filas sin updated_at no pueden ser clave de keyset
+    conn.execute(text("UPDATE files SET updated_at = created_at WHERE updated_at IS NULL"))
+    # ascendentes: el mismo índice se recorre al revés para order=desc (la clave y el id van en la misma dirección)
+    stmts = [
+        "CREATE INDEX IF NOT EXISTS ix_files_folder_name_id ON files (folder_id, name, id)",
+        "CREATE INDEX IF NOT EXISTS ix_files_folder_size_id ON files (folder_id, size_bytes, id)",
+        "CREATE INDEX IF NOT EXISTS ix_files_folder_updated_id ON files (folder_id, updated_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_folders_parent_name_id ON folders (parent_id, name, id)",
+        "CREATE INDEX IF NOT EXISTS ix_datarooms_owner_name_id ON datarooms (owner_id, name, id)",
+    ]
+    for s in stmts:
+        conn.execute(text(s))
+
+
+def ensure_name_indexes(conn: Connection) -> None:
+    """Unique file names per folder and prefix lookups for services/names.py."""
+    stmts = ["CREATE UNIQUE INDEX IF NOT EXISTS uq_files_folder_name ON files (folder_id, name)"]
+    if conn.dialect.name == "postgresql":
+        # LIKE 'stem (%' con cualquier collation (como ix_folders_room_path)
+        stmts += [
+            "CREATE INDEX IF NOT EXISTS ix_files_folder_name_pattern "
+            "ON files (folder_id, name varchar_pattern_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_folders_siblings_name_pattern "
+            "ON folders (dataroom_id, parent_id, name varchar_pattern_ops)",
+        ]
+    for s in stmts:
+        conn.execute(text(s))
+
+
+def _backfill_fts(conn: Connection) -> None:
+    """Populate the FTS5 tables from file_texts the first time they exist."""
+    if conn.execute(text("SELECT 1 FROM file_fts LIMIT 1")).first():
+        return
+    conn.execute(text(
+        "INSERT INTO file_fts (rowid, name, content) "
+        "SELECT f.id, f.name, t.content_plain FROM files f "
+        "JOIN file_texts t ON t.file_id = f.id WHERE t.status = 'done'"
+    ))
+    conn.execute(text(
+        "INSERT INTO file_page_fts (rowid, content, file_id, page_no) "
+        "SELECT (p.file_id << 20) | p.page_no, p.content, p.file_id, p.page_no "
+        "FROM file_page_texts p"
+    ))
+
+
+def widen_file_sizes(conn: Connection) -> None:
+    """files.size_bytes and blobs.size_bytes as BIGINT: resumable uploads go past 2 GiB."""
+    if conn.dialect.name != "postgresql":
+        # SQLite guarda cualquier INTEGER en 64 bits
+        return
+    for table in ("files", "blobs"):
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN size_bytes TYPE BIGINT"))
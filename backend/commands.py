@@ -0,0 +1,61 @@
+# backend/commands.py
+import time
+import click
+from .services.extraction import run_worker
+from .services.blobs import collect_orphans
+from .services.deletion import collect_garbage
+from .services.folder_stats import reconcile
+from .services.metrics import serve as serve_metrics
+from .migrations import upgrade, current_version, HEAD
+from .db import engine
+from .config import METRICS_TOKEN
+
+
+def register_commands(app):
+    @app.cli.command("db-upgrade")
+    @click.option("--to", "target", type=int, default=None, help="Stop at this version.")
+    def db_upgrade(target):
+        """Apply pending schema migrations (one process at a time)."""
+        applied = upgrade(engine, target)
+        with engine.connect() as conn:
+            version = current_version(conn)
+        click.echo(f"applied {applied or 'nothing'}; schema at v{version} (code v{HEAD})")
+
+    @app.cli.command("extraction-worker")
+    @click.option("--concurrency", type=int, default=None, help="Process pool size (default EXTRACTION_WORKERS).")
+    @click.option("--once", is_flag=True, help="Drain the queue and exit.")
+    @click.option("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port.")
+    def extraction_worker(concurrency, once, metrics_port):
+        """Run the PDF text extraction worker."""
+        if metrics_port:
+            if not METRICS_TOKEN:
+                raise click.UsageError("--metrics-port needs METRICS_TOKEN (the endpoint has no other auth)")
+            serve_metrics(metrics_port)
+        run_worker(concurrency=concurrency, once=once)
+
+    @app.cli.command("gc-blobs")
+    @click.option("--grace-minutes", type=int, default=None, help="Override BLOB_GC_GRACE_MINUTES.")
+    def gc_blobs(grace_minutes):
+        """Delete blob files that have no references left."""
+        click.echo(f"removed {collect_orphans(grace_minutes)} blobs")
+
+    @app.cli.command("gc-disk")
+    @click.option("--grace-minutes", type=int, default=None, help="Override BLOB_GC_GRACE_MINUTES.")
+    @click.option("--loop", is_flag=True, help="Keep running, one pass every --interval seconds.")
+    @click.option("--interval", type=float, default=60.0, show_default=True)
+    def gc_disk(grace_minutes, loop, interval):
+        """Remove directories queued by deletes, expired resumable uploads and unreferenced blobs."""
+        while True:
+            dirs, uploads, blobs = collect_garbage(grace_minutes)
+            click.echo(f"removed {dirs} directories, {uploads} expired uploads, {blobs} blobs")
+            if not loop:
+                return
+            time.sleep(interval)
+
+    @app.cli.command("reconcile-folder-stats")
+    @click.option("--room", "rid", type=int, default=None, help="Only this dataroom.")
+    def reconcile_folder_stats(rid):
+        """Rebuild folder file counts, byte totals and last-modified from files."""
+        with engine.begin() as conn:
+            reconcile(conn, rid)
+        click.echo("folder stats rebuilt")
@@ -16,6 +16,23 @@ if not DATABASE_URL:
     # Fallback to SQLite file inside backend/
     DATABASE_URL = f"sqlite+pysqlite:///{(BASE_DIR / 'dataroom.db').as_posix()}"
 
+# Run pending migrations at startup instead of requiring `flask db-upgrade`.
+# Default: on for SQLite (local dev), off otherwise.
+AUTO_MIGRATE = os.getenv(
+    "AUTO_MIGRATE", "true" if DATABASE_URL.startswith("sqlite") else "false"
+).lower() == "true"
+
+# ---- Read replica and connection pools ----
+# optional; read-only sessions (search, tree, exports) go here when set
+DATABASE_REPLICA_URL = (os.getenv("DATABASE_REPLICA_URL") or "").strip()
+# per engine and per process (gunicorn workers multiply these)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds waiting for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 never recycles
+# Postgres statement_timeout for every connection (0 = no limit)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
 # ---- Upload directory ----
 _raw_upload_dir = (os.getenv("UPLOAD_DIR") or "uploads").strip()
 UPLOAD_DIR_PATH = Path(_raw_upload_dir)
@@ -25,6 +42,64 @@ if not UPLOAD_DIR_PATH.is_absolute():
 # Export as POSIX string to avoid backslash issues on Windows
 UPLOAD_DIR = UPLOAD_DIR_PATH.as_posix()
 
+# ---- CORS (Flask app and ASGI streaming routes) ----
+CORS_ORIGINS = ["http://localhost:5173", "http://127.0.0.1:5173", "https://dataroom-mvp.vercel.app"]
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "Range", "If-None-Match", "If-Range"]
+CORS_EXPOSE_HEADERS = ["Content-Disposition", "Content-Range", "Accept-Ranges", "ETag", "Content-Length"]
+
 # ---- Other settings ----
 MAX_CONTENT_LENGTH_MB = int(os.getenv("MAX_CONTENT_LENGTH_MB", "25"))
+# POST /folders/<id>/files/batch: whole request size, part count and hashing threads
+MAX_BATCH_CONTENT_LENGTH_MB = int(os.getenv("MAX_BATCH_CONTENT_LENGTH_MB", "1024"))
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "500"))
+UPLOAD_BATCH_WORKERS = int(os.getenv("UPLOAD_BATCH_WORKERS", "4"))
+# resumable uploads (/api/folders/<id>/uploads): chunk size, whole-file cap and idle expiry
+UPLOAD_CHUNK_MB = int(os.getenv("UPLOAD_CHUNK_MB", "8"))
+RESUMABLE_MAX_MB = int(os.getenv("RESUMABLE_MAX_MB", "4096"))
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
 PORT = int(os.getenv("PORT", "5001"))
+# response encoder: auto (orjson if installed), orjson or std
+JSON_ENCODER = (os.getenv("JSON_ENCODER") or "auto").strip().lower()
+
+# ---- Text extraction worker ----
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_POLL_SECONDS = float(os.getenv("EXTRACTION_POLL_SECONDS", "1.0"))
+EXTRACTION_MAX_ATTEMPTS = int(os.getenv("EXTRACTION_MAX_ATTEMPTS", "3"))
+EXTRACTION_STALE_MINUTES = int(os.getenv("EXTRACTION_STALE_MINUTES", "15"))
+
+# ---- Blob store ----
+# unreferenced blobs are kept this long before the GC deletes the bytes
+BLOB_GC_GRACE_MINUTES = int(os.getenv("BLOB_GC_GRACE_MINUTES", "60"))
+
+# ---- File serving ----
+# "" (Python streams), "x-accel" (nginx X-Accel-Redirect) or "x-sendfile"
+SENDFILE_MODE = (os.getenv("SENDFILE_MODE") or "").strip().lower()
+# nginx internal location that aliases UPLOAD_DIR (only for x-accel)
+SENDFILE_PREFIX = os.getenv("SENDFILE_PREFIX", "/_protected_uploads")
+
+# ---- Search result cache ----
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))  # 0 disables it
+# optional shared backend, e.g. redis://localhost:6379/0 (needs the redis package)
+SEARCH_CACHE_URL = (os.getenv("SEARCH_CACHE_URL") or "").strip()
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600"))
+
+# ---- Result totals and facets ----
+# totals are exact up to this many matches, then estimated (Postgres EXPLAIN) or reported as ">="
+COUNT_EXACT_MAX = int(os.getenv("COUNT_EXACT_MAX", "10000"))
+FACET_FOLDERS_MAX = int(os.getenv("FACET_FOLDERS_MAX", "20"))  # folder buckets returned, largest first
+
+# ---- Metrics ----
+# per-request timing, Server-Timing header and slow-request log
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# GET /metrics (Prometheus text) is outside JWT auth: it is only served with a static
+# bearer token, so it stays off until METRICS_TOKEN is set
+METRICS_TOKEN = (os.getenv("METRICS_TOKEN") or "").strip()
+# requests at or above this log their slowest SQL statements (0 disables)
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_TOP_STATEMENTS = int(os.getenv("SLOW_REQUEST_TOP_STATEMENTS", "5"))
+
+# ---- ASGI streaming mode (backend.asgi:app) ----
+# threads for blocking work off the event loop: auth/DB lookups and file chunk reads/writes
+ASGI_IO_THREADS = int(os.getenv("ASGI_IO_THREADS", "32"))
+# smaller than the WSGI chunk: every stalled slow client holds about one chunk in memory
+ASGI_CHUNK_SIZE = int(os.getenv("ASGI_CHUNK_SIZE", str(64 * 1024)))
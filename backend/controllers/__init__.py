@@ -3,13 +3,19 @@ from .auth import AuthController
 from .datarooms import DataroomsController
 from .folders import FoldersController
 from .files import FilesController
+from .uploads import UploadsController
 from .search import SearchController
 from .users import UsersController
+from .metrics import MetricsController
+from ..config import METRICS_ENABLED, METRICS_TOKEN
 
 def register_controllers(app):
     app.register_blueprint(AuthController().bp, url_prefix="/api/auth")
     app.register_blueprint(DataroomsController().bp, url_prefix="/api")
     app.register_blueprint(FoldersController().bp, url_prefix="/api")
     app.register_blueprint(FilesController().bp, url_prefix="/api")
+    app.register_blueprint(UploadsController().bp, url_prefix="/api")
     app.register_blueprint(SearchController().bp, url_prefix="/api/search")
-    app.register_blueprint(UsersController().bp, url_prefix="/api/users")
\ No newline at end of file
+    app.register_blueprint(UsersController().bp, url_prefix="/api/users")
+    if METRICS_ENABLED and METRICS_TOKEN:
+        app.register_blueprint(MetricsController().bp)
\ No newline at end of file
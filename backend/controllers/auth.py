@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 import jwt
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-from ..db import session
+from ..db import session, read_session
 from ..models import User
 
 
@@ -45,7 +45,7 @@ class AuthController:
         data = request.get_json(force=True)
         email = (data.get("email") or "").strip().lower()
         password = (data.get("password") or "").strip()
-        with session() as db:
+        with read_session(replica=False) as db:
             u = db.query(User).filter(User.email == email).first()
             if not u or not check_password_hash(u.password_hash, password):
                 return jsonify({"error": "invalid credentials"}), 401
@@ -61,7 +61,7 @@ class AuthController:
         except Exception:
             return jsonify({"error": "unauthorized"}), 401
         uid = int(data["sub"])
-        with session() as db:
+        with read_session(replica=False) as db:
             u = db.get(User, uid)
             if not u:
                 return jsonify({"error": "unauthorized"}), 401
@@ -1,8 +1,21 @@
-from flask import Blueprint, request, jsonify, g
-from sqlalchemy import select, and_
-from ..db import session
-from ..models import Dataroom, Folder
-from ..utils.pagination import encode_cursor, decode_cursor
+from flask import Blueprint, Response, request, jsonify, g
+from sqlalchemy import select
+from ..db import session, read_session
+from ..models import Dataroom, Folder, File
+from ..services.access import owned_room
+from ..services.search_cache import bump_generation
+from ..services.deletion import delete_room
+from ..services.tree import root_path, folder_tree
+from ..services.folder_stats import stats_json, STATS_COLUMNS
+from ..services.zip_export import stream_zip
+from ..services.file_serving import content_disposition
+from ..utils.pagination import sort_keyset, BadCursor, ASC, DESC
+
+# ?sort= del listado (índices en bootstrap.ensure_sort_indexes)
+ROOM_SORTS = {
+    "created": (Dataroom.created_at, DESC),
+    "name": (Dataroom.name, ASC),
+}
 
 
 class DataroomsController:
@@ -13,12 +26,8 @@ class DataroomsController:
         self.bp.add_url_rule("/datarooms/<int:rid>", view_func=self.get_dataroom, methods=["GET"])
         self.bp.add_url_rule("/datarooms/<int:rid>", view_func=self.rename_dataroom, methods=["PUT"])
         self.bp.add_url_rule("/datarooms/<int:rid>", view_func=self.delete_dataroom, methods=["DELETE"])
-
-    def list_datarooms(self):
-        uid = g.user_id
-        with session() as db:
-            rows = db.execute(select(Dataroom).where(Dataroom.owner_id == uid)).scalars().all()
-            return jsonify([{"id": d.id, "name": d.name, "root_folder_id": d.root_folder_id, "created_at": d.created_at.isoformat()} for d in rows])
+        self.bp.add_url_rule("/datarooms/<int:rid>/export", view_func=self.export_dataroom, methods=["GET"])
+        self.bp.add_url_rule("/datarooms/<int:rid>/tree", view_func=self.tree, methods=["GET"])
 
     def create_dataroom(self):
         uid = g.user_id
@@ -33,6 +42,7 @@ class DataroomsController:
             root = Folder(name="root", dataroom_id=d.id, parent_id=None)
             db.add(root)
             db.flush()
+            root.path = root_path(root.id)
             d.root_folder_id = root.id
             db.commit()
             db.refresh(d)
@@ -40,9 +50,9 @@ class DataroomsController:
 
     def get_dataroom(self, rid: int):
         uid = g.user_id
-        with session() as db:
-            d = db.get(Dataroom, rid)
-            if not d or d.owner_id != uid:
+        with read_session(replica=False) as db:
+            d = owned_room(db, rid, uid)
+            if not d:
                 return jsonify({"error": "not found"}), 404
             return jsonify({"id": d.id, "name": d.name, "root_folder_id": d.root_folder_id})
 
@@ -53,8 +63,8 @@ class DataroomsController:
         if not name:
             return jsonify({"error": "name is required"}), 400
         with session() as db:
-            d = db.get(Dataroom, rid)
-            if not d or d.owner_id != uid:
+            d = owned_room(db, rid, uid)
+            if not d:
                 return jsonify({"error": "not found"}), 404
             d.name = name
             db.commit()
@@ -63,42 +73,76 @@ class DataroomsController:
     def delete_dataroom(self, rid: int):
         uid = g.user_id
         with session() as db:
-            d = db.get(Dataroom, rid)
-            if not d or d.owner_id != uid:
+            d = owned_room(db, rid, uid)
+            if not d:
                 return jsonify({"error": "not found"}), 404
-            db.delete(d)
+            delete_room(db, rid)
+            bump_generation(db, uid)
             db.commit()
             return jsonify({"ok": True})
+
+    def tree(self, rid: int):
+        # Parámetros: depth (niveles bajo la raíz; vacío = árbol completo), folder_id (subárbol)
+        uid = g.user_id
+        depth = request.args.get("depth")
+        folder_id = request.args.get("folder_id")
+        try:
+            depth = int(depth) if depth not in (None, "") else None
+            folder_id = int(folder_id) if folder_id else None
+        except ValueError:
+            return jsonify({"error": "depth and folder_id must be integers"}), 400
+        with read_session() as db:
+            d = owned_room(db, rid, uid)
+            if not d:
+                return jsonify({"error": "not found"}), 404
+            node = folder_tree(db, rid, folder_id or d.root_folder_id, depth)
+            if node is None:
+                return jsonify({"error": "not found"}), 404
+            return jsonify(node)
+
+    def export_dataroom(self, rid: int):
+        uid = g.user_id
+        with read_session() as db:
+            d = owned_room(db, rid, uid)
+            if not d:
+                return jsonify({"error": "not found"}), 404
+            name, root_id = d.name, d.root_folder_id
+        # la carpeta raíz se exporta con el nombre del dataroom
+        return Response(
+            stream_zip(rid, root_id, name),
+            mimetype="application/zip",
+            headers={"Content-Disposition": content_disposition(f"{name}.zip", "attachment")},
+            direct_passthrough=True,
+        )
         
     def list_datarooms(self):
         uid = g.user_id
         limit = min(int(request.args.get("limit", 50)), 200)
         cursor = request.args.get("cursor")
-        with session() as db:
-            stmt = select(Dataroom).where(Dataroom.owner_id == uid)
-
-            if cursor:
-                try:
-                    cdt, cid = decode_cursor(cursor)
-                except ValueError:
-                    return jsonify({"error": "bad cursor"}), 400
-                stmt = stmt.where(
-                    (Dataroom.created_at < cdt) |
-                    (and_(Dataroom.created_at == cdt, Dataroom.id < cid))
-                )
-
-            stmt = stmt.order_by(Dataroom.created_at.desc(), Dataroom.id.desc()).limit(limit + 1)
-            rows = db.execute(stmt).scalars().all()
-
-            next_cursor = None
-            if len(rows) == limit + 1:
-                last = rows[-1]
-                next_cursor = encode_cursor(last.created_at, last.id)
-                rows = rows[:-1]
+        keyset = sort_keyset(ROOM_SORTS, request.args.get("sort"), request.args.get("order"), Dataroom.id)
+        if keyset is None:
+            return jsonify({"error": "invalid sort"}), 400
+        with read_session(replica=False) as db:
+            # una fila por sala con los agregados de su raíz: sin entidades ni identity map
+            stmt = (
+                select(Dataroom.id, Dataroom.name, Dataroom.root_folder_id, Dataroom.created_at, *STATS_COLUMNS)
+                .outerjoin(Folder, Folder.id == Dataroom.root_folder_id)
+                .where(Dataroom.owner_id == uid)
+            )
+            try:
+                rows, next_cursor = keyset.page(db, stmt, limit, cursor)
+            except BadCursor:
+                return jsonify({"error": "bad cursor"}), 400
 
             return jsonify({
                 "items": [
-                    {"id": d.id, "name": d.name, "root_folder_id": d.root_folder_id, "created_at": d.created_at.isoformat()}
+                    {
+                        "id": d.id,
+                        "name": d.name,
+                        "root_folder_id": d.root_folder_id,
+                        "created_at": d.created_at.isoformat(),
+                        **(stats_json(d) if d.files_total is not None else {}),
+                    }
                     for d in rows
                 ],
                 "next_cursor": next_cursor
@@ -1,60 +1,41 @@
-import os, uuid, hashlib
-from datetime import datetime
-from flask import Blueprint, request, jsonify, send_file, g
-from sqlalchemy import select
-from ..db import session
-from ..models import Folder, File, Dataroom, FileText
-from ..config import UPLOAD_DIR
-from ..services.pdf_text import extract_pdf_text
-
-
-def next_collision_name(name: str, siblings: set[str]) -> str:
-    if name not in siblings:
-        return name
-    i = 1
-    stem, dot, ext = name.rpartition(".")
-    if not dot:
-        stem, ext = name, ""
-    base = stem
-    while True:
-        candidate = f"{base} ({i}){('.' + ext) if ext else ''}"
-        if candidate not in siblings:
-            return candidate
-        i += 1
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, g
+from sqlalchemy import select, insert, func
+from ..db import session, read_session
+from ..models import File, FileText
+from ..config import MAX_CONTENT_LENGTH_MB, MAX_BATCH_CONTENT_LENGTH_MB, UPLOAD_BATCH_MAX_FILES, UPLOAD_BATCH_WORKERS
+from ..services.extraction import attach_texts
+from ..services.storage import NotPdfError, FileTooLarge
+from ..services.blobs import stage_pdf_stream, store, release, is_blob
+from ..services.uploads import create_uploaded_file
+from ..services.names import files_in, free_name, free_names, claim
+from ..services.file_serving import send_pdf
+from ..services.access import owned_file, owned_folder
+from ..services.search_engine import search_engine
+from ..services.search_cache import bump_generation
+from ..services.folder_stats import apply_delta
+from ..services.deletion import delete_file_dependents
+from ..services.move_copy import move_file, copy_file
 
 
 class FilesController:
     def __init__(self):
         self.bp = Blueprint("files", __name__)
         self.bp.add_url_rule("/folders/<int:fid>/files", view_func=self.upload, methods=["POST"])
+        self.bp.add_url_rule("/folders/<int:fid>/files/batch", view_func=self.upload_batch, methods=["POST"])
         self.bp.add_url_rule("/files/<int:fid>", view_func=self.get_file, methods=["GET"])
         self.bp.add_url_rule("/files/<int:fid>/stream", view_func=self.stream_file, methods=["GET"])
         self.bp.add_url_rule("/files/<int:fid>", view_func=self.rename_file, methods=["PUT"])
         self.bp.add_url_rule("/files/<int:fid>", view_func=self.delete_file, methods=["DELETE"])
-
-    def _ensure_owner_folder(self, db, folder_id: int, uid: int) -> Folder | None:
-        f = db.get(Folder, folder_id)
-        if not f:
-            return None
-        d = db.get(Dataroom, f.dataroom_id)
-        if not d or d.owner_id != uid:
-            return None
-        return f
-
-    def _ensure_owner_file(self, db, file_id: int, uid: int) -> File | None:
-        f = db.get(File, file_id)
-        if not f:
-            return None
-        folder = db.get(Folder, f.folder_id)
-        if not folder:
-            return None
-        d = db.get(Dataroom, folder.dataroom_id)
-        if not d or d.owner_id != uid:
-            return None
-        return f
+        self.bp.add_url_rule("/files/<int:fid>/move", view_func=self.move_file, methods=["POST"])
+        self.bp.add_url_rule("/files/<int:fid>/copy", view_func=self.copy_file, methods=["POST"])
 
     def upload(self, fid: int):
         uid = g.user_id
+        limit = MAX_CONTENT_LENGTH_MB * 1024 * 1024
+        if (request.content_length or 0) > limit:
+            return jsonify({"error": "file too large"}), 413
         if "file" not in request.files:
             return jsonify({"error": "file is required"}), 400
         up = request.files["file"]
@@ -62,60 +43,117 @@ class FilesController:
             return jsonify({"error": "only pdf allowed"}), 400
 
         with session() as db:
-            folder = self._ensure_owner_folder(db, fid, uid)
-            if not folder:
+            folder_acc = owned_folder(db, fid, uid)
+            if not folder_acc:
                 return jsonify({"error": "folder not found"}), 404
 
-            rid = folder.dataroom_id
-            os.makedirs(os.path.join(UPLOAD_DIR, str(rid), str(folder.id)), exist_ok=True)
-            stored = f"{uuid.uuid4()}.pdf"
-            disk_path = os.path.join(UPLOAD_DIR, str(rid), str(folder.id), stored)
+            try:
+                # una sola pasada: escribe, hashea, mide y valida %PDF
+                staged = stage_pdf_stream(up.stream, limit)
+            except NotPdfError:
+                return jsonify({"error": "only pdf allowed"}), 400
+            except FileTooLarge:
+                return jsonify({"error": "file too large"}), 413
+            return jsonify(create_uploaded_file(db, folder_acc.folder, uid, up.filename, staged)), 201
 
-            up.save(disk_path)
+    def upload_batch(self, fid: int):
+        """
+        Many PDFs in one multipart request (repeated "files" parts).
+        Parts are hashed/stored concurrently; names are resolved against a
+        single sibling read and all rows go in with one commit.
+        """
+        uid = g.user_id
+        # sólo esta ruta acepta cuerpos más grandes que MAX_CONTENT_LENGTH_MB
+        request.max_content_length = MAX_BATCH_CONTENT_LENGTH_MB * 1024 * 1024
+        parts = request.files.getlist("files")
+        if not parts:
+            return jsonify({"error": "files are required"}), 400
+        if len(parts) > UPLOAD_BATCH_MAX_FILES:
+            return jsonify({"error": f"at most {UPLOAD_BATCH_MAX_FILES} files per batch"}), 400
 
-            h = hashlib.sha256()
-            with open(disk_path, "rb") as f:
-                for chunk in iter(lambda: f.read(1024 * 1024), b""):
-                    h.update(chunk)
-            checksum = h.hexdigest()
+        with session() as db:
+            folder_acc = owned_folder(db, fid, uid)
+            if not folder_acc:
+                return jsonify({"error": "folder not found"}), 404
 
-            siblings = set(
-                db.execute(select(File.name).where(File.folder_id == folder.id)).scalars().all()
-            )
-            final_name = next_collision_name(up.filename, siblings)
-
-            file = File(
-                folder_id=fid,
-                name=final_name,
-                stored_name=stored,
-                mime_type="application/pdf",
-                size_bytes=os.path.getsize(disk_path),
-                checksum_sha256=checksum,
-            )
-            db.add(file)
-            db.flush()  # asegura file.id disponible
+            results: list[dict] = [{"original_name": up.filename} for up in parts]
+            todo = []
+            for i, up in enumerate(parts):
+                if not up.filename or not up.filename.lower().endswith(".pdf"):
+                    results[i]["error"] = "only pdf allowed"
+                    continue
+                todo.append(i)
 
-            text_plain = extract_pdf_text(disk_path)
-            db.add(FileText(file_id=file.id, content_plain=text_plain))
+            def stage(i):
+                try:
+                    return i, stage_pdf_stream(parts[i].stream, MAX_CONTENT_LENGTH_MB * 1024 * 1024)
+                except NotPdfError:
+                    return i, "only pdf allowed"
+                except FileTooLarge:
+                    return i, "file too large"
 
-            renamed = (final_name != up.filename)
+            # hashing y E/S sueltan el GIL: un pool de hilos alcanza
+            with ThreadPoolExecutor(max_workers=max(1, UPLOAD_BATCH_WORKERS)) as pool:
+                staged = []
+                for i, s in pool.map(stage, todo):
+                    if isinstance(s, str):
+                        results[i]["error"] = s
+                    else:
+                        staged.append((i, s))
 
+            stored_names = store(db, [s for _, s in staged])
+
+            def insert_rows():
+                # nombres del propio batch también cuentan como hermanos
+                names = free_names(db, files_in(fid), [parts[i].filename for i, _ in staged])
+                rows = [
+                    {
+                        "folder_id": fid,
+                        "name": name,
+                        "stored_name": stored_name,
+                        "mime_type": "application/pdf",
+                        "size_bytes": s.size_bytes,
+                        "checksum_sha256": s.checksum,
+                    }
+                    for name, stored_name, (_, s) in zip(names, stored_names, staged)
+                ]
+                if not rows:
+                    return rows, []
+                return rows, db.execute(
+                    insert(File).returning(File.id, sort_by_parameter_order=True), rows
+                ).scalars().all()
+
+            rows, ids = claim(db, insert_rows)
+            text_status = attach_texts(db, [(fid_, r["checksum_sha256"]) for fid_, r in zip(ids, rows)])
+            if rows:
+                apply_delta(db, fid, folder_acc.folder.path, len(rows), sum(r["size_bytes"] for r in rows))
+                bump_generation(db, uid)
             db.commit()
-            db.refresh(file)
+
+            for (i, _), file_id, r in zip(staged, ids, rows):
+                results[i].update({
+                    "id": file_id,
+                    "name": r["name"],
+                    "size_bytes": r["size_bytes"],
+                    "renamed": r["name"] != parts[i].filename,
+                    "text_status": text_status[file_id],
+                })
             return jsonify({
-                "id": file.id,
-                "name": file.name,
-                "size_bytes": file.size_bytes,
-                "renamed": renamed,
-                "original_name": up.filename
-            }), 201
+                "items": results,
+                "uploaded": len(ids),
+                "failed": len(parts) - len(ids),
+            }), (201 if ids else 400)
 
     def get_file(self, fid: int):
         uid = g.user_id
-        with session() as db:
-            f = self._ensure_owner_file(db, fid, uid)
-            if not f:
+        with read_session(replica=False) as db:
+            acc = owned_file(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
+            f = acc.file
+            text_status = db.execute(
+                select(FileText.status).where(FileText.file_id == f.id)
+            ).scalar_one_or_none()
             return jsonify(
                 {
                     "id": f.id,
@@ -123,22 +161,20 @@ class FilesController:
                     "folder_id": f.folder_id,
                     "size_bytes": f.size_bytes,
                     "mime_type": f.mime_type,
+                    "text_status": text_status,
                 }
             )
 
     def stream_file(self, fid: int):
         uid = g.user_id
-        with session() as db:
-            f = self._ensure_owner_file(db, fid, uid)
-            if not f:
+        with read_session(replica=False) as db:
+            acc = owned_file(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
-            folder = db.get(Folder, f.folder_id)
-            disk_path = os.path.join(
-                UPLOAD_DIR, str(folder.dataroom_id), str(folder.id), f.stored_name
-            )
-            if not os.path.exists(disk_path):
+            f = acc.file
+            if not os.path.exists(acc.disk_path):
                 return jsonify({"error": "file missing on disk"}), 410
-            return send_file(disk_path, mimetype=f.mime_type, as_attachment=False, download_name=f.name)
+            return send_pdf(acc.disk_path, f.checksum_sha256, f.name, immutable=is_blob(f.stored_name))
 
     def rename_file(self, fid: int):
         uid = g.user_id
@@ -147,36 +183,85 @@ class FilesController:
         if not name:
             return jsonify({"error": "name is required"}), 400
         with session() as db:
-            f = self._ensure_owner_file(db, fid, uid)
-            if not f:
+            acc = owned_file(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
-            siblings = set(
-                db.execute(
-                    select(File.name).where(File.folder_id == f.folder_id, File.id != f.id)
-                ).scalars().all()
-            )
-            from datetime import datetime as _dt
+            f = acc.file
 
-            f.name = next_collision_name(name, siblings)
-            f.updated_at = _dt.utcnow()
+            def rename():
+                f.name = free_name(db, files_in(f.folder_id), name, exclude_id=f.id)
+                # reloj de la base, como el server_default: en SQLite todas las fechas quedan
+                # con el formato de CURRENT_TIMESTAMP que compara el cursor (utils/pagination._bound)
+                f.updated_at = func.now()
+                db.flush()
+
+            claim(db, rename)
+            search_engine.rename(db, f.id, f.name)
+            apply_delta(db, f.folder_id, acc.folder_path)
+            bump_generation(db, uid)
             db.commit()
             return jsonify({"ok": True, "name": f.name})
 
     def delete_file(self, fid: int):
         uid = g.user_id
         with session() as db:
-            f = self._ensure_owner_file(db, fid, uid)
-            if not f:
+            acc = owned_file(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
-            folder = db.get(Folder, f.folder_id)
-            disk_path = os.path.join(
-                UPLOAD_DIR, str(folder.dataroom_id), str(folder.id), f.stored_name
-            )
-            try:
-                if os.path.exists(disk_path):
-                    os.remove(disk_path)
-            except Exception:
-                pass
+            f = acc.file
+            if is_blob(f.stored_name):
+                # bytes compartidos: sólo soltamos la referencia
+                release(db, {f.checksum_sha256: 1})
+            else:
+                try:
+                    if os.path.exists(acc.disk_path):
+                        os.remove(acc.disk_path)
+                except Exception:
+                    pass
+            search_engine.remove(db, File.id == f.id)
+            delete_file_dependents(db, [f.id])
+            apply_delta(db, f.folder_id, acc.folder_path, -1, -f.size_bytes)
             db.delete(f)
+            bump_generation(db, uid)
             db.commit()
             return jsonify({"ok": True})
+
+    def _target(self, db, fid: int, uid: int):
+        # (acceso al archivo, carpeta destino) o una respuesta de error
+        dest_id = (request.get_json(force=True) or {}).get("folder_id")
+        if not isinstance(dest_id, int):
+            return None, (jsonify({"error": "folder_id is required"}), 400)
+        acc = owned_file(db, fid, uid)
+        if not acc:
+            return None, (jsonify({"error": "not found"}), 404)
+        dest = owned_folder(db, dest_id, uid)
+        if not dest:
+            return None, (jsonify({"error": "folder not found"}), 404)
+        return (acc, dest.folder), None
+
+    def move_file(self, fid: int):
+        uid = g.user_id
+        with session() as db:
+            target, error = self._target(db, fid, uid)
+            if error:
+                return error
+            acc, dest = target
+            original = acc.file.name
+            name = move_file(db, acc, dest)
+            bump_generation(db, uid)
+            db.commit()
+            return jsonify({"id": fid, "name": name, "folder_id": dest.id, "renamed": name != original})
+
+    def copy_file(self, fid: int):
+        # mismo blob y mismo texto: no se copian bytes ni se vuelve a extraer
+        uid = g.user_id
+        with session() as db:
+            target, error = self._target(db, fid, uid)
+            if error:
+                return error
+            acc, dest = target
+            original = acc.file.name
+            out = copy_file(db, acc, dest)
+            bump_generation(db, uid)
+            db.commit()
+            return jsonify({**out, "renamed": out["name"] != original}), 201
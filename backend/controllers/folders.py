@@ -1,24 +1,31 @@
-import os, shutil
-from flask import Blueprint, request, jsonify, g
-from sqlalchemy import select, and_
-from ..utils.pagination import encode_cursor, decode_cursor
-from ..db import session
-from ..models import Dataroom, Folder, File
-from ..config import UPLOAD_DIR
-
-def next_collision_name(name: str, siblings: set[str]) -> str:
-    if name not in siblings:
-        return name
-    i = 1
-    stem, dot, ext = name.rpartition(".")
-    if not dot:
-        stem, ext = name, ""
-    base = stem
-    while True:
-        candidate = f"{base} ({i}){('.' + ext) if ext else ''}"
-        if candidate not in siblings:
-            return candidate
-        i += 1
+from flask import Blueprint, Response, request, jsonify, g
+from sqlalchemy import select
+from ..utils.pagination import sort_keyset, BadCursor, ASC, DESC
+from ..db import session, read_session
+from ..models import Folder, File
+from ..services.access import owned_folder
+from ..services.search_cache import bump_generation, search_cache
+from ..services.deletion import delete_folder_tree
+from ..services.tree import child_path
+from ..services.folder_stats import remove_subtree, stats_json, STATS_COLUMNS
+from ..services.move_copy import move_folder, copy_folder, MoveError
+from ..services.names import folders_in, free_name, claim
+from ..services.zip_export import stream_zip
+from ..services.file_serving import content_disposition
+from ..services.facets import count_total, facet_counts
+
+# ?sort= de los listados: (columna, dirección por defecto); la primera es la opción por defecto.
+# Cada una tiene su índice (carpeta, columna, id) en bootstrap.ensure_sort_indexes.
+FILE_SORTS = {
+    "created": (File.created_at, DESC),
+    "name": (File.name, ASC),
+    "size": (File.size_bytes, DESC),
+    "updated": (File.updated_at, DESC),
+}
+FOLDER_SORTS = {
+    "created": (Folder.created_at, DESC),
+    "name": (Folder.name, ASC),
+}
 
 class FoldersController:
     def __init__(self):
@@ -28,29 +35,18 @@ class FoldersController:
         self.bp.add_url_rule("/datarooms/<int:rid>/folders", view_func=self.create_folder, methods=["POST"])
         self.bp.add_url_rule("/folders/<int:fid>", view_func=self.rename_folder, methods=["PUT"])
         self.bp.add_url_rule("/folders/<int:fid>", view_func=self.delete_folder, methods=["DELETE"])
-
-    def _ensure_owner_folder(self, db, folder_id: int, uid: int) -> Folder | None:
-        f = db.get(Folder, folder_id)
-        if not f:
-            return None
-        d = db.get(Dataroom, f.dataroom_id)
-        if not d or d.owner_id != uid:
-            return None
-        return f
-
-    def _ensure_owner_room(self, db, rid: int, uid: int) -> Dataroom | None:
-        d = db.get(Dataroom, rid)
-        if not d or d.owner_id != uid:
-            return None
-        return d
+        self.bp.add_url_rule("/folders/<int:fid>/export", view_func=self.export_folder, methods=["GET"])
+        self.bp.add_url_rule("/folders/<int:fid>/move", view_func=self.move_folder, methods=["POST"])
+        self.bp.add_url_rule("/folders/<int:fid>/copy", view_func=self.copy_folder, methods=["POST"])
 
     def get_folder(self, fid: int):
         uid = g.user_id
-        with session() as db:
-            f = self._ensure_owner_folder(db, fid, uid)
-            if not f:
+        with read_session(replica=False) as db:
+            acc = owned_folder(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
-            return jsonify({"id": f.id, "name": f.name, "dataroom_id": f.dataroom_id, "parent_id": f.parent_id})
+            f = acc.folder
+            return jsonify({"id": f.id, "name": f.name, "dataroom_id": f.dataroom_id, "parent_id": f.parent_id, **stats_json(f)})
 
     def children(self, fid: int):
         uid = g.user_id
@@ -58,56 +54,63 @@ class FoldersController:
         limit_files = min(int(request.args.get("limit_files", 50)), 200)
         cur_f = request.args.get("cursor_folders")
         cur_file = request.args.get("cursor_files")
+        facets = request.args.get("facets") in ("1", "true")
+        # sort / order para archivos, sort_folders / order_folders para subcarpetas
+        file_keyset = sort_keyset(FILE_SORTS, request.args.get("sort"), request.args.get("order"), File.id)
+        folder_keyset = sort_keyset(
+            FOLDER_SORTS, request.args.get("sort_folders"), request.args.get("order_folders"), Folder.id
+        )
+        if file_keyset is None or folder_keyset is None:
+            return jsonify({"error": "invalid sort"}), 400
 
-        with session() as db:
-            f = self._ensure_owner_folder(db, fid, uid)
-            if not f:
+        with read_session(replica=False) as db:
+            acc = owned_folder(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
 
-            # Folders
-            sf = select(Folder).where(Folder.parent_id == fid)
-            if cur_f:
-                try:
-                    cdt, cid = decode_cursor(cur_f)
-                except ValueError:
-                    return jsonify({"error": "bad cursor"}), 400
-                sf = sf.where(
-                    (Folder.created_at < cdt) |
-                    (and_(Folder.created_at == cdt, Folder.id < cid))
+            # filas proyectadas (sin entidades ORM): sólo las columnas que se devuelven
+            try:
+                folders, next_f = folder_keyset.page(
+                    db,
+                    select(Folder.id, Folder.name, Folder.parent_id, Folder.created_at, *STATS_COLUMNS)
+                    .where(Folder.parent_id == fid),
+                    limit_f, cur_f,
                 )
-            sf = sf.order_by(Folder.created_at.desc(), Folder.id.desc()).limit(limit_f + 1)
-            folders = db.execute(sf).scalars().all()
-            next_f = None
-            if len(folders) == limit_f + 1:
-                last = folders[-1]
-                next_f = encode_cursor(last.created_at, last.id)
-                folders = folders[:-1]
-
-            # Files
-            sfile = select(File).where(File.folder_id == fid)
-            if cur_file:
-                try:
-                    cdt2, cid2 = decode_cursor(cur_file)
-                except ValueError:
-                    return jsonify({"error": "bad cursor"}), 400
-                sfile = sfile.where(
-                    (File.created_at < cdt2) |
-                    (and_(File.created_at == cdt2, File.id < cid2))
+                files, next_file = file_keyset.page(
+                    db,
+                    select(File.id, File.name, File.size_bytes, File.mime_type, File.created_at, File.updated_at)
+                    .where(File.folder_id == fid),
+                    limit_files, cur_file,
                 )
-            sfile = sfile.order_by(File.created_at.desc(), File.id.desc()).limit(limit_files + 1)
-            files = db.execute(sfile).scalars().all()
-            next_file = None
-            if len(files) == limit_files + 1:
-                last2 = files[-1]
-                next_file = encode_cursor(last2.created_at, last2.id)
-                files = files[:-1]
+            except BadCursor:
+                return jsonify({"error": "bad cursor"}), 400
 
-            return jsonify({
-                "folders": [{"id": x.id, "name": x.name, "parent_id": x.parent_id} for x in folders],
-                "files": [{"id": y.id, "name": y.name, "size_bytes": y.size_bytes, "mime_type": y.mime_type} for y in files],
+            out = {
+                "folders": [{"id": x.id, "name": x.name, "parent_id": x.parent_id, **stats_json(x)} for x in folders],
+                "files": [
+                    {
+                        "id": y.id, "name": y.name, "size_bytes": y.size_bytes, "mime_type": y.mime_type,
+                        "created_at": y.created_at.isoformat(),
+                        "updated_at": y.updated_at.isoformat() if y.updated_at else None,
+                    }
+                    for y in files
+                ],
                 "next_cursor_folders": next_f,
                 "next_cursor_files": next_file
-            })
+            }
+            if not (cur_f or cur_file):
+                # primera página: archivos desde el agregado desnormalizado, subcarpetas con conteo acotado
+                out["total_folders"] = count_total(db, select(Folder.id).where(Folder.parent_id == fid))
+                out["total_files"] = {"value": acc.folder.files_direct, "relation": "eq"}
+            if facets:
+                out["facets"] = search_cache.get_or_compute(
+                    db, uid, "children_facets", {"folder_id": fid},
+                    lambda: facet_counts(
+                        db, select(File.size_bytes, File.created_at, File.folder_id).where(File.folder_id == fid),
+                        by_folder=False,
+                    ),
+                )
+            return jsonify(out)
 
     def create_folder(self, rid: int):
         uid = g.user_id
@@ -117,17 +120,22 @@ class FoldersController:
         if not name or parent_id is None:
             return jsonify({"error": "name and parent_id required"}), 400
         with session() as db:
-            d = self._ensure_owner_room(db, rid, uid)
-            parent = db.get(Folder, int(parent_id))
-            if not d or not parent or parent.dataroom_id != rid:
+            # el padre propio y dentro de rid implica que la sala también es del usuario
+            acc = owned_folder(db, int(parent_id), uid)
+            if not acc or acc.dataroom_id != rid:
                 return jsonify({"error": "invalid parent or dataroom"}), 400
-            siblings = set(db.execute(select(Folder.name).where(Folder.parent_id == parent.id, Folder.dataroom_id == rid)).scalars().all())
-            final = next_collision_name(name, siblings)
-            f = Folder(name=final, dataroom_id=rid, parent_id=parent.id)
-            db.add(f)
+            parent = acc.folder
+
+            def insert():
+                f = Folder(name=free_name(db, folders_in(rid, parent.id), name), dataroom_id=rid, parent_id=parent.id)
+                db.add(f)
+                db.flush()
+                return f
+
+            f = claim(db, insert)
+            f.path = child_path(parent.path, f.id)
             db.commit()
             db.refresh(f)
-            os.makedirs(os.path.join(UPLOAD_DIR, str(rid), str(f.id)), exist_ok=True)
             return jsonify({"id": f.id, "name": f.name, "parent_id": f.parent_id})
 
     def rename_folder(self, fid: int):
@@ -137,27 +145,96 @@ class FoldersController:
         if not name:
             return jsonify({"error": "name is required"}), 400
         with session() as db:
-            f = self._ensure_owner_folder(db, fid, uid)
-            if not f:
+            acc = owned_folder(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
-            siblings = set(db.execute(select(Folder.name).where(Folder.parent_id == f.parent_id, Folder.dataroom_id == f.dataroom_id, Folder.id != f.id)).scalars().all())
-            f.name = next_collision_name(name, siblings)
+            f = acc.folder
+
+            def rename():
+                f.name = free_name(db, folders_in(f.dataroom_id, f.parent_id), name, exclude_id=f.id)
+                db.flush()
+
+            claim(db, rename)
+            # las facetas por carpeta cacheadas llevan el nombre
+            bump_generation(db, uid)
             db.commit()
             return jsonify({"ok": True, "name": f.name})
 
     def delete_folder(self, fid: int):
         uid = g.user_id
         with session() as db:
-            f = self._ensure_owner_folder(db, fid, uid)
-            if not f:
+            acc = owned_folder(db, fid, uid)
+            if not acc:
                 return jsonify({"error": "not found"}), 404
-            rid = f.dataroom_id
-            db.delete(f)
+            if acc.folder.parent_id is None:
+                # la raíz se borra junto con el dataroom
+                return jsonify({"error": "cannot delete root folder"}), 400
+            remove_subtree(db, acc.folder)
+            delete_folder_tree(db, fid, acc.dataroom_id)
+            bump_generation(db, uid)
             db.commit()
-        path = os.path.join(UPLOAD_DIR, str(rid), str(fid))
-        try:
-            if os.path.exists(path):
-                shutil.rmtree(path)
-        except Exception:
-            pass
         return jsonify({"ok": True})
+
+    def export_folder(self, fid: int):
+        uid = g.user_id
+        with read_session() as db:
+            acc = owned_folder(db, fid, uid)
+            if not acc:
+                return jsonify({"error": "not found"}), 404
+            name, rid = acc.folder.name, acc.dataroom_id
+        # el generador abre su propia sesión: el stream dura más que este request handler
+        return Response(
+            stream_zip(rid, fid, name),
+            mimetype="application/zip",
+            headers={"Content-Disposition": content_disposition(f"{name}.zip", "attachment")},
+            direct_passthrough=True,
+        )
+
+    def _target(self, db, fid: int, uid: int):
+        # (carpeta, destino) o una respuesta de error; el destino puede estar en otra sala del usuario
+        dest_id = (request.get_json(force=True) or {}).get("parent_id")
+        if not isinstance(dest_id, int):
+            return None, (jsonify({"error": "parent_id is required"}), 400)
+        acc = owned_folder(db, fid, uid)
+        if not acc:
+            return None, (jsonify({"error": "not found"}), 404)
+        dest = owned_folder(db, dest_id, uid)
+        if not dest:
+            return None, (jsonify({"error": "invalid parent"}), 400)
+        return (acc.folder, dest.folder), None
+
+    def move_folder(self, fid: int):
+        uid = g.user_id
+        with session() as db:
+            target, error = self._target(db, fid, uid)
+            if error:
+                return error
+            folder, dest = target
+            original = folder.name
+            try:
+                name = move_folder(db, folder, dest)
+            except MoveError as e:
+                return jsonify({"error": str(e)}), 400
+            bump_generation(db, uid)
+            db.commit()
+            return jsonify({
+                "id": fid, "name": name, "parent_id": dest.id, "dataroom_id": dest.dataroom_id,
+                "renamed": name != original,
+            })
+
+    def copy_folder(self, fid: int):
+        # subárbol completo en unas pocas sentencias; los archivos comparten blob y texto
+        uid = g.user_id
+        with session() as db:
+            target, error = self._target(db, fid, uid)
+            if error:
+                return error
+            folder, dest = target
+            original = folder.name
+            copy = copy_folder(db, folder, dest)
+            bump_generation(db, uid)
+            db.commit()
+            return jsonify({
+                "id": copy.id, "name": copy.name, "parent_id": dest.id, "dataroom_id": dest.dataroom_id,
+                "renamed": copy.name != original, "folders": copy.folders, "files": copy.files,
+            }), 201
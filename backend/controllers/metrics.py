@@ -0,0 +1,14 @@
+# backend/controllers/metrics.py
+from flask import Blueprint, Response, request, jsonify
+from ..services.metrics import render, token_ok, CONTENT_TYPE
+
+class MetricsController:
+    def __init__(self):
+        self.bp = Blueprint("metrics", __name__)
+        self.bp.add_url_rule("/metrics", view_func=self.metrics, methods=["GET"])
+
+    def metrics(self):
+        # fuera del auth JWT (lo consulta Prometheus): sólo con el token estático
+        if not token_ok(request.headers.get("Authorization")):
+            return jsonify({"error": "unauthorized"}), 401
+        return Response(render(), mimetype=None, content_type=CONTENT_TYPE)
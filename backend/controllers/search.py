@@ -1,8 +1,17 @@
 # backend/controllers/search.py
 from flask import Blueprint, request, jsonify, g
-from sqlalchemy import select, and_, or_, func, text
-from ..db import session
-from ..models import File, Folder, Dataroom, FileText
+from sqlalchemy import select, text
+from ..db import read_session
+from ..models import File, Folder, Dataroom
+from ..services.search_engine import search_engine, SORTS
+from ..services.search_cache import search_cache
+from ..services.access import owned_folder
+from ..services.tree import subtree_ids
+from ..services.facets import count_total, facet_counts
+from ..utils.pagination import Keyset, BadCursor, DESC
+
+# los resultados cruzan carpetas y salas: sólo orden por fecha (índice por carpeta no sirve)
+META_KEYSET = Keyset("created", [(File.created_at, DESC), (File.id, DESC)])
 
 class SearchController:
     def __init__(self):
@@ -31,29 +40,24 @@ class SearchController:
         )
         return base
 
-    def _apply_cursor(self, stmt, cursor: str | None):
-        # cursor formateado como "created_at_iso|id"
-        if not cursor:
-            return stmt
+    def _folder_scope(self, db):
+        # folder_id opcional: limita la búsqueda al subárbol (índice de rutas)
+        # None = sin filtro; False = carpeta ajena o inexistente
+        raw = request.args.get("folder_id")
+        if not raw:
+            return None
         try:
-            created_iso, id_str = cursor.split("|", 1)
-            # created_at DESC, id DESC → "menor a" ambos
-            return stmt.where(
-                or_(
-                    File.created_at < created_iso,  # ISO funciona si DB guarda timestamptz comparable
-                    and_(File.created_at == created_iso, File.id < int(id_str)),
-                )
-            )
-        except Exception:
-            return stmt
-
-    def _make_cursor(self, row):
-        # row trae created_at e id
-        return f"{row.created_at.isoformat()}|{row.id}"
+            fid = int(raw)
+        except ValueError:
+            return False
+        if not owned_folder(db, fid, g.user_id):
+            return False
+        return File.folder_id.in_(subtree_ids(db, fid))
 
     def search_meta(self):
         # Parámetros:
-        # name (ilike/trgm), date_from (YYYY-MM-DD), date_to, size_min_mb, size_max_mb, limit (<=50), cursor
+        # name (ilike/trgm), date_from (YYYY-MM-DD), date_to, size_min_mb, size_max_mb, limit (<=50), cursor,
+        # folder_id (subárbol), facets (1 = conteos por tamaño, mes y carpeta)
         name = (request.args.get("name") or "").strip()
         date_from = (request.args.get("date_from") or "").strip()
         date_to = (request.args.get("date_to") or "").strip()
@@ -61,9 +65,19 @@ class SearchController:
         size_max_mb = request.args.get("size_max_mb")
         limit = min(int(request.args.get("limit", "10") or "10"), 50)
         cursor = request.args.get("cursor")
+        facets = request.args.get("facets") in ("1", "true")
+
+        filters = {
+            "name": name, "date_from": date_from, "date_to": date_to,
+            "size_min_mb": size_min_mb, "size_max_mb": size_max_mb,
+            "folder_id": request.args.get("folder_id"),
+        }
+        params = {**filters, "limit": limit, "cursor": cursor}
 
-        with session() as db:
+        def matching():
             stmt = self._owner_join(db)
+            if scope is not None:
+                stmt = stmt.where(scope)
 
             if name:
                 # Postgres con pg_trgm aprovecha ILIKE + trigram index
@@ -78,12 +92,10 @@ class SearchController:
                 stmt = stmt.where(File.size_bytes >= int(float(size_min_mb) * 1024 * 1024))
             if size_max_mb:
                 stmt = stmt.where(File.size_bytes <= int(float(size_max_mb) * 1024 * 1024))
+            return stmt
 
-            # Orden para keyset
-            stmt = stmt.order_by(File.created_at.desc(), File.id.desc())
-            stmt = self._apply_cursor(stmt, cursor)
-            rows = db.execute(stmt.limit(limit + 1)).all()
-
+        def compute():
+            rows, next_cursor = META_KEYSET.page(db, matching(), limit, cursor)
             items = [
                 {
                     "id": r.id,
@@ -93,69 +105,65 @@ class SearchController:
                     "created_at": r.created_at.isoformat() if r.created_at else None,
                     "folder_id": r.folder_id,
                 }
-                for r in rows[:limit]
+                for r in rows
             ]
-            next_cursor = self._make_cursor(rows[-1]) if len(rows) > limit else None
-            return jsonify({"items": items, "next_cursor": next_cursor})
+            return {"items": items, "next_cursor": next_cursor}
+
+        def summarize():
+            # no depende del cursor: una entrada de caché sirve a todas las páginas
+            if not facets:
+                return {"total": count_total(db, matching())}
+            counts = facet_counts(db, matching())
+            # las facetas ya recorren todo: el total exacto sale gratis
+            return {"total": {"value": sum(b["count"] for b in counts["size"]), "relation": "eq"}, "facets": counts}
+
+        with read_session() as db:
+            scope = self._folder_scope(db)
+            if scope is False:
+                return jsonify({"error": "folder not found"}), 404
+            try:
+                page = search_cache.get_or_compute(db, g.user_id, "meta", params, compute)
+            except BadCursor:
+                return jsonify({"error": "bad cursor"}), 400
+            # el total va en la primera página (y siempre que se piden facetas)
+            if not cursor or facets:
+                summary = search_cache.get_or_compute(
+                    db, g.user_id, "meta_summary", {**filters, "facets": facets}, summarize
+                )
+                page = {**page, **summary}
+            return jsonify(page)
 
     def search_content(self):
-        # Parámetros: q (texto), limit (<=50), cursor
+        # Parámetros: q (texto), limit (<=50), cursor, sort (created | relevance),
+        # pages (páginas con match por archivo, <=10), folder_id (subárbol)
         q = (request.args.get("q") or "").strip()
         if not q:
             return jsonify({"items": [], "next_cursor": None})
 
         limit = min(int(request.args.get("limit", "10") or "10"), 50)
+        pages_per_file = min(int(request.args.get("pages", "3") or "3"), 10)
+        sort = request.args.get("sort", "created")
+        if sort not in SORTS:
+            return jsonify({"error": "invalid sort"}), 400
         cursor = request.args.get("cursor")
 
-        with session() as db:
-            uid = g.user_id
-            # full-text simple sobre FileText.content_plain
-            ts_query = func.to_tsquery('simple', ' & '.join(q.split()))
-            stmt = (
-                select(
-                    File.id,
-                    File.name,
-                    File.size_bytes,
-                    File.mime_type,
-                    File.created_at,
-                    File.folder_id,
-                    # snippet simple: primera aparición resaltada
-                    func.ts_headline('simple', FileText.content_plain, ts_query).label("snippet"),
-                )
-                .select_from(FileText)
-                .join(File, File.id == FileText.file_id)
-                .join(Folder, Folder.id == File.folder_id)
-                .join(Dataroom, Dataroom.id == Folder.dataroom_id)
-                .where(Dataroom.owner_id == uid)
-                .where(func.to_tsvector('simple', FileText.content_plain).op('@@')(ts_query))
-                .order_by(File.created_at.desc(), File.id.desc())
-            )
-
-            # cursor
-            if cursor:
-                try:
-                    created_iso, id_str = cursor.split("|", 1)
-                    stmt = stmt.where(
-                        or_(
-                            File.created_at < created_iso,
-                            and_(File.created_at == created_iso, File.id < int(id_str)),
-                        )
+        params = {
+            "q": q, "limit": limit, "cursor": cursor, "sort": sort, "pages": pages_per_file,
+            "folder_id": request.args.get("folder_id"),
+        }
+        with read_session() as db:
+            scope = self._folder_scope(db)
+            if scope is False:
+                return jsonify({"error": "folder not found"}), 404
+            # Postgres (tsvector) o SQLite (FTS5), según DATABASE_URL
+            try:
+                return jsonify(
+                    search_cache.get_or_compute(
+                        db, g.user_id, "content", params,
+                        lambda: search_engine.search_content(
+                            db, g.user_id, q, limit, cursor, sort, pages_per_file, scope
+                        ),
                     )
-                except Exception:
-                    pass
-
-            rows = db.execute(stmt.limit(limit + 1)).all()
-            items = [
-                {
-                    "id": r.id,
-                    "name": r.name,
-                    "size_bytes": r.size_bytes,
-                    "mime_type": r.mime_type,
-                    "created_at": r.created_at.isoformat() if r.created_at else None,
-                    "folder_id": r.folder_id,
-                    "snippet": r.snippet,
-                }
-                for r in rows[:limit]
-            ]
-            next_cursor = f"{rows[-1].created_at.isoformat()}|{rows[-1].id}" if len(rows) > limit else None
-            return jsonify({"items": items, "next_cursor": next_cursor})
+                )
+            except BadCursor:
+                return jsonify({"error": "bad cursor"}), 400
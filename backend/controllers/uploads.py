@@ -0,0 +1,133 @@
+from flask import Blueprint, request, jsonify, g
+from ..db import session, read_session
+from ..config import RESUMABLE_MAX_MB
+from ..services.access import owned_folder
+from ..services.storage import NotPdfError, hash_pdf_file
+from ..services.uploads import create_uploaded_file
+from ..services.resumable import (
+    create_upload, live_upload, chunk_length, write_chunk, record_chunk, progress,
+    claim, reopen, drop_upload, data_path, IncompleteChunk, STATUS_OPEN,
+)
+
+
+class UploadsController:
+    """Resumable uploads (services/resumable.py) for PDFs above MAX_CONTENT_LENGTH_MB."""
+
+    def __init__(self):
+        self.bp = Blueprint("uploads", __name__)
+        self.bp.add_url_rule("/folders/<int:fid>/uploads", view_func=self.create, methods=["POST"])
+        self.bp.add_url_rule("/uploads/<sid>", view_func=self.status, methods=["GET"])
+        self.bp.add_url_rule("/uploads/<sid>/chunks/<int:start>", view_func=self.put_chunk, methods=["PUT"])
+        self.bp.add_url_rule("/uploads/<sid>/complete", view_func=self.complete, methods=["POST"])
+        self.bp.add_url_rule("/uploads/<sid>", view_func=self.abort, methods=["DELETE"])
+
+    def create(self, fid: int):
+        uid = g.user_id
+        data = request.get_json(force=True)
+        filename = (data.get("filename") or "").strip()
+        size_bytes = data.get("size_bytes")
+        if not filename or not filename.lower().endswith(".pdf"):
+            return jsonify({"error": "only pdf allowed"}), 400
+        if not isinstance(size_bytes, int) or size_bytes <= 0:
+            return jsonify({"error": "size_bytes must be a positive integer"}), 400
+        if size_bytes > RESUMABLE_MAX_MB * 1024 * 1024:
+            return jsonify({"error": "file too large"}), 413
+        with session() as db:
+            if not owned_folder(db, fid, uid):
+                return jsonify({"error": "folder not found"}), 404
+            up = create_upload(db, fid, uid, filename, size_bytes)
+            db.commit()
+            return jsonify(progress(db, up)), 201
+
+    def status(self, sid: str):
+        # el cliente que retoma pregunta qué offsets faltan
+        with read_session(replica=False) as db:
+            up = live_upload(db, sid, g.user_id)
+            if not up:
+                return jsonify({"error": "not found"}), 404
+            return jsonify(progress(db, up))
+
+    def put_chunk(self, sid: str, start: int):
+        # cuerpo crudo (application/octet-stream) con exactamente los bytes del chunk
+        uid = g.user_id
+        with read_session(replica=False) as db:
+            up = live_upload(db, sid, uid)
+            if not up:
+                return jsonify({"error": "not found"}), 404
+            if up.status != STATUS_OPEN:
+                return jsonify({"error": "upload is being completed"}), 409
+            length = chunk_length(up, start)
+        if length is None:
+            return jsonify({"error": "offset is not a chunk boundary"}), 400
+        if request.content_length != length:
+            return jsonify({"error": f"chunk at {start} must be {length} bytes", "expected": length}), 400
+
+        # sin transacción abierta mientras llegan los bytes
+        try:
+            write_chunk(sid, start, length, request.stream)
+        except IncompleteChunk:
+            return jsonify({"error": "incomplete chunk"}), 400
+        except FileNotFoundError:
+            # la sesión expiró o se canceló durante la escritura
+            return jsonify({"error": "not found"}), 404
+
+        with session() as db:
+            if not live_upload(db, sid, uid):
+                return jsonify({"error": "not found"}), 404
+            record_chunk(db, sid, start, length)
+            db.commit()
+        return jsonify({"start": start, "size": length})
+
+    def complete(self, sid: str):
+        uid = g.user_id
+        with session() as db:
+            up = live_upload(db, sid, uid)
+            if not up:
+                return jsonify({"error": "not found"}), 404
+            missing = progress(db, up)["missing"]
+            if missing:
+                return jsonify({"error": "upload incomplete", "missing": missing}), 409
+            if not owned_folder(db, up.folder_id, uid):
+                return jsonify({"error": "folder not found"}), 404
+            if not claim(db, sid):
+                return jsonify({"error": "upload is being completed"}), 409
+            fid, filename = up.folder_id, up.filename
+            db.commit()
+
+        # lectura secuencial + hash fuera de la transacción; create_uploaded_file lo mueve al blob store
+        try:
+            staged = hash_pdf_file(data_path(sid))
+        except NotPdfError:
+            with session() as db:
+                drop_upload(db, sid)
+                db.commit()
+            return jsonify({"error": "only pdf allowed"}), 400
+        except Exception:
+            # error de E/S: la sesión vuelve a open y el cliente puede reintentar
+            reopen(sid)
+            raise
+
+        try:
+            with session() as db:
+                folder_acc = owned_folder(db, fid, uid)
+                if not folder_acc:
+                    # carpeta borrada mientras se ensamblaba: drop_upload también borra los bytes
+                    drop_upload(db, sid)
+                    db.commit()
+                    return jsonify({"error": "folder not found"}), 404
+                result = create_uploaded_file(db, folder_acc.folder, uid, filename, staged)
+                # el archivo de datos ya está en el blob store: sólo quedan las filas de la sesión
+                drop_upload(db, sid)
+                db.commit()
+        except Exception:
+            reopen(sid)
+            raise
+        return jsonify(result), 201
+
+    def abort(self, sid: str):
+        with session() as db:
+            if not live_upload(db, sid, g.user_id):
+                return jsonify({"error": "not found"}), 404
+            drop_upload(db, sid)
+            db.commit()
+            return jsonify({"ok": True})
@@ -1,11 +1,73 @@
+"""
+Engines and session factories.
+
+    session()                     read-write, primary; commits on exit
+    read_session()                read-only, replica if DATABASE_REPLICA_URL is set; never commits
+    read_session(replica=False)   read-only on the primary, for read-your-writes pages
+
+Read-only sessions end with a rollback (which returns the connection to
+the pool) instead of a COMMIT. On Postgres their transactions are also
+declared READ ONLY, so a stray write fails loudly instead of landing on
+the wrong server.
+"""
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, update, false
 from sqlalchemy.orm import sessionmaker
-from .config import DATABASE_URL
+from .config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+
+def make_engine(url: str):
+    connect_args = {}
+    pool_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    if url.startswith("postgresql") and DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    if ":memory:" not in url:
+        # SQLite en memoria usa SingletonThreadPool, que no acepta estos parámetros
+        pool_args = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+        }
+    return create_engine(url, future=True, pool_pre_ping=True, connect_args=connect_args, **pool_args)
+
+
+def _read_only(e):
+    # psycopg abre las transacciones con BEGIN READ ONLY; otros dialectos no tienen la opción
+    return e.execution_options(postgresql_readonly=True) if e.dialect.name == "postgresql" else e
+
+
+engine = make_engine(DATABASE_URL)
+replica_engine = make_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, future=True, pool_pre_ping=True, connect_args=connect_args)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+PrimaryReadSessionLocal = sessionmaker(bind=_read_only(engine), autoflush=False, autocommit=False, future=True)
+ReplicaReadSessionLocal = (
+    sessionmaker(bind=_read_only(replica_engine), autoflush=False, autocommit=False, future=True)
+    if replica_engine is not None
+    else PrimaryReadSessionLocal
+)
+
+def lock_for_write(db, model) -> None:
+    """
+    SQLite only: start the write transaction now. SQLite has one writer at a
+    time, so nothing the caller reads next can change before it commits.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    # un UPDATE vacío alcanza para tomar el lock de escritura (toda la base) hasta el commit
+    db.execute(update(model).where(false()).values(id=model.id).execution_options(synchronize_session=False))
+
 
 @contextmanager
 def session():
@@ -18,3 +80,13 @@ def session():
         raise
     finally:
         db.close()
+
+
+@contextmanager
+def read_session(replica: bool = True):
+    db = (ReplicaReadSessionLocal if replica else PrimaryReadSessionLocal)()
+    try:
+        yield db
+    finally:
+        # close() hace rollback y devuelve la conexión: no hay nada que confirmar
+        db.close()
@@ -0,0 +1,133 @@
+# backend/frozen_schema.py
+"""
+Tables exactly as the migrations that create them released them (see
+migrations.py). models.py keeps evolving; these definitions never do, so
+migration 1 builds the same schema on a fresh database today as it did
+when it shipped, and every later change comes from its own migration.
+
+Never edit a table here; add a migration instead.
+"""
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, UniqueConstraint, func,
+)
+
+frozen = MetaData()
+
+# ---- v1 (baseline) ----
+
+users = Table(
+    "users", frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("email", String(255), unique=True, nullable=False, index=True),
+    Column("password_hash", String(255), nullable=False),
+    Column("theme", String(10), nullable=False),
+    Column("search_generation", Integer, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+datarooms = Table(
+    "datarooms", frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(255), nullable=False, index=True),
+    Column("owner_id", ForeignKey("users.id", ondelete="CASCADE"), index=True),
+    Column("root_folder_id", ForeignKey("folders.id", ondelete="SET NULL"), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+folders = Table(
+    "folders", frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(255), nullable=False),
+    Column("dataroom_id", ForeignKey("datarooms.id", ondelete="CASCADE"), index=True),
+    Column("parent_id", ForeignKey("folders.id", ondelete="CASCADE"), nullable=True),
+    Column("path", String(1024), nullable=True),
+    Column("files_direct", Integer, nullable=False),
+    Column("bytes_direct", BigInteger, nullable=False),
+    Column("files_total", Integer, nullable=False),
+    Column("bytes_total", BigInteger, nullable=False),
+    Column("last_modified_at", DateTime(timezone=True), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    UniqueConstraint("dataroom_id", "parent_id", "name", name="uq_folder_siblings"),
+)
+
+files = Table(
+    "files", frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("folder_id", ForeignKey("folders.id", ondelete="CASCADE"), index=True),
+    Column("name", String(255), nullable=False),
+    Column("stored_name", String(255), nullable=False),
+    Column("mime_type", String(128), nullable=False),
+    Column("size_bytes", Integer, nullable=False),
+    Column("checksum_sha256", String(64), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+blobs = Table(
+    "blobs", frozen,
+    Column("checksum_sha256", String(64), primary_key=True),
+    Column("size_bytes", Integer, nullable=False),
+    Column("refcount", Integer, nullable=False),
+    Column("orphaned_at", DateTime(timezone=True), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+file_texts = Table(
+    "file_texts", frozen,
+    Column("file_id", ForeignKey("files.id", ondelete="CASCADE"), primary_key=True),
+    Column("content_plain", Text),
+    Column("status", String(16), nullable=False),
+)
+
+file_page_texts = Table(
+    "file_page_texts", frozen,
+    Column("file_id", ForeignKey("files.id", ondelete="CASCADE"), primary_key=True),
+    Column("page_no", Integer, primary_key=True),
+    Column("content", Text),
+)
+
+extraction_jobs = Table(
+    "extraction_jobs", frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("file_id", ForeignKey("files.id", ondelete="CASCADE"), index=True),
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("last_error", Text, nullable=True),
+    Column("locked_at", DateTime(timezone=True), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+disk_gc_queue = Table(
+    "disk_gc_queue", frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("relpath", String(512), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+BASELINE_TABLES = [
+    users, datarooms, folders, files, blobs, file_texts, file_page_texts, extraction_jobs, disk_gc_queue,
+]
+
+# ---- v3 (resumable uploads) ----
+
+upload_sessions = Table(
+    "upload_sessions", frozen,
+    Column("id", String(32), primary_key=True),
+    Column("owner_id", ForeignKey("users.id", ondelete="CASCADE"), index=True),
+    Column("folder_id", ForeignKey("folders.id", ondelete="CASCADE"), index=True),
+    Column("filename", String(255), nullable=False),
+    Column("size_bytes", BigInteger, nullable=False),
+    Column("chunk_size", Integer, nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False, index=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+upload_chunks = Table(
+    "upload_chunks", frozen,
+    Column("session_id", ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True),
+    Column("start", BigInteger, primary_key=True),
+    Column("size", Integer, nullable=False),
+)
+
+RESUMABLE_UPLOAD_TABLES = [upload_sessions, upload_chunks]
@@ -0,0 +1,161 @@
+# backend/migrations.py
+"""
+Versioned, run-once schema migrations.
+
+``schema_version`` records every applied migration. ``upgrade()`` applies
+the pending ones in order, each in its own transaction together with its
+version row. On Postgres it holds an advisory lock while doing so; on
+SQLite every step starts with BEGIN IMMEDIATE (the database write lock)
+and re-reads schema_version under it. Either way, when several processes
+try at once (e.g. gunicorn workers with AUTO_MIGRATE), one runs the DDL
+and the others wait, then find nothing left to do.
+
+Web workers never run DDL on import; ``check_schema()`` costs one catalog
+lookup plus a MAX(version) and refuses to start an app whose database is
+behind (unless AUTO_MIGRATE). A database ahead of the code is accepted, so
+old workers keep serving during a rolling deploy.
+
+New schema changes are appended to MIGRATIONS; released entries are never
+edited. Migrations that create tables take them from frozen_schema.py,
+not from the live models.
+"""
+import logging
+from datetime import datetime, timezone
+import click
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, func, insert, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from .frozen_schema import frozen, BASELINE_TABLES, RESUMABLE_UPLOAD_TABLES
+from .bootstrap import (
+    ensure_extensions, ensure_schema, ensure_indexes, ensure_sort_indexes, ensure_name_indexes,
+    widen_file_sizes,
+)
+from .services.names import dedupe_file_names
+
+log = logging.getLogger(__name__)
+
+# clave arbitraria pero fija: todos los procesos de la app compiten por la misma
+ADVISORY_LOCK_KEY = 0x6461746172
+# SQLite: espera por el lock de escritura mientras otro proceso migra (como pg_advisory_lock)
+SQLITE_LOCK_TIMEOUT_MS = 10 * 60 * 1000
+
+_meta = MetaData()
+schema_version = Table(
+    "schema_version",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def _resumable_uploads(conn: Connection) -> None:
+    frozen.create_all(conn, tables=RESUMABLE_UPLOAD_TABLES)
+
+
+def _unique_file_names(conn: Connection) -> None:
+    # sin restricción hubo carreras: los duplicados se renombran antes de crear el índice único
+    renamed = dedupe_file_names(conn)
+    if renamed:
+        log.info("renamed %d duplicated file names", renamed)
+    ensure_name_indexes(conn)
+
+
+def _baseline(conn: Connection) -> None:
+    # lo que antes corría en cada import; idempotente, así adopta bases existentes
+    frozen.create_all(conn, tables=BASELINE_TABLES)
+    ensure_extensions(conn)
+    ensure_schema(conn)
+    ensure_indexes(conn)
+
+
+# (versión, nombre, fn(conn)); sólo se agregan al final
+MIGRATIONS = [
+    (1, "baseline", _baseline),
+    (2, "listing sort indexes", ensure_sort_indexes),
+    (3, "resumable uploads", _resumable_uploads),
+    (4, "unique file names", _unique_file_names),
+    (5, "bigint file sizes", widen_file_sizes),
+]
+HEAD = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def _begin_step(conn: Connection):
+    """Transaction for one upgrade step; on SQLite it holds the write lock from the start."""
+    tx = conn.begin()
+    if conn.dialect.name == "sqlite":
+        # pysqlite no abre transacción antes de un DDL: la abrimos nosotros, ya con el lock
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return tx
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[int]:
+    """Apply pending migrations (up to target); returns the versions applied."""
+    applied: list[int] = []
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": ADVISORY_LOCK_KEY})
+            conn.commit()
+        elif dialect == "sqlite":
+            busy_timeout = conn.exec_driver_sql("PRAGMA busy_timeout").scalar()
+            conn.exec_driver_sql(f"PRAGMA busy_timeout = {SQLITE_LOCK_TIMEOUT_MS}")
+            conn.commit()
+        try:
+            with _begin_step(conn):
+                schema_version.create(conn, checkfirst=True)
+            for version, name, fn in MIGRATIONS:
+                if target is not None and version > target:
+                    continue
+                with _begin_step(conn):
+                    # leído con el lock tomado: otro proceso pudo migrar mientras esperábamos
+                    if conn.execute(
+                        select(schema_version.c.version).where(schema_version.c.version == version)
+                    ).first():
+                        continue
+                    log.info("migrating schema to v%d (%s)", version, name)
+                    fn(conn)
+                    conn.execute(insert(schema_version).values(
+                        version=version, name=name, applied_at=datetime.now(timezone.utc)
+                    ))
+                applied.append(version)
+        finally:
+            if dialect == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_KEY})
+                conn.commit()
+            elif dialect == "sqlite":
+                conn.exec_driver_sql(f"PRAGMA busy_timeout = {busy_timeout}")
+                conn.commit()
+    return applied
+
+
+def check_schema(engine: Engine, auto_migrate: bool) -> None:
+    """Startup check: fail fast (or migrate, if auto_migrate) when the database is behind."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version > HEAD:
+        log.warning("database schema v%d is newer than this code (v%d)", version, HEAD)
+        return
+    if version == HEAD:
+        return
+    if auto_migrate:
+        upgrade(engine)
+        return
+    message = (
+        f"database schema is at v{version}, this code needs v{HEAD}: "
+        "run `flask --app backend.app db-upgrade`"
+    )
+    if click.get_current_context(silent=True) is not None:
+        # cargado desde la CLI de flask: db-upgrade necesita poder importar la app
+        log.warning(message)
+        return
+    raise SchemaOutOfDate(message)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, ForeignKey, DateTime, func, UniqueConstraint, Text
+from sqlalchemy import Integer, BigInteger, String, ForeignKey, DateTime, func, UniqueConstraint, Index, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 class Base(DeclarativeBase):
@@ -12,6 +12,8 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(255), unique=True, nullable=False, index=True)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     theme: Mapped[str] = mapped_column(String(10), nullable=False, default="light")
+    # se incrementa con cada escritura que cambia resultados de búsqueda (services/search_cache.py)
+    search_generation: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     created_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 class Dataroom(Base):
@@ -33,7 +35,6 @@ class Dataroom(Base):
         "Folder",
         foreign_keys=[root_folder_id],
         post_update=True,
-        lazy="joined",
     )
 
 class Folder(Base):
@@ -42,6 +43,14 @@ class Folder(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     dataroom_id: Mapped[int] = mapped_column(ForeignKey("datarooms.id", ondelete="CASCADE"), index=True)
     parent_id: Mapped[int | None] = mapped_column(ForeignKey("folders.id", ondelete="CASCADE"), nullable=True)
+    # ruta materializada por ids, "/<root>/.../<id>/" (services/tree.py)
+    path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    # agregados desnormalizados (services/folder_stats.py): directos y de todo el subárbol
+    files_direct: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    bytes_direct: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    files_total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    bytes_total: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_modified_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     dataroom: Mapped["Dataroom"] = relationship(
@@ -74,7 +83,7 @@ class File(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     stored_name: Mapped[str] = mapped_column(String(255), nullable=False)
     mime_type: Mapped[str] = mapped_column(String(128), nullable=False)
-    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
     checksum_sha256: Mapped[str] = mapped_column(String(64), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -86,7 +95,69 @@ class File(Base):
         primaryjoin="File.folder_id==Folder.id",
     )
 
+    # services/names.py resuelve colisiones; el índice las impide entre escrituras concurrentes
+    __table_args__ = (Index("uq_files_folder_name", "folder_id", "name", unique=True),)
+
+class Blob(Base):
+    """Content-addressed PDF bytes shared by every File with the same checksum."""
+    __tablename__ = "blobs"
+    checksum_sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # set when refcount drops to 0; the GC removes the bytes after a grace period
+    orphaned_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
 class FileText(Base):
     __tablename__ = "file_texts"
     file_id: Mapped[int] = mapped_column(ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
-    content_plain: Mapped[str] = mapped_column(Text, default="")
\ No newline at end of file
+    content_plain: Mapped[str] = mapped_column(Text, default="")
+    # pending -> done | failed (see services/extraction.py)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+
+class FilePageText(Base):
+    """Extracted text per page (1-based), next to the whole-document FileText."""
+    __tablename__ = "file_page_texts"
+    file_id: Mapped[int] = mapped_column(ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    page_no: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content: Mapped[str] = mapped_column(Text, default="")
+
+class ExtractionJob(Base):
+    __tablename__ = "extraction_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    file_id: Mapped[int] = mapped_column(ForeignKey("files.id", ondelete="CASCADE"), index=True)
+    # queued -> running -> (deleted on success) | queued (retry) | failed
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class UploadSession(Base):
+    """Resumable upload in progress (services/resumable.py); its bytes sit in one preallocated file."""
+    __tablename__ = "upload_sessions"
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    folder_id: Mapped[int] = mapped_column(ForeignKey("folders.id", ondelete="CASCADE"), index=True)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    # open -> assembling -> (deleted once the File row exists)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="open")
+    # pushed forward by every chunk; past it the collector deletes the session
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class UploadChunk(Base):
+    """A chunk of an UploadSession that is fully on disk."""
+    __tablename__ = "upload_chunks"
+    session_id: Mapped[str] = mapped_column(ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True)
+    start: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+
+class DiskGcItem(Base):
+    """Directory under UPLOAD_DIR left behind by a delete; removed by the disk collector."""
+    __tablename__ = "disk_gc_queue"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    relpath: Mapped[str] = mapped_column(String(512), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,76 @@
+# backend/services/access.py
+"""
+Ownership checks shared by all controllers.
+
+Each resolver answers "does uid own this file/folder/room?" with a single
+joined query and returns the row together with what callers usually need
+next (dataroom id, on-disk path), so nothing re-fetches Folder/Dataroom.
+Results are memoised per request (and per session) on flask.g.
+"""
+from typing import NamedTuple
+from flask import g, has_request_context
+from sqlalchemy import select
+from ..models import Dataroom, Folder, File
+from .blobs import file_disk_path
+
+
+class FileAccess(NamedTuple):
+    file: File
+    folder_id: int
+    dataroom_id: int
+    disk_path: str
+    folder_path: str
+
+
+class FolderAccess(NamedTuple):
+    folder: Folder
+    dataroom_id: int
+
+
+def _memo(db, key, load):
+    if not has_request_context():
+        return load()
+    cache = g.setdefault("_access_cache", {})
+    # las instancias ORM pertenecen a la sesión: la incluimos en la clave
+    k = (db, *key)
+    if k not in cache:
+        cache[k] = load()
+    return cache[k]
+
+
+def owned_file(db, file_id: int, uid: int) -> FileAccess | None:
+    def load():
+        row = db.execute(
+            select(File, Folder.dataroom_id, Folder.path)
+            .join(Folder, Folder.id == File.folder_id)
+            .join(Dataroom, Dataroom.id == Folder.dataroom_id)
+            .where(File.id == file_id, Dataroom.owner_id == uid)
+        ).first()
+        if not row:
+            return None
+        f, rid, path = row
+        return FileAccess(f, f.folder_id, rid, file_disk_path(rid, f.folder_id, f.stored_name), path)
+
+    return _memo(db, ("file", file_id, uid), load)
+
+
+def owned_folder(db, folder_id: int, uid: int) -> FolderAccess | None:
+    def load():
+        f = db.execute(
+            select(Folder)
+            .join(Dataroom, Dataroom.id == Folder.dataroom_id)
+            .where(Folder.id == folder_id, Dataroom.owner_id == uid)
+        ).scalar_one_or_none()
+        return FolderAccess(f, f.dataroom_id) if f else None
+
+    return _memo(db, ("folder", folder_id, uid), load)
+
+
+def owned_room(db, rid: int, uid: int) -> Dataroom | None:
+    return _memo(
+        db,
+        ("room", rid, uid),
+        lambda: db.execute(
+            select(Dataroom).where(Dataroom.id == rid, Dataroom.owner_id == uid)
+        ).scalar_one_or_none(),
+    )
@@ -0,0 +1,20 @@
+# backend/services/auth_tokens.py
+"""Bearer-token check shared by the Flask auth guard and the ASGI routes."""
+import os
+import jwt
+
+
+def auth_required() -> bool:
+    return os.getenv("AUTH_REQUIRED", "true").lower() == "true"
+
+
+def user_id_from_authorization(header: str | None) -> int | None:
+    """uid from an "Authorization: Bearer <jwt>" header; None if missing, invalid or expired."""
+    if not header or not header.startswith("Bearer "):
+        return None
+    token = header.split(" ", 1)[1].strip()
+    try:
+        data = jwt.decode(token, os.getenv("SECRET_KEY", "dev-secret"), algorithms=["HS256"])
+        return int(data["sub"])
+    except Exception:
+        return None
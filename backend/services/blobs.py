@@ -0,0 +1,214 @@
+# backend/services/blobs.py
+"""
+Content-addressed blob store.
+
+PDF bytes live once under UPLOAD_DIR/blobs/<aa>/<bb>/<sha256>.pdf and are
+shared by every File row with that checksum (File.stored_name holds the
+relative blob path). The ``blobs`` table keeps a reference count; deletes
+only drop references and ``collect_orphans`` removes bytes that stayed
+unreferenced for BLOB_GC_GRACE_MINUTES.
+
+Uploads are hashed into a temp file first (``stage_pdf_stream``) and
+enter the store through ``store``. It commits a blob row marked as just
+orphaned *before* renaming the bytes in, then references them in the
+caller's transaction. The GC deletes a row and its bytes in one
+transaction, only once the row is past the grace period. So either the
+upload's mark waits for the GC to finish, or the GC finds a fresh mark
+and leaves the bytes alone. If the upload fails or crashes after the
+rename, the mark is what the GC later finds.
+
+Rows created before the blob store keep the legacy
+UPLOAD_DIR/<rid>/<folder_id>/<uuid>.pdf layout; ``file_disk_path`` handles both.
+Moving or copying such a file out of its directory hardlinks it into the
+blob store first (``link_legacy_files``).
+"""
+import os
+import shutil
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, case, func
+from ..db import session, engine
+from ..models import Blob, File
+from ..config import UPLOAD_DIR, BLOB_GC_GRACE_MINUTES
+from .storage import write_pdf_stream, PdfWriter, StagedPdf
+
+BLOB_PREFIX = "blobs/"
+BLOB_TMP_DIR = os.path.join(UPLOAD_DIR, "blobs", "tmp")
+
+
+def blob_relpath(checksum: str) -> str:
+    return f"{BLOB_PREFIX}{checksum[:2]}/{checksum[2:4]}/{checksum}.pdf"
+
+
+def is_blob(stored_name: str) -> bool:
+    return stored_name.startswith(BLOB_PREFIX)
+
+
+def file_disk_path(dataroom_id: int, folder_id: int, stored_name: str) -> str:
+    if is_blob(stored_name):
+        return os.path.join(UPLOAD_DIR, stored_name)
+    return os.path.join(UPLOAD_DIR, str(dataroom_id), str(folder_id), stored_name)
+
+
+def _blob_disk_path(checksum: str) -> str:
+    return os.path.join(UPLOAD_DIR, blob_relpath(checksum))
+
+
+def stage_pdf_stream(stream, max_bytes: int | None = None) -> StagedPdf:
+    """Hash an upload into a temp file next to the store; ``store`` moves it in."""
+    return write_pdf_stream(stream, BLOB_TMP_DIR, max_bytes)
+
+
+def blob_writer() -> PdfWriter:
+    """Incremental variant of stage_pdf_stream."""
+    return PdfWriter(BLOB_TMP_DIR)
+
+
+def _upsert():
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(Blob)
+
+
+def acquire(db, checksum: str, size_bytes: int, n: int = 1) -> None:
+    """Add n references to a blob (creating its row if needed)."""
+    stmt = _upsert().values(checksum_sha256=checksum, size_bytes=size_bytes, refcount=n)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.checksum_sha256],
+        set_={"refcount": Blob.refcount + n, "orphaned_at": None},
+    )
+    db.execute(stmt)
+
+
+def _mark_incoming(db, checksum: str, size_bytes: int) -> None:
+    # fila nueva, o sin referencias, como recién huérfana: el GC no la toca durante el período de gracia
+    now = datetime.now(timezone.utc)
+    stmt = _upsert().values(checksum_sha256=checksum, size_bytes=size_bytes, refcount=0, orphaned_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.checksum_sha256],
+        set_={"orphaned_at": case((Blob.refcount <= 0, now), else_=Blob.orphaned_at)},
+    )
+    db.execute(stmt)
+
+
+def store(db, staged: list[StagedPdf]) -> list[str]:
+    """
+    Move staged uploads into the store and add one reference per item;
+    returns their stored names. Commits the caller's transaction first, so
+    call it before the rows that reference the blobs are written.
+    """
+    for s in staged:
+        _mark_incoming(db, s.checksum, s.size_bytes)
+    db.commit()
+    for s in staged:
+        s.place(_blob_disk_path(s.checksum))
+    refs = Counter(s.checksum for s in staged)
+    sizes = {s.checksum: s.size_bytes for s in staged}
+    for checksum, n in refs.items():
+        acquire(db, checksum, sizes[checksum], n)
+    return [blob_relpath(s.checksum) for s in staged]
+
+
+def release(db, counts: dict[str, int]) -> None:
+    """Drop references; blobs reaching zero are stamped for the GC."""
+    now = datetime.now(timezone.utc)
+    for checksum, n in counts.items():
+        db.execute(
+            update(Blob)
+            .where(Blob.checksum_sha256 == checksum)
+            .values(
+                refcount=Blob.refcount - n,
+                orphaned_at=case((Blob.refcount - n <= 0, now), else_=Blob.orphaned_at),
+            )
+        )
+
+
+def release_files(db, *criteria) -> None:
+    """Drop the blob references held by every File matching criteria (before deleting them)."""
+    rows = db.execute(
+        select(File.checksum_sha256, func.count())
+        .where(File.stored_name.like(f"{BLOB_PREFIX}%"), *criteria)
+        .group_by(File.checksum_sha256)
+    ).all()
+    release(db, {checksum: n for checksum, n in rows})
+
+
+def acquire_files(db, *criteria) -> None:
+    """Add one blob reference per File matching criteria (after inserting copies)."""
+    matching = [File.stored_name.like(f"{BLOB_PREFIX}%"), *criteria]
+    db.execute(
+        update(Blob)
+        .where(Blob.checksum_sha256.in_(select(File.checksum_sha256).where(*matching)))
+        .values(
+            refcount=Blob.refcount
+            + select(func.count()).where(File.checksum_sha256 == Blob.checksum_sha256, *matching).scalar_subquery(),
+            orphaned_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def link_legacy_files(db, dataroom_id: int, *criteria) -> int:
+    """
+    Move legacy files matching criteria (all in dataroom_id) into the blob
+    store without copying bytes: hardlink, reference, repoint stored_name.
+    Their old path stays until its directory is collected. Returns how many.
+    """
+    rows = db.execute(
+        select(File.id, File.folder_id, File.stored_name, File.checksum_sha256, File.size_bytes)
+        .where(~File.stored_name.startswith(BLOB_PREFIX), *criteria)
+    ).all()
+    for file_id, folder_id, stored_name, checksum, size in rows:
+        # referencia antes del enlace: si el GC está borrando este blob, esperamos a que termine
+        acquire(db, checksum, size)
+        dst = _blob_disk_path(checksum)
+        if not os.path.exists(dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            src = file_disk_path(dataroom_id, folder_id, stored_name)
+            try:
+                os.link(src, dst)
+            except FileExistsError:
+                pass
+            except OSError:
+                # sin hardlinks (p. ej. otro filesystem): copia y rename atómico
+                tmp = f"{dst}.{file_id}.part"
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, dst)
+        db.execute(
+            update(File)
+            .where(File.id == file_id)
+            # mismo contenido: no cuenta como modificación
+            .values(stored_name=blob_relpath(checksum), updated_at=File.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    return len(rows)
+
+
+def collect_orphans(grace_minutes: int | None = None) -> int:
+    """Delete bytes of blobs unreferenced for longer than the grace period."""
+    grace = BLOB_GC_GRACE_MINUTES if grace_minutes is None else grace_minutes
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=grace)
+    removed = 0
+    with session() as db:
+        checksums = db.execute(
+            select(Blob.checksum_sha256).where(Blob.refcount <= 0, Blob.orphaned_at <= cutoff)
+        ).scalars().all()
+    for checksum in checksums:
+        with session() as db:
+            # re-chequeo: una subida pudo revivir o volver a marcar el blob
+            res = db.execute(
+                delete(Blob).where(
+                    Blob.checksum_sha256 == checksum, Blob.refcount <= 0, Blob.orphaned_at <= cutoff
+                )
+            )
+            if res.rowcount != 1:
+                continue
+            # bytes fuera antes del commit: la fila queda bloqueada hasta entonces (ver store)
+            try:
+                os.remove(_blob_disk_path(checksum))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,112 @@
+# backend/services/deletion.py
+"""
+Set-based deletes for folder subtrees and whole data rooms.
+
+Instead of loading the ORM cascade (every descendant Folder/File in
+memory, one DELETE per row), a delete is a fixed number of statements
+keyed on the subtree (folders.path prefix): dependent rows (page texts, texts, jobs, search
+index), files, then folders. Python memory does not grow with the size
+of the tree.
+
+Disk work never happens in the request: blob references are released (the
+blob GC removes unreferenced bytes) and legacy per-folder directories are
+queued in disk_gc_queue for ``collect_deleted_dirs``.
+"""
+import os
+import shutil
+import logging
+from sqlalchemy import select, delete, insert, literal, cast, String
+from ..db import session
+from ..models import Folder, File, FileText, FilePageText, ExtractionJob, Dataroom, DiskGcItem
+from ..config import UPLOAD_DIR
+from .blobs import BLOB_PREFIX, release_files, collect_orphans
+from .resumable import collect_expired_uploads
+from .search_engine import search_engine
+from .tree import subtree_ids
+
+log = logging.getLogger(__name__)
+
+GC_BATCH = 100
+
+
+def delete_file_dependents(db, files) -> None:
+    """Page texts, texts and extraction jobs of files (ids or a SELECT of ids), before deleting them."""
+    # SQLite no aplica ON DELETE CASCADE (sin PRAGMA foreign_keys) y reutiliza el id del último File
+    for model in (FilePageText, FileText, ExtractionJob):
+        db.execute(
+            delete(model).where(model.file_id.in_(files)).execution_options(synchronize_session=False)
+        )
+
+
+def _delete_files(db, folders) -> None:
+    # folders: SELECT de ids de carpeta; cada sentencia lo reevalúa en la base
+    files = select(File.id).where(File.folder_id.in_(folders))
+    release_files(db, File.folder_id.in_(folders))
+    search_engine.remove(db, File.folder_id.in_(folders))
+    delete_file_dependents(db, files)
+    db.execute(
+        delete(File).where(File.folder_id.in_(folders)).execution_options(synchronize_session=False)
+    )
+
+
+def delete_folder_tree(db, fid: int, rid: int) -> None:
+    """Delete folder fid, everything below it and their files (caller commits)."""
+    folders = subtree_ids(db, fid)
+    # directorios legacy (<rid>/<folder_id>) con archivos: los borra el colector
+    db.execute(
+        insert(DiskGcItem).from_select(
+            ["relpath"],
+            select(literal(f"{rid}/") + cast(File.folder_id, String))
+            .where(File.folder_id.in_(folders), ~File.stored_name.startswith(BLOB_PREFIX))
+            .distinct(),
+        )
+    )
+    _delete_files(db, folders)
+    db.execute(
+        delete(Folder).where(Folder.id.in_(folders)).execution_options(synchronize_session=False)
+    )
+
+
+def delete_room(db, rid: int) -> None:
+    """Delete a data room with all its folders and files (caller commits)."""
+    folders = select(Folder.id).where(Folder.dataroom_id == rid)
+    db.add(DiskGcItem(relpath=str(rid)))
+    _delete_files(db, folders)
+    db.execute(
+        delete(Folder).where(Folder.dataroom_id == rid).execution_options(synchronize_session=False)
+    )
+    db.execute(delete(Dataroom).where(Dataroom.id == rid).execution_options(synchronize_session=False))
+
+
+def collect_deleted_dirs(limit: int = GC_BATCH) -> int:
+    """Remove queued directories; returns how many entries were processed."""
+    done = 0
+    last_id = 0
+    root = os.path.normpath(UPLOAD_DIR)
+    while True:
+        with session() as db:
+            items = db.execute(
+                select(DiskGcItem).where(DiskGcItem.id > last_id).order_by(DiskGcItem.id).limit(limit)
+            ).scalars().all()
+            if not items:
+                return done
+            for item in items:
+                last_id = item.id
+                path = os.path.normpath(os.path.join(UPLOAD_DIR, item.relpath))
+                # nunca fuera de UPLOAD_DIR ni el propio UPLOAD_DIR
+                if path != root and os.path.commonpath([path, root]) == root:
+                    try:
+                        shutil.rmtree(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        # queda en la cola para la próxima pasada
+                        log.exception("disk gc: could not remove %s", path)
+                        continue
+                db.delete(item)
+                done += 1
+
+
+def collect_garbage(grace_minutes: int | None = None) -> tuple[int, int, int]:
+    """One collector pass: queued directories, expired resumable uploads, then unreferenced blobs."""
+    return collect_deleted_dirs(), collect_expired_uploads(), collect_orphans(grace_minutes)
@@ -0,0 +1,383 @@
+# backend/services/extraction.py
+"""
+Durable text-extraction queue.
+
+Uploads only enqueue an ``ExtractionJob`` (plus a pending ``FileText``); a
+separate worker process claims jobs from the table and runs pdfminer on a
+process pool, so request workers and DB transactions are never held by it.
+"""
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import select, update, delete, insert, literal, func, exists
+from ..db import session, engine
+from ..models import ExtractionJob, FileText, FilePageText, File, Folder
+from ..config import (
+    EXTRACTION_WORKERS,
+    EXTRACTION_POLL_SECONDS,
+    EXTRACTION_MAX_ATTEMPTS,
+    EXTRACTION_STALE_MINUTES,
+)
+from .pdf_text import extract_pdf_pages, join_pages
+from .blobs import file_disk_path
+from .search_engine import search_engine
+from .search_cache import bump_file_owners
+from .metrics import observe_extraction
+
+log = logging.getLogger(__name__)
+
+TEXT_PENDING = "pending"
+TEXT_DONE = "done"
+TEXT_FAILED = "failed"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FAILED = "failed"
+
+
+def enqueue_extraction(db, file_id: int) -> None:
+    """Register a pending FileText and its job in the caller's transaction."""
+    db.add(FileText(file_id=file_id, content_plain="", status=TEXT_PENDING))
+    db.add(ExtractionJob(file_id=file_id, status=JOB_QUEUED))
+
+
+def reuse_extracted_text(db, file_id: int, checksum: str) -> bool:
+    """Copy finished text (document and pages) from another File with the same bytes."""
+    src_id = db.execute(
+        select(File.id)
+        .join(FileText, FileText.file_id == File.id)
+        .where(File.checksum_sha256 == checksum, File.id != file_id, FileText.status == TEXT_DONE)
+        .limit(1)
+    ).scalar_one_or_none()
+    if src_id is None:
+        return False
+    _copy_text(db, src_id, file_id)
+    search_engine.index_text(db, [file_id])
+    return True
+
+
+def attach_texts(db, files: list[tuple[int, str]]) -> dict[int, str]:
+    """
+    Batch form of reuse_extracted_text / enqueue_extraction for new
+    (file_id, checksum) pairs: one lookup for already extracted checksums,
+    bulk inserts for the rest. Returns {file_id: text status}.
+    """
+    if not files:
+        return {}
+    sources = dict(
+        db.execute(
+            select(File.checksum_sha256, func.min(File.id))
+            .join(FileText, FileText.file_id == File.id)
+            .where(File.checksum_sha256.in_({c for _, c in files}), FileText.status == TEXT_DONE)
+            .group_by(File.checksum_sha256)
+        ).all()
+    )
+    reused = [fid for fid, c in files if c in sources]
+    pending = [fid for fid, c in files if c not in sources]
+    for fid, c in files:
+        if c in sources:
+            _copy_text(db, sources[c], fid)
+    if pending:
+        db.execute(insert(FileText), [{"file_id": f, "content_plain": "", "status": TEXT_PENDING} for f in pending])
+        db.execute(insert(ExtractionJob), [{"file_id": f, "status": JOB_QUEUED} for f in pending])
+    search_engine.index_text(db, reused)
+    return {**dict.fromkeys(reused, TEXT_DONE), **dict.fromkeys(pending, TEXT_PENDING)}
+
+
+def attach_texts_where(db, *criteria) -> None:
+    """
+    Set-based attach_texts for File rows matching criteria that have no
+    text yet (e.g. a folder copy): texts and pages of an extracted file
+    with the same checksum are copied in one INSERT ... SELECT each; the
+    rest get a pending FileText and a job.
+    """
+    new = select(File.id, File.checksum_sha256).where(*criteria).cte("new_files")
+    source = (
+        select(File.checksum_sha256, func.min(File.id).label("src_id"))
+        .join(FileText, FileText.file_id == File.id)
+        .where(File.checksum_sha256.in_(select(new.c.checksum_sha256)), FileText.status == TEXT_DONE)
+        .group_by(File.checksum_sha256)
+        .cte("text_sources")
+    )
+    db.execute(
+        insert(FileText).from_select(
+            [FileText.file_id, FileText.content_plain, FileText.status],
+            select(new.c.id, FileText.content_plain, literal(TEXT_DONE))
+            .join(source, source.c.checksum_sha256 == new.c.checksum_sha256)
+            .join(FileText, FileText.file_id == source.c.src_id),
+        )
+    )
+    db.execute(
+        insert(FilePageText).from_select(
+            [FilePageText.file_id, FilePageText.page_no, FilePageText.content],
+            select(new.c.id, FilePageText.page_no, FilePageText.content)
+            .join(source, source.c.checksum_sha256 == new.c.checksum_sha256)
+            .join(FilePageText, FilePageText.file_id == source.c.src_id),
+        )
+    )
+    search_engine.index_copies(db, *criteria, FileText.status == TEXT_DONE)
+    # sin texto reutilizable: pendiente y a la cola
+    missing = select(File.id).where(*criteria, ~exists().where(FileText.file_id == File.id))
+    db.execute(
+        insert(ExtractionJob).from_select(
+            [ExtractionJob.file_id, ExtractionJob.status], missing.add_columns(literal(JOB_QUEUED))
+        )
+    )
+    db.execute(
+        insert(FileText).from_select(
+            [FileText.file_id, FileText.content_plain, FileText.status],
+            missing.add_columns(literal(""), literal(TEXT_PENDING)),
+        )
+    )
+
+
+def _copy_text(db, src_id: int, file_id: int) -> None:
+    db.execute(
+        insert(FileText).from_select(
+            [FileText.file_id, FileText.content_plain, FileText.status],
+            select(literal(file_id), FileText.content_plain, literal(TEXT_DONE)).where(FileText.file_id == src_id),
+        )
+    )
+    db.execute(
+        insert(FilePageText).from_select(
+            [FilePageText.file_id, FilePageText.page_no, FilePageText.content],
+            select(literal(file_id), FilePageText.page_no, FilePageText.content).where(FilePageText.file_id == src_id),
+        )
+    )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def requeue_stale() -> int:
+    """
+    Return jobs left 'running' by a crashed worker to the queue. Jobs that
+    already used EXTRACTION_MAX_ATTEMPTS (every claim counts one) fail
+    instead, so a PDF that kills or hangs the worker is not retried forever.
+    """
+    cutoff = _now() - timedelta(minutes=EXTRACTION_STALE_MINUTES)
+    stale = (ExtractionJob.status == JOB_RUNNING, ExtractionJob.locked_at < cutoff)
+    exhausted = ExtractionJob.attempts >= EXTRACTION_MAX_ATTEMPTS
+    with session() as db:
+        db.execute(
+            update(FileText)
+            .where(FileText.file_id.in_(select(ExtractionJob.file_id).where(*stale, exhausted)))
+            .values(status=TEXT_FAILED)
+        )
+        db.execute(
+            update(ExtractionJob)
+            .where(*stale, exhausted)
+            .values(status=JOB_FAILED, locked_at=None, last_error="worker stopped while extracting")
+        )
+        res = db.execute(update(ExtractionJob).where(*stale).values(status=JOB_QUEUED, locked_at=None))
+        return res.rowcount or 0
+
+
+def claim_jobs(limit: int) -> list[tuple[int, int, str]]:
+    """Atomically mark up to `limit` queued jobs as running; returns (job_id, file_id, disk_path)."""
+    with session() as db:
+        stmt = (
+            select(ExtractionJob.id)
+            .where(ExtractionJob.status == JOB_QUEUED)
+            .order_by(ExtractionJob.id)
+            .limit(limit)
+        )
+        if engine.dialect.name == "postgresql":
+            # varios workers pueden reclamar en paralelo sin bloquearse
+            stmt = stmt.with_for_update(skip_locked=True)
+        ids = db.execute(stmt).scalars().all()
+
+        claimed = []
+        for job_id in ids:
+            # update condicional: en SQLite (sin SKIP LOCKED) evita doble reclamo
+            res = db.execute(
+                update(ExtractionJob)
+                .where(ExtractionJob.id == job_id, ExtractionJob.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, attempts=ExtractionJob.attempts + 1, locked_at=_now())
+            )
+            if res.rowcount == 1:
+                claimed.append(job_id)
+        if not claimed:
+            return []
+
+        rows = db.execute(
+            select(ExtractionJob.id, File.id, File.stored_name, Folder.id, Folder.dataroom_id)
+            .select_from(ExtractionJob)
+            .join(File, File.id == ExtractionJob.file_id)
+            .join(Folder, Folder.id == File.folder_id)
+            .where(ExtractionJob.id.in_(claimed))
+        ).all()
+        orphaned = set(claimed) - {r[0] for r in rows}
+        if orphaned:
+            # el archivo fue borrado antes de procesarse
+            db.execute(delete(ExtractionJob).where(ExtractionJob.id.in_(orphaned)))
+        return [
+            (job_id, file_id, file_disk_path(rid, folder_id, stored))
+            for job_id, file_id, stored, folder_id, rid in rows
+        ]
+
+
+def complete_job(job_id: int, file_id: int, pages: list[str]) -> None:
+    with session() as db:
+        # mismo contenido subido varias veces antes de extraer: resolvemos todos
+        checksum = select(File.checksum_sha256).where(File.id == file_id).scalar_subquery()
+        siblings = db.execute(
+            select(FileText.file_id)
+            .join(File, File.id == FileText.file_id)
+            .where(File.checksum_sha256 == checksum, FileText.status == TEXT_PENDING, File.id != file_id)
+        ).scalars().all()
+        targets = [file_id, *siblings]
+        db.execute(
+            update(FileText)
+            .where(FileText.file_id.in_(targets))
+            .values(content_plain=join_pages(pages), status=TEXT_DONE)
+        )
+        db.execute(delete(FilePageText).where(FilePageText.file_id.in_(targets)))
+        if pages:
+            db.execute(
+                insert(FilePageText),
+                [
+                    {"file_id": t, "page_no": n, "content": txt}
+                    for t in targets
+                    for n, txt in enumerate(pages, start=1)
+                ],
+            )
+        search_engine.index_text(db, targets)
+        # el texto nuevo cambia los resultados de búsqueda de contenido
+        bump_file_owners(db, targets)
+        db.execute(
+            delete(ExtractionJob).where(
+                (ExtractionJob.id == job_id)
+                | (ExtractionJob.file_id.in_(siblings) & (ExtractionJob.status == JOB_QUEUED))
+            )
+        )
+
+
+def fail_job(job_id: int, file_id: int, error: str) -> None:
+    with session() as db:
+        job = db.get(ExtractionJob, job_id)
+        if not job:
+            return
+        job.last_error = error[:2000]
+        job.locked_at = None
+        if job.attempts >= EXTRACTION_MAX_ATTEMPTS:
+            job.status = JOB_FAILED
+            db.execute(
+                update(FileText).where(FileText.file_id == file_id).values(status=TEXT_FAILED)
+            )
+        else:
+            job.status = JOB_QUEUED
+
+
+class ExtractionError(Exception):
+    """pdfminer failure carried back from the pool with the time it took."""
+
+    def __init__(self, error: str, seconds: float):
+        # ambos en args: la excepción cruza el pool por pickle
+        super().__init__(error, seconds)
+        self.seconds = seconds
+
+    def __str__(self):
+        return self.args[0]
+
+
+def _extract(path: str) -> tuple[list[str], float]:
+    # corre en el proceso hijo; memoria acotada por el presupuesto de caracteres
+    t0 = time.perf_counter()
+    try:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return extract_pdf_pages(path, strict=True), time.perf_counter() - t0
+    except Exception as e:
+        raise ExtractionError(repr(e), time.perf_counter() - t0) from None
+
+
+def _touch(job_ids: list[int]) -> None:
+    # siguen en este worker: que requeue_stale de otro no los devuelva a la cola
+    with session() as db:
+        db.execute(
+            update(ExtractionJob)
+            .where(ExtractionJob.id.in_(job_ids), ExtractionJob.status == JOB_RUNNING)
+            .values(locked_at=_now())
+        )
+
+
+def _settle(fut, job_id: int, file_id: int) -> None:
+    """Complete or fail a job from its finished future; BrokenProcessPool is left to the caller."""
+    try:
+        pages, seconds = fut.result()
+    except BrokenProcessPool:
+        raise
+    except ExtractionError as e:
+        observe_extraction(e.seconds, ok=False)
+        log.warning("extraction failed for file %s: %s", file_id, e)
+        fail_job(job_id, file_id, str(e))
+        return
+    except Exception as e:
+        log.warning("extraction failed for file %s: %s", file_id, e)
+        fail_job(job_id, file_id, repr(e))
+        return
+    observe_extraction(seconds, ok=True)
+    try:
+        complete_job(job_id, file_id, pages)
+    except Exception as e:
+        log.warning("extraction failed for file %s: %s", file_id, e)
+        fail_job(job_id, file_id, repr(e))
+
+
+def _new_pool(pool: ProcessPoolExecutor | None, workers: int) -> ProcessPoolExecutor:
+    # un pool roto rechaza todo submit posterior: se reemplaza
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def run_worker(concurrency: int | None = None, poll_interval: float | None = None, once: bool = False) -> None:
+    """
+    Poll the job table and extract text on a process pool until interrupted
+    (or drained if once).
+
+    When a child dies (OOM, segfault...) every job still in flight sees
+    BrokenProcessPool and there is no telling which one killed it. Those
+    jobs are rerun one at a time on a fresh pool within the same claim:
+    the innocent ones finish, and only a job that breaks the pool on its
+    own is failed (and charged, like any failure of its claim).
+    """
+    workers = concurrency or EXTRACTION_WORKERS
+    interval = EXTRACTION_POLL_SECONDS if poll_interval is None else poll_interval
+    pool = _new_pool(None, workers)
+    try:
+        while True:
+            requeue_stale()
+            jobs = claim_jobs(workers * 2)
+            if not jobs:
+                if once:
+                    return
+                time.sleep(interval)
+                continue
+            futures = {pool.submit(_extract, job[2]): job for job in jobs}
+            suspects = []
+            for fut in as_completed(futures):
+                job_id, file_id, _ = futures[fut]
+                try:
+                    _settle(fut, job_id, file_id)
+                except BrokenProcessPool:
+                    suspects.append(futures[fut])
+            if not suspects:
+                continue
+            pool = _new_pool(pool, workers)
+            suspects.sort()
+            for n, (job_id, file_id, path) in enumerate(suspects):
+                _touch([j for j, _, _ in suspects[n:]])
+                try:
+                    _settle(pool.submit(_extract, path), job_id, file_id)
+                except BrokenProcessPool as e:
+                    log.warning("extraction failed for file %s: %s", file_id, e)
+                    fail_job(job_id, file_id, repr(e))
+                    pool = _new_pool(pool, workers)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,115 @@
+# backend/services/facets.py
+"""
+Result totals and facet counts for list and search endpoints.
+
+    count_total(db, stmt)     {"value": n, "relation": "eq" | "gte" | "estimate"}
+    facet_counts(db, stmt)    size-range, month and folder buckets in one query
+
+Totals never scan more than COUNT_EXACT_MAX + 1 matching rows. Above that,
+Postgres answers with the planner's row estimate (EXPLAIN, no execution)
+and SQLite, which has none, reports the bound itself as a lower limit.
+
+Facets read the whole match set, so they are opt-in and callers cache
+them with the search cache (per owner generation and filter set).
+"""
+from sqlalchemy import select, func, case, cast, null, literal_column, union_all, Integer, String
+from ..config import COUNT_EXACT_MAX, FACET_FOLDERS_MAX
+from ..db import engine
+from ..models import Folder
+
+# límites superiores exclusivos en bytes; el último tramo queda abierto
+SIZE_EDGES = [100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024]
+
+
+def _size_label(i: int) -> str:
+    def fmt(n):
+        return f"{n // (1024 * 1024)}MB" if n >= 1024 * 1024 else f"{n // 1024}KB"
+    if i == 0:
+        return f"<{fmt(SIZE_EDGES[0])}"
+    if i == len(SIZE_EDGES):
+        return f">={fmt(SIZE_EDGES[-1])}"
+    return f"{fmt(SIZE_EDGES[i - 1])}-{fmt(SIZE_EDGES[i])}"
+
+
+def estimate_rows(db, stmt) -> int | None:
+    """Planner row estimate for stmt (Postgres only; None elsewhere)."""
+    if engine.dialect.name != "postgresql":
+        return None
+    conn = db.connection()
+    compiled = stmt.compile(dialect=conn.dialect)
+    # exec_driver_sql: el SQL compilado ya usa el paramstyle del driver
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_total(db, stmt, exact_max: int = COUNT_EXACT_MAX) -> dict:
+    """Number of rows stmt matches, exact up to exact_max."""
+    bounded = db.execute(select(func.count()).select_from(stmt.limit(exact_max + 1).subquery())).scalar()
+    if bounded <= exact_max:
+        return {"value": bounded, "relation": "eq"}
+    estimate = estimate_rows(db, stmt)
+    if estimate is None:
+        return {"value": exact_max, "relation": "gte"}
+    # la estimación puede quedar por debajo de lo que ya contamos
+    return {"value": max(estimate, exact_max + 1), "relation": "estimate"}
+
+
+def _month(col):
+    if engine.dialect.name == "postgresql":
+        return func.to_char(func.timezone("UTC", col), "YYYY-MM")
+    return func.strftime("%Y-%m", col)
+
+
+def facet_counts(db, stmt, by_folder: bool = True) -> dict:
+    """
+    Bucketed counts over the rows of stmt, which must expose size_bytes,
+    created_at and folder_id. One statement: a CTE of the matches and a
+    UNION ALL of one GROUP BY per facet.
+    """
+    src = stmt.subquery()
+    bucket = case(
+        *[(src.c.size_bytes < edge, literal_column(str(i))) for i, edge in enumerate(SIZE_EDGES)],
+        else_=literal_column(str(len(SIZE_EDGES))),
+    )
+    # tramo y mes se calculan una vez en el CTE: los GROUP BY agrupan por columnas
+    # (Postgres no equipara expresiones con parámetros distintos en SELECT y GROUP BY)
+    m = select(bucket.label("size_bucket"), _month(src.c.created_at).label("month"), src.c.folder_id).cte("matches")
+    parts = [
+        select(literal_column("'size'").label("facet"), m.c.size_bucket.label("key"),
+               cast(null(), String).label("label"), func.count().label("n")).group_by(m.c.size_bucket),
+        select(literal_column("'month'"), cast(null(), Integer), m.c.month, func.count()).group_by(m.c.month),
+    ]
+    if by_folder:
+        parts.append(
+            select(literal_column("'folder'"), m.c.folder_id, Folder.name, func.count())
+            .join(Folder, Folder.id == m.c.folder_id)
+            .group_by(m.c.folder_id, Folder.name)
+        )
+    rows = db.execute(union_all(*parts)).all()
+
+    sizes = [0] * (len(SIZE_EDGES) + 1)
+    months, folders = [], []
+    for facet, key, label, n in rows:
+        if facet == "size":
+            sizes[int(key)] = n
+        elif facet == "month":
+            months.append({"key": label, "count": n})
+        else:
+            folders.append({"folder_id": key, "name": label, "count": n})
+
+    out = {
+        "size": [
+            {
+                "key": _size_label(i),
+                "min_bytes": SIZE_EDGES[i - 1] if i else 0,
+                "max_bytes": SIZE_EDGES[i] if i < len(SIZE_EDGES) else None,
+                "count": n,
+            }
+            for i, n in enumerate(sizes)
+        ],
+        "month": sorted(months, key=lambda x: x["key"] or "", reverse=True),
+    }
+    if by_folder:
+        folders.sort(key=lambda x: (-x["count"], x["folder_id"]))
+        out["folder"] = folders[:FACET_FOLDERS_MAX]
+    return out
@@ -0,0 +1,199 @@
+# backend/services/file_serving.py
+"""
+Conditional / partial responses for stored PDFs.
+
+Strong ETags come from File.checksum_sha256, so If-None-Match answers 304
+without touching the disk. Byte ranges (single and multipart/byteranges)
+are streamed in chunks; a full 200 goes through send_file so the WSGI
+server's file wrapper (sendfile) is used. With SENDFILE_MODE set, nginx
+(X-Accel-Redirect) or Apache/lighttpd (X-Sendfile) serve the bytes.
+"""
+import os, time, uuid, unicodedata
+from typing import NamedTuple
+from urllib.parse import quote
+from flask import Response, request, send_file
+from werkzeug.http import parse_etags, quote_etag
+from ..config import UPLOAD_DIR, SENDFILE_MODE, SENDFILE_PREFIX
+from .metrics import observe_io
+
+CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 32  # más rangos que esto: servimos el archivo entero
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+
+def parse_byte_ranges(header: str, length: int) -> list[tuple[int, int]] | None:
+    """
+    Parse a Range header into sorted, coalesced [start, end) pairs.
+    None means "ignore the header and send 200"; [] means unsatisfiable (416).
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # sufijo: los últimos N bytes
+                n = int(last)
+                start, end = max(length - n, 0), length
+            else:
+                start = int(first)
+                end = int(last) + 1 if last else length
+                if last and end <= start:
+                    return None
+                end = min(end, length)
+        except ValueError:
+            return None
+        if start < end:
+            ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def content_disposition(name: str, disposition: str = "inline") -> str:
+    name = name.replace('"', "'")
+    try:
+        name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+        quoted = quote(name, safe="!#$&+-.^_`|~")
+        return f"{disposition}; filename=\"{simple}\"; filename*=UTF-8''{quoted}"
+    return f'{disposition}; filename="{name}"'
+
+
+def read_ranges(path: str, parts, op: str = "range_read", chunk_size: int = CHUNK_SIZE):
+    # parts: [(prefix_bytes, start, end)] + sufijo final
+    io_seconds, nbytes = 0.0, 0
+    try:
+        with open(path, "rb") as fh:
+            for prefix, start, end in parts:
+                if prefix:
+                    yield prefix
+                if start is None:
+                    continue
+                fh.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    t0 = time.perf_counter()
+                    chunk = fh.read(min(chunk_size, remaining))
+                    io_seconds += time.perf_counter() - t0
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    nbytes += len(chunk)
+                    yield chunk
+    finally:
+        observe_io(op, io_seconds, nbytes)
+
+
+class PdfPlan(NamedTuple):
+    status: int
+    headers: dict
+    # segmentos del cuerpo para read_ranges; None = sin cuerpo
+    parts: list | None
+    full: bool = False  # 200 con el archivo entero (apto para sendfile)
+
+
+def plan_pdf(disk_path: str, checksum: str, download_name: str, immutable: bool, header) -> PdfPlan:
+    """
+    Decide status, headers and body segments for a stored PDF honoring
+    If-None-Match, If-Range and Range. `header(name)` reads a request
+    header, so the WSGI and ASGI serving paths share this logic.
+    """
+    etag = quote_etag(checksum)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(download_name),
+    }
+
+    inm = header("If-None-Match")
+    if inm and parse_etags(inm).contains_weak(checksum):
+        return PdfPlan(304, headers, None)
+
+    if SENDFILE_MODE:
+        # el proxy sirve los bytes (incluye Range); Python sólo autoriza
+        if SENDFILE_MODE == "x-accel":
+            rel = os.path.relpath(disk_path, UPLOAD_DIR).replace(os.sep, "/")
+            headers["X-Accel-Redirect"] = SENDFILE_PREFIX.rstrip("/") + "/" + quote(rel)
+        else:
+            headers["X-Sendfile"] = disk_path
+        headers["Content-Type"] = "application/pdf"
+        return PdfPlan(200, headers, None)
+
+    length = os.path.getsize(disk_path)
+    rng = header("Range")
+    if_range = header("If-Range")
+    if rng and if_range and if_range.strip() != etag:
+        # validador viejo: el cliente debe recibir el recurso completo
+        rng = None
+    ranges = parse_byte_ranges(rng, length) if rng else None
+
+    if ranges is None:
+        headers["Content-Type"] = "application/pdf"
+        headers["Content-Length"] = str(length)
+        return PdfPlan(200, headers, [(b"", 0, length)], full=True)
+
+    if not ranges:
+        headers["Content-Range"] = f"bytes */{length}"
+        return PdfPlan(416, headers, None)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{length}"
+        headers["Content-Length"] = str(end - start)
+        headers["Content-Type"] = "application/pdf"
+        return PdfPlan(206, headers, [(b"", start, end)])
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    total = 0
+    for i, (start, end) in enumerate(ranges):
+        prefix = (
+            ("\r\n" if i else "")
+            + f"--{boundary}\r\n"
+            + "Content-Type: application/pdf\r\n"
+            + f"Content-Range: bytes {start}-{end - 1}/{length}\r\n\r\n"
+        ).encode()
+        parts.append((prefix, start, end))
+        total += len(prefix) + (end - start)
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    parts.append((closing, None, None))
+    total += len(closing)
+    headers["Content-Length"] = str(total)
+    headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+    return PdfPlan(206, headers, parts)
+
+
+def send_pdf(disk_path: str, checksum: str, download_name: str, immutable: bool) -> Response:
+    """Serve a stored PDF honoring If-None-Match, If-Range and Range."""
+    plan = plan_pdf(disk_path, checksum, download_name, immutable, request.headers.get)
+    if plan.full:
+        # send_file: el servidor WSGI puede usar su file wrapper (sendfile)
+        resp = send_file(
+            disk_path, mimetype="application/pdf", conditional=False, etag=False, max_age=None
+        )
+        resp.headers.update(plan.headers)
+        return resp
+    if plan.parts is None:
+        return Response(status=plan.status, headers=plan.headers)
+    return Response(
+        read_ranges(disk_path, plan.parts), status=plan.status, headers=plan.headers, direct_passthrough=True
+    )
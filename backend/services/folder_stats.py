@@ -0,0 +1,123 @@
+# backend/services/folder_stats.py
+"""
+Denormalized folder aggregates.
+
+Every folder row carries
+    files_direct / bytes_direct   files directly inside it
+    files_total  / bytes_total    files anywhere in its subtree
+    last_modified_at              last upload/rename/delete/move below it
+
+Writers call ``apply_delta`` in their own transaction. The ancestors of a
+folder are exactly the ids in its materialized path, so a change is two
+UPDATEs by primary key whatever the depth. ``reconcile`` rebuilds
+everything from files with set-based statements.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.orm import aliased
+from ..db import lock_for_write
+from ..models import Folder, File
+
+
+def ancestor_ids(path: str) -> list[int]:
+    """Ids in a materialized path, root first (the folder itself included)."""
+    return [int(p) for p in path.strip("/").split("/") if p]
+
+
+def apply_delta(db, folder_id: int, path: str, files: int = 0, size: int = 0, touch: bool = True) -> None:
+    """Add files/bytes (negative to remove) to folder_id and all its ancestors."""
+    now = datetime.now(timezone.utc)
+    if files or size:
+        db.execute(
+            update(Folder)
+            .where(Folder.id == folder_id)
+            .values(files_direct=Folder.files_direct + files, bytes_direct=Folder.bytes_direct + size)
+        )
+    values = {"files_total": Folder.files_total + files, "bytes_total": Folder.bytes_total + size}
+    if touch:
+        values["last_modified_at"] = now
+    db.execute(update(Folder).where(Folder.id.in_(ancestor_ids(path))).values(**values))
+
+
+def remove_subtree(db, folder: Folder) -> None:
+    """
+    Before deleting or moving folder's subtree: take its totals off the
+    ancestors above it. Locks folder's row and reloads its totals first,
+    so they match the subtree until the caller commits (uploads below it
+    wait on that row in apply_delta); callers use folder.files_total /
+    bytes_total afterwards.
+    """
+    # una subida que confirmó después de cargar la entidad ya está en la fila
+    lock_for_write(db, Folder)
+    db.refresh(folder, attribute_names=["files_total", "bytes_total"], with_for_update=True)
+    above = ancestor_ids(folder.path)[:-1]
+    if not above:
+        return
+    db.execute(
+        update(Folder)
+        .where(Folder.id.in_(above))
+        .values(
+            files_total=Folder.files_total - folder.files_total,
+            bytes_total=Folder.bytes_total - folder.bytes_total,
+            last_modified_at=datetime.now(timezone.utc),
+        )
+    )
+
+
+def add_subtree(db, parent_path: str, files: int, size: int) -> None:
+    """After attaching a subtree with these totals under parent_path: add them to its new ancestors."""
+    db.execute(
+        update(Folder)
+        .where(Folder.id.in_(ancestor_ids(parent_path)))
+        .values(
+            files_total=Folder.files_total + files,
+            bytes_total=Folder.bytes_total + size,
+            last_modified_at=datetime.now(timezone.utc),
+        )
+    )
+
+
+# para consultas proyectadas: stats_json acepta la fila igual que la entidad
+STATS_COLUMNS = (
+    Folder.files_direct, Folder.bytes_direct, Folder.files_total, Folder.bytes_total, Folder.last_modified_at,
+)
+
+
+def stats_json(f) -> dict:
+    return {
+        "files_direct": f.files_direct,
+        "bytes_direct": f.bytes_direct,
+        "files_total": f.files_total,
+        "bytes_total": f.bytes_total,
+        "last_modified_at": f.last_modified_at.isoformat() if f.last_modified_at else None,
+    }
+
+
+def reconcile(conn, rid: int | None = None) -> None:
+    """Recompute every aggregate from files (all rooms, or only rid)."""
+    scope = [Folder.dataroom_id == rid] if rid is not None else []
+    conn.execute(
+        update(Folder)
+        .where(*scope)
+        .values(
+            files_direct=select(func.count(File.id)).where(File.folder_id == Folder.id).scalar_subquery(),
+            bytes_direct=select(func.coalesce(func.sum(File.size_bytes), 0))
+            .where(File.folder_id == Folder.id)
+            .scalar_subquery(),
+        )
+    )
+    # subárbol = carpetas de la misma sala cuya ruta empieza con la propia
+    sub = aliased(Folder)
+    in_subtree = and_(sub.dataroom_id == Folder.dataroom_id, sub.path.like(Folder.path + "%"))
+    conn.execute(
+        update(Folder)
+        .where(*scope)
+        .values(
+            files_total=select(func.coalesce(func.sum(sub.files_direct), 0)).where(in_subtree).scalar_subquery(),
+            bytes_total=select(func.coalesce(func.sum(sub.bytes_direct), 0)).where(in_subtree).scalar_subquery(),
+            last_modified_at=select(func.max(File.updated_at))
+            .join(sub, sub.id == File.folder_id)
+            .where(in_subtree)
+            .scalar_subquery(),
+        )
+    )
@@ -0,0 +1,359 @@
+# backend/services/metrics.py
+"""
+In-process metrics in Prometheus text format (no client library needed).
+
+    install_metrics(app, engines)  per-request timing + SQL accounting
+    observe_io(op, seconds, n)     disk reads/writes (uploads, ranges, ZIP export)
+    observe_extraction(s, ok)      pdfminer time per document (worker)
+    render()                       exposition text for GET /metrics
+    token_ok(authorization)        bearer METRICS_TOKEN check for the exposition
+
+SQL statements are counted with engine events: every statement feeds the
+global query histogram and, inside a request, the request's own tally
+(count, DB time, and per-statement repeats so N+1 loops stand out in the
+slow-request log). Each process keeps its own registry: with several
+gunicorn workers every worker is scraped separately, and the extraction
+worker can serve its own with ``--metrics-port``.
+
+Request latency is measured up to the moment the response object is
+returned; bytes streamed afterwards (PDF bodies, ZIP exports) are not
+included. Full-file 200 streams go through the WSGI file wrapper and are
+not timed as disk reads.
+"""
+import hmac
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from flask import request, g
+from sqlalchemy import event
+from ..config import SLOW_REQUEST_MS, SLOW_REQUEST_TOP_STATEMENTS, METRICS_TOKEN
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_TRACKED_STATEMENTS = 200  # sentencias distintas guardadas por request
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # por combinación de labels: [conteos por bucket..., suma, total]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = self.header()
+        for k, row in items:
+            acc = 0
+            for bound, n in zip(self.buckets, row):
+                acc += n
+                le = 'le="%s"' % _num(bound)
+                out.append(f"{self.name}_bucket{_labels(self.label_names, k, le)} {acc}")
+            inf = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.label_names, k, inf)} {row[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, k)} {_num(row[-2])}")
+            out.append(f"{self.name}_count{_labels(self.label_names, k)} {row[-1]}")
+        return out
+
+
+class Callback(_Metric):
+    """Values read at scrape time from read() -> {label values: value}."""
+
+    def __init__(self, name, help, labels=(), read=None, kind="gauge"):
+        super().__init__(name, help, labels)
+        self.read = read
+        self.kind = kind
+
+    def lines(self) -> list[str]:
+        try:
+            values = self.read()
+        except Exception:
+            log.exception("metrics: %s failed", self.name)
+            return []
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in sorted(values.items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics:
+            lines.extend(m.lines())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.add(Histogram(
+    "dataroom_http_request_duration_seconds", "Request latency until the response is returned.",
+    ("method", "endpoint", "status"),
+))
+REQUEST_QUERIES = registry.add(Histogram(
+    "dataroom_http_request_sql_statements", "SQL statements executed per request.",
+    ("method", "endpoint"), COUNT_BUCKETS,
+))
+REQUEST_DB_SECONDS = registry.add(Histogram(
+    "dataroom_http_request_db_seconds", "Time spent in SQL per request.", ("method", "endpoint"),
+))
+SLOW_REQUESTS = registry.add(Counter(
+    "dataroom_http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("method", "endpoint"),
+))
+SQL_SECONDS = registry.add(Histogram(
+    "dataroom_sql_statement_duration_seconds", "Duration of single SQL statements.", ("engine", "operation"),
+))
+DISK_SECONDS = registry.add(Histogram(
+    "dataroom_disk_io_seconds", "Time spent in disk reads/writes per operation.", ("op",),
+))
+DISK_BYTES = registry.add(Counter("dataroom_disk_io_bytes_total", "Bytes read/written on disk.", ("op",)))
+EXTRACTION_SECONDS = registry.add(Histogram(
+    "dataroom_extraction_duration_seconds", "pdfminer time per document.", ("outcome",),
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+))
+
+
+def _search_cache_lookups() -> dict:
+    from .search_cache import search_cache
+
+    s = search_cache.stats()
+    return {("hit",): s["hits"], ("miss",): s["misses"]}
+
+
+def _search_cache_entries() -> dict:
+    from .search_cache import search_cache
+
+    return {(): search_cache.stats()["entries"] or 0}
+
+
+registry.add(Callback(
+    "dataroom_search_cache_lookups_total", "Search cache lookups since start.", ("result",),
+    _search_cache_lookups, kind="counter",
+))
+registry.add(Callback(
+    "dataroom_search_cache_entries", "Entries held by the search cache.", (), _search_cache_entries,
+))
+
+
+def render() -> str:
+    return registry.render()
+
+
+# ---- contabilidad por request ----
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    # sentencia parametrizada -> [veces, segundos]; un N+1 aparece como una fila repetida
+    by_statement: dict[str, list] = field(default_factory=dict)
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[:1]
+    return word[0].upper() if word else "OTHER"
+
+
+def instrument_engine(engine, role: str = "primary") -> None:
+    """Time every statement run through engine, labelled with role (idempotent)."""
+    if getattr(engine, "_dataroom_metrics", False):
+        return
+    engine._dataroom_metrics = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("metrics_t0")
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        SQL_SECONDS.observe(elapsed, role, _operation(statement))
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        row = stats.by_statement.get(statement)
+        if row is None and len(stats.by_statement) < MAX_TRACKED_STATEMENTS:
+            row = stats.by_statement[statement] = [0, 0.0]
+        if row is not None:
+            row[0] += 1
+            row[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        # la sentencia falló: no dejamos el inicio colgado en la pila
+        stack = ctx.connection.info.get("metrics_t0") if ctx.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+def observe_io(op: str, seconds: float, nbytes: int = 0) -> None:
+    DISK_SECONDS.observe(seconds, op)
+    if nbytes:
+        DISK_BYTES.inc(nbytes, op)
+
+
+def observe_extraction(seconds: float, ok: bool) -> None:
+    EXTRACTION_SECONDS.observe(seconds, "ok" if ok else "failed")
+
+
+def _slow_log(method: str, endpoint: str, elapsed: float, stats: RequestStats) -> None:
+    top = sorted(stats.by_statement.items(), key=lambda kv: kv[1][1], reverse=True)
+    lines = [
+        f"  {n}x {secs * 1000:.1f}ms  {' '.join(sql.split())[:500]}"
+        for sql, (n, secs) in top[:SLOW_REQUEST_TOP_STATEMENTS]
+    ]
+    log.warning(
+        "slow request %s %s (%s): %.1fms, %d statements, %.1fms in db\n%s",
+        method, endpoint, request.full_path.rstrip("?"), elapsed * 1000,
+        stats.statements, stats.db_seconds * 1000, "\n".join(lines),
+    )
+
+
+def install_metrics(app, engines: dict) -> None:
+    """Register the timing hooks for {role: engine}; call before any other before_request hook."""
+    for role, engine in engines.items():
+        if engine is not None:
+            instrument_engine(engine, role)
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+        g._metrics_token = _current.set(RequestStats())
+
+    @app.after_request
+    def _metrics_finish(response):
+        t0 = g.pop("_metrics_t0", None)
+        token = g.pop("_metrics_token", None)
+        if t0 is None:
+            return response
+        elapsed = time.perf_counter() - t0
+        stats = _current.get() or RequestStats()
+        if token is not None:
+            _current.reset(token)
+        # plantilla de la ruta (no la URL) para no disparar la cardinalidad
+        endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+        method = request.method
+        REQUEST_SECONDS.observe(elapsed, method, endpoint, str(response.status_code))
+        REQUEST_QUERIES.observe(stats.statements, method, endpoint)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, method, endpoint)
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries", '
+            f"app;dur={elapsed * 1000:.1f}"
+        )
+        if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+            SLOW_REQUESTS.inc(1, method, endpoint)
+            _slow_log(method, endpoint, elapsed, stats)
+        return response
+
+
+def token_ok(authorization: str | None) -> bool:
+    """``Authorization: Bearer <METRICS_TOKEN>``; always False when no token is configured."""
+    given = (authorization or "").removeprefix("Bearer ").strip()
+    return bool(METRICS_TOKEN) and hmac.compare_digest(given.encode(), METRICS_TOKEN.encode())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not token_ok(self.headers.get("Authorization")):
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Expose render() on a background HTTP server (processes without Flask routes, e.g. the worker)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
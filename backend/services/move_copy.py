@@ -0,0 +1,235 @@
+# backend/services/move_copy.py
+"""
+Server-side move and copy of files and folder subtrees (same owner, any
+of their rooms). Callers check ownership, bump the search generation and
+commit.
+
+Moves re-parent in place. A file gets a new folder_id. A folder gets a
+new parent_id, and one UPDATE rewrites the path prefix (and room) of its
+whole subtree. Ids never change.
+
+Copies never touch PDF bytes: every copy is one more reference to the
+same blob. A folder copy is a fixed number of set-based statements
+whatever its size. Each new folder takes a fresh id from the sequence,
+handed out in the order of the old ids, so the n-th original (by id) maps
+to the n-th copy (by id) and all files are copied with a single INSERT ...
+SELECT. Originals and copies are both selected by path prefix, never by
+id lists. Only the copied subtree's rows are locked while it is read.
+Text that was already extracted is copied by checksum
+(extraction.attach_texts_where), never extracted again.
+
+Aggregates follow: the old ancestors lose the subtree's totals, the new
+ones gain them (services/folder_stats.py). Files from before the blob
+store are hardlinked into it before they leave their room directory.
+"""
+from typing import NamedTuple
+from sqlalchemy import select, insert, update, func, literal, text, not_, case, and_, or_
+from ..db import engine, lock_for_write
+from ..models import Folder, File
+from .access import FileAccess
+from .blobs import acquire, acquire_files, is_blob, link_legacy_files
+from .extraction import attach_texts, attach_texts_where
+from .folder_stats import apply_delta, add_subtree, remove_subtree, STATS_COLUMNS
+from .search_engine import search_engine
+from .tree import child_path, under
+from .names import files_in, folders_in, free_name, claim
+
+
+class MoveError(ValueError):
+    pass
+
+
+class FolderCopy(NamedTuple):
+    id: int
+    name: str
+    folders: int
+    files: int
+
+
+def reserve_ids(db, model, n: int) -> list[int]:
+    """
+    n new ids for model's table, ascending. Not necessarily consecutive on
+    Postgres; on SQLite the caller must hold the write lock (lock_for_write).
+    """
+    if engine.dialect.name == "postgresql":
+        # un nextval por fila: sin lock de tabla, otras transacciones siguen insertando
+        seq = f"pg_get_serial_sequence('{model.__tablename__}', 'id')"
+        return sorted(db.execute(text(f"SELECT nextval({seq}) FROM generate_series(1, :n)"), {"n": n}).scalars())
+    # SQLite asigna max(rowid) + 1
+    first = (db.execute(select(func.max(model.id))).scalar() or 0) + 1
+    return list(range(first, first + n))
+
+
+def move_file(db, acc: FileAccess, dest: Folder) -> str:
+    """Put the file in dest under a free name; returns the name."""
+    f = acc.file
+    if f.folder_id == dest.id:
+        return f.name
+    if not is_blob(f.stored_name):
+        # la ruta legacy depende de sala y carpeta
+        link_legacy_files(db, acc.dataroom_id, File.id == f.id)
+
+    def write():
+        name = free_name(db, files_in(dest.id), f.name)
+        db.execute(
+            update(File).where(File.id == f.id).values(folder_id=dest.id, name=name)
+            .execution_options(synchronize_session=False)
+        )
+        return name
+
+    name = claim(db, write)
+    apply_delta(db, acc.folder_id, acc.folder_path, -1, -f.size_bytes)
+    apply_delta(db, dest.id, dest.path, 1, f.size_bytes)
+    if name != f.name:
+        search_engine.rename(db, f.id, name)
+    return name
+
+
+def copy_file(db, acc: FileAccess, dest: Folder) -> dict:
+    """New File in dest sharing acc's bytes (and text, if extracted)."""
+    f = acc.file
+    if not is_blob(f.stored_name):
+        link_legacy_files(db, acc.dataroom_id, File.id == f.id)
+        db.refresh(f)
+    acquire(db, f.checksum_sha256, f.size_bytes)
+
+    def insert():
+        copy = File(
+            folder_id=dest.id,
+            name=free_name(db, files_in(dest.id), f.name),
+            stored_name=f.stored_name,
+            mime_type=f.mime_type,
+            size_bytes=f.size_bytes,
+            checksum_sha256=f.checksum_sha256,
+        )
+        db.add(copy)
+        db.flush()
+        return copy
+
+    copy = claim(db, insert)
+    name = copy.name
+    text_status = attach_texts(db, [(copy.id, copy.checksum_sha256)])[copy.id]
+    apply_delta(db, dest.id, dest.path, 1, f.size_bytes)
+    return {"id": copy.id, "name": name, "folder_id": dest.id, "size_bytes": f.size_bytes, "text_status": text_status}
+
+
+def move_folder(db, folder: Folder, dest: Folder) -> str:
+    """Re-parent folder (and its subtree) under dest with a free name; returns the name."""
+    if folder.parent_id is None:
+        raise MoveError("cannot move root folder")
+    if dest.dataroom_id == folder.dataroom_id and dest.path.startswith(folder.path):
+        raise MoveError("cannot move a folder into itself")
+    if folder.parent_id == dest.id:
+        return folder.name
+    rid, prefix = folder.dataroom_id, folder.path
+    subtree = select(Folder.id).where(Folder.dataroom_id == rid, under(prefix))
+    if dest.dataroom_id != rid:
+        link_legacy_files(db, rid, File.folder_id.in_(subtree))
+    remove_subtree(db, folder)
+    new_prefix = child_path(dest.path, folder.id)
+
+    def write():
+        name = free_name(db, folders_in(dest.dataroom_id, dest.id), folder.name)
+        # sala y padre juntos: uq_folder_siblings es (sala, padre, nombre)
+        db.execute(
+            update(Folder).where(Folder.id == folder.id)
+            .values(parent_id=dest.id, name=name, dataroom_id=dest.dataroom_id, path=new_prefix)
+            .execution_options(synchronize_session=False)
+        )
+        return name
+
+    name = claim(db, write)
+    # el resto del subárbol en un solo UPDATE por prefijo: cada ruta conserva su cola de ids
+    db.execute(
+        update(Folder)
+        .where(Folder.dataroom_id == rid, under(prefix))
+        .values(path=literal(new_prefix) + func.substr(Folder.path, len(prefix) + 1), dataroom_id=dest.dataroom_id)
+        .execution_options(synchronize_session=False)
+    )
+    add_subtree(db, dest.path, folder.files_total, folder.bytes_total)
+    return name
+
+
+def copy_folder(db, folder: Folder, dest: Folder) -> FolderCopy:
+    """Duplicate folder's subtree (folders, files, texts) under dest; dest may lie inside it."""
+    rid, prefix = folder.dataroom_id, folder.path
+    # el subárbol no cambia (ni recibe carpetas o archivos) entre leerlo y copiarlo:
+    # FOR UPDATE sobre sus filas en Postgres (bloquea también las FK de inserts hijos),
+    # el lock de escritura en SQLite
+    lock_for_write(db, Folder)
+    sources = db.execute(
+        select(Folder.id, Folder.parent_id, Folder.name, Folder.path, *STATS_COLUMNS)
+        .where(Folder.dataroom_id == rid, under(prefix))
+        .order_by(Folder.id)
+        .with_for_update()
+    ).all()
+    old_ids = [r.id for r in sources]
+    # totales de la raíz leídos bajo el lock, no los de la entidad cargada antes
+    top = next(r for r in sources if r.id == folder.id)
+
+    # el k-ésimo original por id recibe el k-ésimo id nuevo
+    new_id = dict(zip(old_ids, reserve_ids(db, Folder, len(old_ids))))
+    copy_prefix = child_path(dest.path, new_id[folder.id])
+    # por prefijo, sin listas de ids; dest puede estar dentro del subárbol: las copias se excluyen
+    copy_folders = (Folder.dataroom_id == dest.dataroom_id, under(copy_prefix))
+    originals = (Folder.dataroom_id == rid, under(prefix), not_(under(copy_prefix)))
+    copies = File.folder_id.in_(select(Folder.id).where(*copy_folders))
+
+    # pocas filas comparadas con los archivos: las rutas se arman en Python
+    above = prefix[: -len(f"{folder.id}/")]
+    rows = []
+    for r in sources:
+        tail = r.path[len(above):].strip("/").split("/")
+        rows.append({
+            "id": new_id[r.id],
+            "name": r.name,
+            "dataroom_id": dest.dataroom_id,
+            "parent_id": dest.id if r.id == folder.id else new_id[r.parent_id],
+            "path": dest.path + "".join(f"{new_id[int(p)]}/" for p in tail),
+            "files_direct": r.files_direct,
+            "bytes_direct": r.bytes_direct,
+            "files_total": r.files_total,
+            "bytes_total": r.bytes_total,
+            "last_modified_at": r.last_modified_at,
+        })
+    # padres antes que hijos
+    rows.sort(key=lambda row: row["path"].count("/"))
+
+    def insert_folders():
+        # sólo la raíz de la copia puede chocar con un hermano
+        rows[0]["name"] = free_name(db, folders_in(dest.dataroom_id, dest.id), folder.name)
+        db.execute(insert(Folder), rows)
+        return rows[0]["name"]
+
+    name = claim(db, insert_folders)
+
+    # la copia no puede apuntar al directorio legacy del original
+    link_legacy_files(db, rid, File.folder_id.in_(select(Folder.id).where(*originals)))
+    # el mismo emparejamiento que new_id, en SQL y en una pasada: ordenados originales y luego
+    # copias, cada uno por id, el original k-ésimo tiene su copia n filas más adelante
+    is_copy = case((under(copy_prefix), 1), else_=0)
+    paired = (
+        select(
+            Folder.id.label("old_id"),
+            is_copy.label("is_copy"),
+            func.lead(Folder.id, len(old_ids)).over(order_by=(is_copy, Folder.id)).label("new_id"),
+        )
+        .where(or_(and_(*originals), and_(*copy_folders)))
+        .subquery()
+    )
+    folder_map = select(paired.c.old_id, paired.c.new_id).where(paired.c.is_copy == 0).cte("folder_map")
+    db.execute(
+        insert(File).from_select(
+            ["folder_id", "name", "stored_name", "mime_type", "size_bytes", "checksum_sha256"],
+            select(
+                folder_map.c.new_id, File.name, File.stored_name,
+                File.mime_type, File.size_bytes, File.checksum_sha256,
+            ).join(File, File.folder_id == folder_map.c.old_id),
+        )
+    )
+    copied = db.execute(select(func.count()).where(copies)).scalar()
+    acquire_files(db, copies)
+    attach_texts_where(db, copies)
+
+    add_subtree(db, dest.path, top.files_total, top.bytes_total)
+    return FolderCopy(new_id[folder.id], name, len(old_ids), copied)
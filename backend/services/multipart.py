@@ -0,0 +1,104 @@
+# backend/services/multipart.py
+"""
+Incremental multipart/form-data decoder for the ASGI upload route.
+
+Bytes are fed as they arrive and come back as events, so a part's body can
+be written to disk without buffering the request:
+
+    ("part", headers)   headers: {lowercased name: value}
+    ("data", bytes)     a slice of the current part's body
+    ("end", None)       the current part is complete
+
+Only the tail that could still be the start of a boundary is held back.
+"""
+from werkzeug.http import parse_options_header
+
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class MultipartError(ValueError):
+    pass
+
+
+def boundary_of(content_type: str | None) -> bytes | None:
+    mimetype, options = parse_options_header(content_type or "")
+    if mimetype != "multipart/form-data" or not options.get("boundary"):
+        return None
+    return options["boundary"].encode("latin-1")
+
+
+def disposition(headers: dict) -> tuple[str | None, str | None]:
+    """(field name, filename) from a part's Content-Disposition."""
+    _, options = parse_options_header(headers.get("content-disposition", ""))
+    return options.get("name"), options.get("filename")
+
+
+def _parse_headers(raw: bytes) -> dict:
+    headers = {}
+    for line in raw.split(b"\r\n"):
+        name, sep, value = line.partition(b":")
+        if not sep:
+            raise MultipartError("malformed part header")
+        # los navegadores mandan nombres de archivo UTF-8 sin codificar
+        headers[name.strip().lower().decode("latin-1")] = value.strip().decode("utf-8", "replace")
+    return headers
+
+
+class MultipartDecoder:
+    def __init__(self, boundary: bytes):
+        self._delim = b"\r\n--" + boundary
+        # el primer delimitador no lleva CRLF delante: lo simulamos
+        self._buf = b"\r\n"
+        self._state = "preamble"
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, data: bytes) -> list[tuple]:
+        events: list[tuple] = []
+        if self._state == "done":
+            return events
+        buf = self._buf + data
+        keep = len(self._delim) - 1
+        while True:
+            if self._state == "preamble":
+                i = buf.find(self._delim)
+                if i < 0:
+                    buf = buf[-keep:]
+                    break
+                buf = buf[i + len(self._delim):]
+                self._state = "delimiter"
+            elif self._state == "delimiter":
+                if len(buf) < 2:
+                    break
+                if buf[:2] == b"--":
+                    self._state, buf = "done", b""
+                    break
+                if buf[:2] != b"\r\n":
+                    raise MultipartError("malformed boundary")
+                buf = buf[2:]
+                self._state = "headers"
+            elif self._state == "headers":
+                i = buf.find(b"\r\n\r\n")
+                if i < 0:
+                    if len(buf) > MAX_HEADER_BYTES:
+                        raise MultipartError("part headers too large")
+                    break
+                events.append(("part", _parse_headers(buf[:i]) if i else {}))
+                buf = buf[i + 4:]
+                self._state = "body"
+            else:  # body
+                i = buf.find(self._delim)
+                if i < 0:
+                    if len(buf) > keep:
+                        events.append(("data", buf[:-keep]))
+                        buf = buf[-keep:]
+                    break
+                if i:
+                    events.append(("data", buf[:i]))
+                events.append(("end", None))
+                buf = buf[i + len(self._delim):]
+                self._state = "delimiter"
+        self._buf = buf
+        return events
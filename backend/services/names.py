@@ -0,0 +1,142 @@
+# backend/services/names.py
+"""
+Sibling name collisions for files and folders.
+
+A taken name gets the first free "stem (N).ext" suffix:
+
+    free_name(db, files_in(folder_id), "report.pdf")   "report (3).pdf"
+
+Only the names that can collide are read: the name itself and those
+starting with "stem (", an index range on (scope, name) however many
+siblings there are (SQLite compares binary strings; Postgres uses LIKE on
+a varchar_pattern_ops index, as tree.under does for paths).
+
+Reading first and writing after is racy on its own: the unique indexes
+(uq_files_folder_name, uq_folder_siblings) are what guarantee distinct
+names. ``claim`` runs the resolve-and-write step in a savepoint and runs
+it again when a concurrent writer took the name first. On SQLite it takes
+the write lock before resolving instead (pysqlite's own transaction
+handling turns RELEASE SAVEPOINT into a COMMIT of the whole transaction).
+"""
+import re
+from typing import Callable, NamedTuple, TypeVar
+from sqlalchemy import select, update, func, and_, union_all
+from sqlalchemy.exc import IntegrityError
+from ..db import engine, lock_for_write
+from ..models import File, Folder
+from .search_engine import search_engine
+
+CLAIM_ATTEMPTS = 5
+
+T = TypeVar("T")
+
+
+class Scope(NamedTuple):
+    """Siblings that must have distinct names."""
+    name: object
+    id: object
+    criteria: tuple
+
+
+def files_in(folder_id: int) -> Scope:
+    return Scope(File.name, File.id, (File.folder_id == folder_id,))
+
+
+def folders_in(dataroom_id: int, parent_id: int) -> Scope:
+    return Scope(Folder.name, Folder.id, (Folder.dataroom_id == dataroom_id, Folder.parent_id == parent_id))
+
+
+def split_name(name: str) -> tuple[str, str]:
+    """("stem", ".ext"); ext is empty when there is no dot."""
+    stem, dot, ext = name.rpartition(".")
+    if not dot:
+        return name, ""
+    return stem, "." + ext
+
+
+def next_collision_name(name: str, taken: set[str]) -> str:
+    """name, or "stem (N).ext" with the smallest N not in taken."""
+    if name not in taken:
+        return name
+    stem, ext = split_name(name)
+    i = 1
+    while f"{stem} ({i}){ext}" in taken:
+        i += 1
+    return f"{stem} ({i}){ext}"
+
+
+def _starts_with(col, prefix: str):
+    if engine.dialect.name == "postgresql":
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return col.like(escaped + "%", escape="\\")
+    # rango binario: el prefijo siempre termina en "(", su siguiente carácter es ")"
+    return and_(col >= prefix, col < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def taken_names(db, scope: Scope, name: str, exclude_id: int | None = None) -> set[str]:
+    """Sibling names that collide with name or one of its "stem (N).ext" variants."""
+    stem, ext = split_name(name)
+    prefix = f"{stem} ("
+    others = [scope.id != exclude_id] if exclude_id is not None else []
+    # dos búsquedas en el índice (igualdad y prefijo); con OR el planner recorre toda la carpeta
+    stmt = union_all(
+        select(scope.name).where(*scope.criteria, *others, scope.name == name),
+        select(scope.name).where(*scope.criteria, *others, _starts_with(scope.name, prefix)),
+    )
+    variant = re.compile(re.escape(prefix) + r"\d+\)" + re.escape(ext))
+    return {n for n in db.execute(stmt).scalars() if n == name or variant.fullmatch(n)}
+
+
+def free_name(db, scope: Scope, name: str, exclude_id: int | None = None) -> str:
+    return next_collision_name(name, taken_names(db, scope, name, exclude_id))
+
+
+def free_names(db, scope: Scope, names: list[str]) -> list[str]:
+    """Resolve a batch: against the siblings and against earlier names of the batch."""
+    claimed: set[str] = set()
+    out = []
+    for name in names:
+        final = next_collision_name(name, taken_names(db, scope, name) | claimed)
+        claimed.add(final)
+        out.append(final)
+    return out
+
+
+def claim(db, write: Callable[[], T], attempts: int = CLAIM_ATTEMPTS) -> T:
+    """
+    Run write() (resolve names, then flush the rows) in a savepoint; if a
+    unique index rejects a name a concurrent writer just took, roll back
+    to the savepoint and run it again.
+
+    SQLite runs write() once: with the database write lock held from the
+    start no other writer can take the name, and a savepoint would commit
+    the caller's transaction early.
+    """
+    if engine.dialect.name == "sqlite":
+        lock_for_write(db, File)
+        return write()
+    for attempt in range(attempts):
+        try:
+            with db.begin_nested():
+                return write()
+        except IntegrityError:
+            if attempt + 1 == attempts:
+                raise
+
+
+def dedupe_file_names(conn) -> int:
+    """Rename all but the oldest of each duplicated (folder_id, name); returns how many."""
+    dups = conn.execute(
+        select(File.folder_id, File.name).group_by(File.folder_id, File.name).having(func.count() > 1)
+    ).all()
+    renamed = 0
+    for folder_id, name in dups:
+        ids = conn.execute(
+            select(File.id).where(File.folder_id == folder_id, File.name == name).order_by(File.id)
+        ).scalars().all()
+        for file_id in ids[1:]:
+            new = free_name(conn, files_in(folder_id), name)
+            conn.execute(update(File).where(File.id == file_id).values(name=new, updated_at=File.updated_at))
+            search_engine.rename(conn, file_id, new)
+            renamed += 1
+    return renamed
@@ -1,11 +1,53 @@
 # backend/services/pdf_text.py
-from pdfminer.high_level import extract_text
+from io import StringIO
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
 
-def extract_pdf_text(path: str, max_chars: int = 1_000_000) -> str:
+MAX_CHARS = 1_000_000
+
+
+def iter_pdf_pages(path: str):
+    """Yield the text of each page, parsing one page at a time."""
+    with open(path, "rb") as fp, StringIO() as out:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = TextConverter(rsrcmgr, out, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page in PDFPage.get_pages(fp, caching=True):
+            interpreter.process_page(page)
+            # TextConverter cierra cada página con \f
+            yield out.getvalue().rstrip("\x0c")
+            out.seek(0)
+            out.truncate(0)
+
+
+def extract_pdf_pages(path: str, max_chars: int = MAX_CHARS, strict: bool = False) -> list[str]:
+    """
+    Per-page text, stopping once max_chars have been collected (the last
+    page is truncated), so huge documents cost only what we keep.
+    With strict=True errors propagate (used by the worker).
+    """
+    pages: list[str] = []
+    budget = max_chars
     try:
-        txt = extract_text(path) or ""
-        if len(txt) > max_chars:
-            return txt[:max_chars]
-        return txt
+        for txt in iter_pdf_pages(path):
+            if len(txt) >= budget:
+                pages.append(txt[:budget])
+                break
+            pages.append(txt)
+            budget -= len(txt)
     except Exception:
-        return ""
+        if strict:
+            raise
+        return []
+    return pages
+
+
+def extract_pdf_text(path: str, max_chars: int = MAX_CHARS, strict: bool = False) -> str:
+    """Plain text of the whole document (pages joined), capped at max_chars."""
+    return join_pages(extract_pdf_pages(path, max_chars, strict))
+
+
+def join_pages(pages: list[str]) -> str:
+    return "\n\x0c".join(pages)
@@ -0,0 +1,197 @@
+# backend/services/resumable.py
+"""
+Resumable (chunked) uploads for PDFs larger than one request.
+
+A session fixes the final size and a chunk size; its bytes go to one
+file under UPLOAD_DIR/blobs/resumable/, preallocated to the final size,
+and every chunk is written in place at its offset. Chunks are therefore
+independent: clients may send them in parallel, out of order or again
+after a dropped connection. A chunk counts (upload_chunks row) only after
+its bytes are flushed to disk.
+
+Completing moves the session from open to assembling (``claim``, which
+also restarts its expiry), hashes the assembled file in one sequential
+read, then uploads.create_uploaded_file renames it into the blob store
+(same filesystem) and creates the File row like a single-request upload.
+If that fails, ``reopen`` makes the session open again for a retry.
+
+Every chunk pushes expires_at forward by UPLOAD_SESSION_TTL_HOURS;
+``collect_expired_uploads`` (run by the disk collector) removes sessions
+nobody touched since.
+"""
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, func
+from ..db import session
+from ..models import UploadSession, UploadChunk
+from ..config import UPLOAD_DIR, UPLOAD_CHUNK_MB, UPLOAD_SESSION_TTL_HOURS
+from .storage import CHUNK_SIZE
+from .metrics import observe_io
+
+# bajo blobs/: completar es un rename dentro del mismo filesystem
+RESUMABLE_DIR = os.path.join(UPLOAD_DIR, "blobs", "resumable")
+CHUNK_BYTES = UPLOAD_CHUNK_MB * 1024 * 1024
+
+STATUS_OPEN = "open"
+STATUS_ASSEMBLING = "assembling"
+
+
+class IncompleteChunk(ValueError):
+    pass
+
+
+def data_path(sid: str) -> str:
+    return os.path.join(RESUMABLE_DIR, f"{sid}.bin")
+
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+
+
+def create_upload(db, folder_id: int, uid: int, filename: str, size_bytes: int) -> UploadSession:
+    """Insert a session and preallocate its data file (caller commits)."""
+    up = UploadSession(
+        id=uuid.uuid4().hex,
+        owner_id=uid,
+        folder_id=folder_id,
+        filename=filename,
+        size_bytes=size_bytes,
+        chunk_size=CHUNK_BYTES,
+        status=STATUS_OPEN,
+        expires_at=_expiry(),
+    )
+    os.makedirs(RESUMABLE_DIR, exist_ok=True)
+    # archivo disperso del tamaño final: cada chunk se escribe en su offset
+    with open(data_path(up.id), "wb") as f:
+        f.truncate(size_bytes)
+    db.add(up)
+    db.flush()
+    return up
+
+
+def live_upload(db, sid: str, uid: int) -> UploadSession | None:
+    """The caller's session sid if it has not expired."""
+    return db.execute(
+        select(UploadSession).where(
+            UploadSession.id == sid,
+            UploadSession.owner_id == uid,
+            UploadSession.expires_at > datetime.now(timezone.utc),
+        )
+    ).scalar_one_or_none()
+
+
+def chunk_length(up: UploadSession, start: int) -> int | None:
+    """Exact byte count of the chunk at start (None if start is not a chunk boundary)."""
+    if start < 0 or start >= up.size_bytes or start % up.chunk_size:
+        return None
+    return min(up.chunk_size, up.size_bytes - start)
+
+
+def write_chunk(sid: str, start: int, length: int, stream) -> None:
+    """Copy exactly length bytes from stream to the data file at start; durable on return."""
+    written = 0
+    io_seconds = 0.0
+    with open(data_path(sid), "r+b") as f:
+        f.seek(start)
+        while written < length:
+            chunk = stream.read(min(CHUNK_SIZE, length - written))
+            if not chunk:
+                # conexión cortada: el chunk no se registra y el cliente lo reenvía
+                raise IncompleteChunk("chunk body shorter than expected")
+            t0 = time.perf_counter()
+            f.write(chunk)
+            io_seconds += time.perf_counter() - t0
+            written += len(chunk)
+        t0 = time.perf_counter()
+        f.flush()
+        os.fsync(f.fileno())
+        io_seconds += time.perf_counter() - t0
+    observe_io("chunk_write", io_seconds, written)
+
+
+def record_chunk(db, sid: str, start: int, size: int) -> None:
+    """Mark the chunk as received (idempotent) and extend the session (caller commits)."""
+    if db.get(UploadChunk, (sid, start)) is None:
+        db.add(UploadChunk(session_id=sid, start=start, size=size))
+    db.execute(update(UploadSession).where(UploadSession.id == sid).values(expires_at=_expiry()))
+
+
+def progress(db, up: UploadSession) -> dict:
+    starts = set(db.execute(select(UploadChunk.start).where(UploadChunk.session_id == up.id)).scalars())
+    missing = [s for s in range(0, up.size_bytes, up.chunk_size) if s not in starts]
+    received = db.execute(
+        select(func.coalesce(func.sum(UploadChunk.size), 0)).where(UploadChunk.session_id == up.id)
+    ).scalar()
+    return {
+        "id": up.id,
+        "folder_id": up.folder_id,
+        "filename": up.filename,
+        "size_bytes": up.size_bytes,
+        "chunk_size": up.chunk_size,
+        "received_bytes": received,
+        "missing": missing,
+        "status": up.status,
+        "expires_at": up.expires_at.isoformat(),
+    }
+
+
+def claim(db, sid: str) -> bool:
+    """open -> assembling; False if another request got there first (caller commits)."""
+    res = db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == sid, UploadSession.status == STATUS_OPEN)
+        # plazo nuevo: el colector no borra el archivo de datos mientras se ensambla
+        .values(status=STATUS_ASSEMBLING, expires_at=_expiry())
+    )
+    return res.rowcount == 1
+
+
+def reopen(sid: str) -> None:
+    """
+    assembling -> open after a failed complete, so the client can retry;
+    the session is dropped instead if its data file already went to the
+    blob store. Uses its own transaction.
+    """
+    with session() as db:
+        if os.path.exists(data_path(sid)):
+            db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == sid, UploadSession.status == STATUS_ASSEMBLING)
+                .values(status=STATUS_OPEN, expires_at=_expiry())
+            )
+        else:
+            drop_upload(db, sid)
+
+
+def drop_upload(db, sid: str) -> None:
+    """Delete the session rows and its data file if still there (caller commits)."""
+    db.execute(delete(UploadChunk).where(UploadChunk.session_id == sid))
+    db.execute(delete(UploadSession).where(UploadSession.id == sid))
+    try:
+        os.remove(data_path(sid))
+    except FileNotFoundError:
+        pass
+
+
+def collect_expired_uploads() -> int:
+    """Remove sessions past expires_at with their data files; returns how many."""
+    with session() as db:
+        sids = db.execute(
+            select(UploadSession.id).where(UploadSession.expires_at <= datetime.now(timezone.utc))
+        ).scalars().all()
+    removed = 0
+    for sid in sids:
+        with session() as db:
+            # re-chequeo: un chunk pudo extender la sesión mientras tanto
+            if db.execute(
+                select(UploadSession.id).where(
+                    UploadSession.id == sid, UploadSession.expires_at <= datetime.now(timezone.utc)
+                )
+            ).first() is None:
+                continue
+            drop_upload(db, sid)
+            db.commit()
+            removed += 1
+    return removed
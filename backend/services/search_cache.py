@@ -0,0 +1,149 @@
+# backend/services/search_cache.py
+"""
+Search result cache keyed by a per-owner generation.
+
+Every write that can change what an owner's searches return (upload,
+rename, delete, move, extracted text landing) bumps
+users.search_generation in the same transaction. Cache keys embed the
+generation, so a bump makes every older entry unreachable: no TTLs, no
+explicit invalidation, and it works across processes because the
+generation is read from the database (a primary-key lookup).
+
+The default backend is a bounded in-process LRU; SEARCH_CACHE_URL selects
+a shared Redis backend (optional dependency).
+"""
+import json, threading
+from collections import OrderedDict
+from sqlalchemy import select, update
+from ..config import SEARCH_CACHE_SIZE, SEARCH_CACHE_URL, SEARCH_CACHE_TTL_SECONDS
+from ..models import User, Dataroom, Folder, File
+
+
+class CacheBackend:
+    name = "none"
+
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def size(self) -> int:
+        return 0
+
+
+class LRUCache(CacheBackend):
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def size(self):
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int):
+        import redis  # dependencia opcional
+
+        self._r = redis.Redis.from_url(url)
+        self._ttl = ttl  # sólo para liberar memoria; la corrección la da la generación
+
+    def get(self, key):
+        raw = self._r.get("search:" + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self._r.set("search:" + key, json.dumps(value), ex=self._ttl)
+
+    def size(self):
+        return -1
+
+
+def _make_backend() -> CacheBackend:
+    if SEARCH_CACHE_URL:
+        return RedisCache(SEARCH_CACHE_URL, SEARCH_CACHE_TTL_SECONDS)
+    if SEARCH_CACHE_SIZE > 0:
+        return LRUCache(SEARCH_CACHE_SIZE)
+    return CacheBackend()
+
+
+class SearchCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, db, uid: int, kind: str, params: dict, compute):
+        """Return the cached page for (uid, generation, kind, params) or compute it."""
+        gen = db.execute(select(User.search_generation).where(User.id == uid)).scalar_one_or_none()
+        if gen is None:
+            return compute()
+        key = f"{uid}:{gen}:{kind}:" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "entries": self.backend.size(),
+            "max_entries": getattr(self.backend, "maxsize", None),
+        }
+
+
+def bump_generation(db, uid: int) -> None:
+    """Invalidate uid's cached searches; call inside the write transaction."""
+    db.execute(
+        update(User).where(User.id == uid).values(search_generation=User.search_generation + 1)
+    )
+
+
+def bump_file_owners(db, file_ids: list[int]) -> None:
+    """Same, for the owners of file_ids (worker side, no request user)."""
+    if not file_ids:
+        return
+    owners = (
+        select(Dataroom.owner_id)
+        .join(Folder, Folder.dataroom_id == Dataroom.id)
+        .join(File, File.folder_id == Folder.id)
+        .where(File.id.in_(file_ids))
+    )
+    db.execute(
+        update(User)
+        .where(User.id.in_(owners))
+        .values(search_generation=User.search_generation + 1)
+    )
+
+
+search_cache = SearchCache(_make_backend())
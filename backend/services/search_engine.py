@@ -0,0 +1,316 @@
+# backend/services/search_engine.py
+"""
+Content-search backends.
+
+``PostgresSearchEngine`` matches and ranks (ts_rank_cd) on the stored
+file_texts.content_tsv column and runs ts_headline only for returned rows;
+``SqliteFtsSearchEngine`` keeps FTS5 tables (file_fts, file_page_fts) in
+sync and uses MATCH, snippet() and bm25(). Both return the same item
+shape and page with the same keysets (utils/pagination.py):
+
+    sort="created":   created_at DESC, id DESC
+    sort="relevance": score DESC, id DESC
+
+Index hooks (index_text / rename / remove) run inside the caller's
+transaction and are no-ops where the database maintains the index.
+"""
+from sqlalchemy import select, insert, delete, update, func, table, column, literal_column
+from ..db import engine
+from ..utils.pagination import Keyset, DESC
+from ..models import File, Folder, Dataroom, FileText, FilePageText
+
+TEXT_DONE = "done"
+SORTS = ("created", "relevance")
+PAGE_ROWID_BITS = 20  # file_page_fts.rowid = file_id << 20 | page_no
+REMOVE_BY_ID_MAX = 200  # hasta aquí borramos páginas por rango de rowid, arriba por conjunto
+
+file_fts = table("file_fts", column("rowid"), column("name"), column("content"))
+file_page_fts = table("file_page_fts", column("rowid"), column("content"), column("file_id"), column("page_no"))
+
+
+class SearchEngine:
+    """Interface + shared helpers; subclasses provide the matching SQL."""
+
+    name = "base"
+
+    def index_text(self, db, file_ids: list[int]) -> None:
+        """Called once extracted text for file_ids is stored (status done)."""
+
+    def index_copies(self, db, *criteria) -> None:
+        """Called after inserting File rows matching criteria together with copied text rows."""
+
+    def rename(self, db, file_id: int, name: str) -> None:
+        """Called when a file is renamed."""
+
+    def remove(self, db, *criteria) -> None:
+        """Called before deleting the File rows matching criteria."""
+
+    def search_content(self, db, uid: int, q: str, limit: int, cursor: str | None,
+                       sort: str = "created", pages_per_file: int = 3, scope=None) -> dict:
+        """scope: optional extra criterion on File (e.g. a folder subtree)."""
+        raise NotImplementedError
+
+    # ---- helpers compartidos ----
+
+    def _owner_scope(self, stmt, uid: int, scope=None):
+        stmt = (
+            stmt.join(Folder, Folder.id == File.folder_id)
+            .join(Dataroom, Dataroom.id == Folder.dataroom_id)
+            .where(Dataroom.owner_id == uid)
+        )
+        return stmt if scope is None else stmt.where(scope)
+
+    @staticmethod
+    def _keyset(sort: str, score) -> Keyset:
+        # score es el label de la consulta: el cursor guarda su valor por nombre
+        if sort == "relevance":
+            return Keyset("relevance", [(score, DESC), (File.id, DESC)])
+        return Keyset("created", [(File.created_at, DESC), (File.id, DESC)])
+
+    def _page(self, rows, limit: int, keyset: Keyset, snippets: dict[int, str],
+              hits: dict[int, list[dict]]) -> dict:
+        items = [
+            {
+                "id": r.id,
+                "name": r.name,
+                "size_bytes": r.size_bytes,
+                "mime_type": r.mime_type,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+                "folder_id": r.folder_id,
+                "snippet": snippets.get(r.id),
+                "score": r.score,
+                "pages": hits.get(r.id, []),
+            }
+            for r in rows[:limit]
+        ]
+        next_cursor = keyset.encode(rows[limit - 1]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _collect_hits(rows) -> dict[int, list[dict]]:
+        hits: dict[int, list[dict]] = {}
+        for r in rows:
+            hits.setdefault(r.file_id, []).append({"page": r.page_no, "snippet": r.snippet})
+        return hits
+
+
+class PostgresSearchEngine(SearchEngine):
+    name = "postgres"
+
+    # columnas generadas (bootstrap.ensure_schema) con índice GIN
+    text_tsv = literal_column("file_texts.content_tsv")
+    page_tsv = literal_column("file_page_texts.content_tsv")
+
+    def search_content(self, db, uid, q, limit, cursor, sort="created", pages_per_file=3, scope=None):
+        if not q.split():
+            return {"items": [], "next_cursor": None}
+        # plainto_tsquery: AND de los términos sin sintaxis tsquery del usuario
+        ts_query = func.plainto_tsquery('simple', q)
+        score = func.ts_rank_cd(self.text_tsv, ts_query).label("score")
+        keyset = self._keyset(sort, score)
+        stmt = (
+            select(
+                File.id,
+                File.name,
+                File.size_bytes,
+                File.mime_type,
+                File.created_at,
+                File.folder_id,
+                score,
+            )
+            .select_from(FileText)
+            .join(File, File.id == FileText.file_id)
+            .where(FileText.status == TEXT_DONE)
+            .where(self.text_tsv.op('@@')(ts_query))
+        )
+        stmt = keyset.apply(self._owner_scope(stmt, uid, scope), cursor)
+        rows = db.execute(stmt.limit(limit + 1)).all()
+        ids = [r.id for r in rows[:limit]]
+        # ts_headline sólo para la página devuelta, nunca por candidato
+        snippets = self._headlines(db, ids, ts_query)
+        hits = self._page_hits(db, ids, ts_query, pages_per_file)
+        return self._page(rows, limit, keyset, snippets, hits)
+
+    def _headlines(self, db, file_ids, ts_query) -> dict[int, str]:
+        if not file_ids:
+            return {}
+        rows = db.execute(
+            select(FileText.file_id, func.ts_headline('simple', FileText.content_plain, ts_query))
+            .where(FileText.file_id.in_(file_ids))
+        ).all()
+        return dict(rows)
+
+    def _page_hits(self, db, file_ids, ts_query, per_file):
+        # primeras páginas con match de cada archivo devuelto; ts_headline sólo sobre esas páginas
+        if not file_ids or per_file <= 0:
+            return {}
+        ranked = (
+            select(
+                FilePageText.file_id,
+                FilePageText.page_no,
+                FilePageText.content,
+                func.row_number()
+                .over(partition_by=FilePageText.file_id, order_by=FilePageText.page_no)
+                .label("rn"),
+            )
+            .where(FilePageText.file_id.in_(file_ids))
+            .where(self.page_tsv.op('@@')(ts_query))
+            .subquery()
+        )
+        rows = db.execute(
+            select(
+                ranked.c.file_id,
+                ranked.c.page_no,
+                func.ts_headline('simple', ranked.c.content, ts_query).label("snippet"),
+            )
+            .where(ranked.c.rn <= per_file)
+            .order_by(ranked.c.file_id, ranked.c.page_no)
+        ).all()
+        return self._collect_hits(rows)
+
+
+class SqliteFtsSearchEngine(SearchEngine):
+    name = "sqlite-fts5"
+
+    @staticmethod
+    def _match(terms: list[str]) -> str:
+        # cada término como frase entre comillas: sin sintaxis FTS del usuario, AND implícito
+        return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    def index_text(self, db, file_ids):
+        if not file_ids:
+            return
+        self._remove_ids(db, file_ids)
+        self._insert(db, File.id.in_(file_ids))
+
+    def index_copies(self, db, *criteria):
+        # filas nuevas: no hay entradas previas que borrar
+        self._insert(db, *criteria)
+
+    def _insert(self, db, *criteria):
+        db.execute(
+            insert(file_fts).from_select(
+                ["rowid", "name", "content"],
+                select(File.id, File.name, FileText.content_plain)
+                .join(FileText, FileText.file_id == File.id)
+                .where(*criteria),
+            )
+        )
+        db.execute(
+            insert(file_page_fts).from_select(
+                ["rowid", "content", "file_id", "page_no"],
+                select(
+                    FilePageText.file_id.op("<<")(PAGE_ROWID_BITS).op("|")(FilePageText.page_no),
+                    FilePageText.content,
+                    FilePageText.file_id,
+                    FilePageText.page_no,
+                )
+                .join(File, File.id == FilePageText.file_id)
+                .join(FileText, FileText.file_id == File.id)
+                .where(*criteria),
+            )
+        )
+
+    def rename(self, db, file_id, name):
+        db.execute(update(file_fts).where(file_fts.c.rowid == file_id).values(name=name))
+
+    def remove(self, db, *criteria):
+        ids = select(File.id).where(*criteria)
+        few = db.execute(ids.limit(REMOVE_BY_ID_MAX + 1)).scalars().all()
+        if len(few) <= REMOVE_BY_ID_MAX:
+            self._remove_ids(db, few)
+            return
+        # borrados grandes (carpeta/dataroom): por conjunto, sin traer los ids a Python
+        db.execute(delete(file_fts).where(file_fts.c.rowid.in_(ids)))
+        db.execute(delete(file_page_fts).where(file_page_fts.c.file_id.in_(ids)))
+
+    def _remove_ids(self, db, file_ids):
+        if not file_ids:
+            return
+        db.execute(delete(file_fts).where(file_fts.c.rowid.in_(file_ids)))
+        for fid in file_ids:
+            # rango de rowid: FTS5 lo resuelve sin recorrer la tabla
+            lo = fid << PAGE_ROWID_BITS
+            db.execute(
+                delete(file_page_fts).where(
+                    file_page_fts.c.rowid >= lo, file_page_fts.c.rowid < lo + (1 << PAGE_ROWID_BITS)
+                )
+            )
+
+    def search_content(self, db, uid, q, limit, cursor, sort="created", pages_per_file=3, scope=None):
+        terms = q.split()
+        if not terms:
+            return {"items": [], "next_cursor": None}
+        match = self._match(terms)
+        fts = literal_column("file_fts")
+        # bm25: menor es mejor; lo negamos para ordenar como Postgres (mayor primero)
+        score = (-func.bm25(fts)).label("score")
+        keyset = self._keyset(sort, score)
+        stmt = (
+            select(
+                File.id,
+                File.name,
+                File.size_bytes,
+                File.mime_type,
+                File.created_at,
+                File.folder_id,
+                score,
+            )
+            .select_from(file_fts)
+            .join(File, File.id == file_fts.c.rowid)
+            .join(FileText, FileText.file_id == File.id)
+            .where(FileText.status == TEXT_DONE)
+            .where(fts.op("MATCH")(f"content : ({match})"))
+        )
+        stmt = keyset.apply(self._owner_scope(stmt, uid, scope), cursor)
+        rows = db.execute(stmt.limit(limit + 1)).all()
+        ids = [r.id for r in rows[:limit]]
+        snippets = dict(
+            db.execute(
+                select(file_fts.c.rowid, func.snippet(fts, 1, "<b>", "</b>", "…", 16))
+                .where(fts.op("MATCH")(f"content : ({match})"))
+                .where(file_fts.c.rowid.in_(ids))
+            ).all()
+        ) if ids else {}
+        hits = self._page_hits(db, ids, match, pages_per_file)
+        return self._page(rows, limit, keyset, snippets, hits)
+
+    def _page_hits(self, db, file_ids, match, per_file):
+        if not file_ids or per_file <= 0:
+            return {}
+        fts = literal_column("file_page_fts")
+        # snippet() no admite funciones de ventana en la misma consulta:
+        # elegimos los rowid primero y resaltamos sólo esos
+        ranked = (
+            select(
+                file_page_fts.c.rowid,
+                func.row_number()
+                .over(partition_by=file_page_fts.c.file_id, order_by=file_page_fts.c.page_no)
+                .label("rn"),
+            )
+            .where(fts.op("MATCH")(match))
+            .where(file_page_fts.c.file_id.in_(file_ids))
+            .subquery()
+        )
+        rows = db.execute(
+            select(
+                file_page_fts.c.file_id,
+                file_page_fts.c.page_no,
+                func.snippet(fts, 0, "<b>", "</b>", "…", 16).label("snippet"),
+            )
+            .where(fts.op("MATCH")(match))
+            .where(file_page_fts.c.rowid.in_(select(ranked.c.rowid).where(ranked.c.rn <= per_file)))
+            .order_by(file_page_fts.c.file_id, file_page_fts.c.page_no)
+        ).all()
+        return self._collect_hits(rows)
+
+
+def get_search_engine(dialect: str) -> SearchEngine:
+    if dialect == "postgresql":
+        return PostgresSearchEngine()
+    if dialect == "sqlite":
+        return SqliteFtsSearchEngine()
+    raise RuntimeError(f"no content search backend for {dialect}")
+
+
+search_engine = get_search_engine(engine.dialect.name)
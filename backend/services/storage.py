@@ -0,0 +1,128 @@
+# backend/services/storage.py
+import os, time, hashlib, tempfile
+from typing import NamedTuple
+from ..util import PDF_MAGIC
+from .metrics import observe_io
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class NotPdfError(ValueError):
+    pass
+
+
+class FileTooLarge(ValueError):
+    pass
+
+
+class StagedPdf(NamedTuple):
+    """A hashed PDF on disk, not yet at its final path."""
+    path: str
+    checksum: str
+    size_bytes: int
+
+    def place(self, disk_path: str) -> None:
+        """Rename to disk_path (same filesystem, so the rename is atomic)."""
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        # si ya existía lo reemplazamos por bytes idénticos
+        os.replace(self.path, disk_path)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class PdfWriter:
+    """
+    Incremental single-pass writer: hashes (SHA-256), counts bytes and
+    sniffs the %PDF header while writing to a temp file in tmp_dir;
+    finish() returns it as a StagedPdf. Chunks may come from a blocking
+    stream (write_pdf_stream) or from an event loop (the ASGI upload route).
+    """
+
+    def __init__(self, tmp_dir: str):
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix=".upload-", suffix=".part")
+        self._out = os.fdopen(fd, "wb")
+        self._h = hashlib.sha256()
+        self._head = b""
+        self.size = 0
+        self.io_seconds = 0.0  # sólo escrituras: leer el request es red, no disco
+
+    def write(self, chunk: bytes) -> None:
+        if len(self._head) < len(PDF_MAGIC):
+            # lecturas cortas: juntamos hasta tener los bytes mágicos
+            self._head += chunk
+            if len(self._head) < len(PDF_MAGIC):
+                return
+            if not self._head.startswith(PDF_MAGIC):
+                raise NotPdfError("not a pdf")
+            chunk, self._head = self._head, self._head[:len(PDF_MAGIC)]
+        self._h.update(chunk)
+        t0 = time.perf_counter()
+        self._out.write(chunk)
+        self.io_seconds += time.perf_counter() - t0
+        self.size += len(chunk)
+
+    def finish(self) -> StagedPdf:
+        if len(self._head) < len(PDF_MAGIC):
+            raise NotPdfError("not a pdf")
+        self._out.close()
+        observe_io("upload_write", self.io_seconds, self.size)
+        return StagedPdf(self.tmp_path, self._h.hexdigest(), self.size)
+
+    def abort(self) -> None:
+        self._out.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def write_pdf_stream(
+    stream,
+    tmp_dir: str,
+    max_bytes: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> StagedPdf:
+    """
+    Copy an upload stream to a temp file in a single pass (see PdfWriter).
+    Raises NotPdfError if the header does not match, or FileTooLarge once
+    more than max_bytes were read; either way nothing is left behind.
+    """
+    writer = PdfWriter(tmp_dir)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            writer.write(chunk)
+            # contamos lo leído: sin Content-Length (chunked) no hay otro límite por archivo
+            if max_bytes is not None and writer.size > max_bytes:
+                raise FileTooLarge("file too large")
+        return writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def hash_pdf_file(path: str, chunk_size: int = CHUNK_SIZE) -> StagedPdf:
+    """
+    Hash a complete file already on disk (an assembled resumable upload) in
+    one sequential read; raises NotPdfError if the header does not match.
+    The file stays where it is.
+    """
+    h = hashlib.sha256()
+    size = 0
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        if f.read(len(PDF_MAGIC)) != PDF_MAGIC:
+            raise NotPdfError("not a pdf")
+        f.seek(0)
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+            size += len(chunk)
+    observe_io("upload_assemble", time.perf_counter() - t0, size)
+    return StagedPdf(path, h.hexdigest(), size)
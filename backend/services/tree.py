@@ -0,0 +1,91 @@
+# backend/services/tree.py
+"""
+Folder hierarchy index: folders.path is the materialized chain of ids
+from the room root down to the folder itself, e.g. "/12/40/41/".
+
+Ids never change, so renames leave paths alone; a folder's subtree is
+every row of the same room whose path starts with its path, which the
+(dataroom_id, path) index answers as a range scan:
+
+    Postgres: path LIKE '/12/40/%'   (varchar_pattern_ops, collation-proof)
+    SQLite:   path >= '/12/40/' AND path < '/12/400'   (binary order)
+"""
+from sqlalchemy import select, and_, func, false
+from ..db import engine
+from ..models import Folder
+
+
+def child_path(parent_path: str, folder_id: int) -> str:
+    return f"{parent_path}{folder_id}/"
+
+
+def root_path(folder_id: int) -> str:
+    return f"/{folder_id}/"
+
+
+def under(prefix: str, col=Folder.path):
+    """Predicate: col lies in the subtree rooted at prefix (inclusive)."""
+    if engine.dialect.name == "postgresql":
+        # prefix sólo tiene dígitos y "/": nada que escapar en LIKE
+        return col.like(prefix + "%")
+    # '0' es el carácter siguiente a '/': cota superior exclusiva del rango
+    return and_(col >= prefix, col < prefix[:-1] + "0")
+
+
+def depth_of(col=Folder.path):
+    """SQL depth of a path (root = 0): number of '/' minus two."""
+    return func.length(col) - func.length(func.replace(col, "/", "")) - 2
+
+
+def path_of(db, folder_id: int) -> tuple[int, str] | None:
+    """(dataroom_id, path) of a folder."""
+    row = db.execute(select(Folder.dataroom_id, Folder.path).where(Folder.id == folder_id)).first()
+    return (row.dataroom_id, row.path) if row else None
+
+
+def subtree_ids(db, folder_id: int):
+    """SELECT of folder_id and all its descendant ids (one indexed range scan)."""
+    found = path_of(db, folder_id)
+    if not found:
+        return select(Folder.id).where(false())
+    rid, prefix = found
+    return select(Folder.id).where(Folder.dataroom_id == rid, under(prefix))
+
+
+def folder_tree(db, rid: int, root_id: int, max_depth: int | None = None) -> dict | None:
+    """
+    Nested {id, name, parent_id, children: [...]} for root_id's subtree,
+    optionally limited to max_depth levels below it, from a single query.
+    """
+    found = path_of(db, root_id)
+    if not found:
+        return None
+    _, prefix = found
+    stmt = (
+        select(Folder.id, Folder.parent_id, Folder.name, Folder.files_total, Folder.bytes_total)
+        .where(Folder.dataroom_id == rid, under(prefix))
+        .order_by(Folder.path)
+    )
+    if max_depth is not None:
+        stmt = stmt.where(depth_of() <= prefix.count("/") - 2 + max_depth)
+    nodes: dict[int, dict] = {}
+    top = None
+    # orden por ruta: cada padre aparece antes que sus hijos
+    for fid, parent_id, name, files_total, bytes_total in db.execute(stmt):
+        node = {
+            "id": fid,
+            "name": name,
+            "parent_id": parent_id,
+            "files_total": files_total,
+            "bytes_total": bytes_total,
+            "children": [],
+        }
+        nodes[fid] = node
+        if fid == root_id:
+            top = node
+        elif parent_id in nodes:
+            nodes[parent_id]["children"].append(node)
+    for node in nodes.values():
+        node["children"].sort(key=lambda n: n["name"].lower())
+    return top
+
@@ -0,0 +1,55 @@
+# backend/services/uploads.py
+"""
+Database side of a single upload, shared by the Flask route, the ASGI
+streaming route and resumable uploads: the bytes are already hashed into
+a staged file when this runs.
+"""
+from ..models import File
+from .extraction import enqueue_extraction, reuse_extracted_text, TEXT_PENDING, TEXT_DONE
+from .blobs import store
+from .storage import StagedPdf
+from .search_cache import bump_generation
+from .folder_stats import apply_delta
+from .names import files_in, free_name, claim
+
+
+def create_uploaded_file(db, folder, uid: int, original_name: str, staged: StagedPdf) -> dict:
+    """Move the bytes into the blob store, insert the File row under a free name and queue its text; commits."""
+    stored = store(db, [staged])[0]
+    checksum, size_bytes = staged.checksum, staged.size_bytes
+
+    def insert():
+        file = File(
+            folder_id=folder.id,
+            name=free_name(db, files_in(folder.id), original_name),
+            stored_name=stored,
+            mime_type="application/pdf",
+            size_bytes=size_bytes,
+            checksum_sha256=checksum,
+        )
+        db.add(file)
+        db.flush()  # asegura file.id disponible (y choca con el índice único si el nombre se ocupó)
+        return file
+
+    file = claim(db, insert)
+    final_name = file.name
+
+    # mismos bytes ya extraídos: copiamos el texto; si no, lo hace el worker
+    if reuse_extracted_text(db, file.id, checksum):
+        text_status = TEXT_DONE
+    else:
+        enqueue_extraction(db, file.id)
+        text_status = TEXT_PENDING
+
+    apply_delta(db, folder.id, folder.path, 1, size_bytes)
+    bump_generation(db, uid)
+    db.commit()
+    db.refresh(file)
+    return {
+        "id": file.id,
+        "name": file.name,
+        "size_bytes": file.size_bytes,
+        "renamed": final_name != original_name,
+        "original_name": original_name,
+        "text_status": text_status,
+    }
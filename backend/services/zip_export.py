@@ -0,0 +1,165 @@
+# backend/services/zip_export.py
+"""
+Streaming ZIP export of a folder subtree.
+
+The archive is produced on the fly: zipfile writes into a non-seekable
+sink (so it emits data descriptors instead of seeking back), and the
+generator hands out whatever the sink holds after every chunk. PDFs are
+already compressed, so entries are ZIP_STORED. File rows are read in
+keyset-paged batches, each in its own short session: no connection or
+transaction stays open while bytes go to a slow client. Nothing is staged
+on disk and memory stays bounded by the batch plus the folder-path map.
+
+Batches see the tree as it is when they run: files added to folders
+created after the export started are left out, and files deleted or
+moved mid-export may be missing.
+"""
+import os
+import time
+import logging
+import zipfile
+from datetime import datetime
+from sqlalchemy import select
+from ..db import read_session
+from ..models import Folder, File
+from ..utils.pagination import Keyset, ASC
+from .blobs import file_disk_path
+from .tree import under, path_of, subtree_ids
+from .metrics import observe_io
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+ROW_BATCH = 500
+
+# orden de las entradas: por carpeta y nombre (índice uq_files_folder_name), id como desempate
+FILE_ORDER = Keyset("export", [(File.folder_id, ASC), (File.name, ASC), (File.id, ASC)])
+
+
+class _Sink:
+    """Write-only target for ZipFile; no tell()/seek(), so zipfile streams."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def safe_component(name: str) -> str:
+    # los nombres son del usuario: nada de separadores ni "..", que no escapen del zip
+    name = name.replace("/", "_").replace("\\", "_").strip()
+    return name if name not in ("", ".", "..") else "_"
+
+
+def _date_time(dt: datetime | None):
+    if dt is None or dt.year < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    return dt.timetuple()[:6]
+
+
+def folder_paths(db, folder_id: int, top: str) -> dict[int, str]:
+    """{folder_id: archive path} for folder_id and its descendants (one path-prefix query)."""
+    rid, prefix = path_of(db, folder_id)
+    paths: dict[int, str] = {}
+    rows = db.execute(
+        select(Folder.id, Folder.parent_id, Folder.name)
+        .where(Folder.dataroom_id == rid, under(prefix))
+        .order_by(Folder.path)
+    )
+    # orden por ruta: los padres llegan antes que sus hijos
+    for fid, parent_id, name in rows:
+        paths[fid] = safe_component(top) if fid == folder_id else f"{paths[parent_id]}/{safe_component(name)}"
+    return paths
+
+
+def stream_zip(dataroom_id: int, folder_id: int, top: str):
+    """Generator of ZIP bytes for folder_id's subtree; the top directory is named `top`."""
+    for data in _zip_chunks(dataroom_id, folder_id, top):
+        if data:
+            yield data
+
+
+def _file_batches(subtree):
+    """File rows under subtree (a SELECT of folder ids) in FILE_ORDER, one short session per batch."""
+    last = None
+    while True:
+        stmt = FILE_ORDER.order_by(
+            select(
+                File.id, File.folder_id, File.name, File.stored_name,
+                File.size_bytes, File.updated_at, File.created_at,
+            ).where(File.folder_id.in_(subtree))
+        )
+        if last is not None:
+            stmt = stmt.where(FILE_ORDER.after(last))
+        with read_session() as db:
+            batch = db.execute(stmt.limit(ROW_BATCH)).all()
+        yield batch
+        if len(batch) < ROW_BATCH:
+            return
+        last = [getattr(batch[-1], a) for a in FILE_ORDER.attrs]
+
+
+def _zip_chunks(dataroom_id: int, folder_id: int, top: str):
+    sink = _Sink()
+    with read_session() as db:
+        paths = folder_paths(db, folder_id, top)
+        subtree = subtree_ids(db, folder_id)
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        # carpetas vacías también viajan
+        for path in paths.values():
+            zf.writestr(zipfile.ZipInfo(path + "/", date_time=(1980, 1, 1, 0, 0, 0)), b"")
+        yield sink.drain()
+
+        current_folder, used = None, set()
+        # los bytes se envían sin sesión abierta: sólo cada lote de filas usa una conexión
+        for batch in _file_batches(subtree):
+            for row in batch:
+                if row.folder_id not in paths:
+                    # carpeta creada después de armar el mapa de rutas
+                    continue
+                if row.folder_id != current_folder:
+                    # nombres repetidos sólo pueden chocar dentro de la misma carpeta
+                    current_folder, used = row.folder_id, set()
+                disk_path = file_disk_path(dataroom_id, row.folder_id, row.stored_name)
+                if not os.path.exists(disk_path):
+                    log.warning("export: missing %s", disk_path)
+                    continue
+                entry = base = safe_component(row.name)
+                stem, dot, ext = base.rpartition(".")
+                i = 1
+                while entry in used:
+                    entry = f"{stem} ({i}).{ext}" if dot else f"{base} ({i})"
+                    i += 1
+                used.add(entry)
+
+                zinfo = zipfile.ZipInfo(
+                    f"{paths[row.folder_id]}/{entry}", date_time=_date_time(row.updated_at or row.created_at)
+                )
+                zinfo.compress_type = zipfile.ZIP_STORED
+                # tamaño conocido de antemano: zipfile decide zip64 antes de escribir
+                zinfo.file_size = row.size_bytes
+                io_seconds = 0.0
+                with open(disk_path, "rb") as src, zf.open(zinfo, mode="w") as dst:
+                    while True:
+                        t0 = time.perf_counter()
+                        chunk = src.read(CHUNK_SIZE)
+                        io_seconds += time.perf_counter() - t0
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield sink.drain()
+                observe_io("export_read", io_seconds, row.size_bytes)
+                yield sink.drain()
+    # directorio central
+    yield sink.drain()
@@ -0,0 +1,116 @@
+"""Blob store reference counting and the orphan GC (services/blobs.py)."""
+import io
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select, update
+from backend.db import session
+from backend.models import Blob, File
+from backend.services.blobs import store, stage_pdf_stream, collect_orphans, blob_relpath
+from backend.config import UPLOAD_DIR
+
+
+def blob_row(checksum: str):
+    with session() as db:
+        return db.execute(
+            select(Blob.refcount, Blob.orphaned_at).where(Blob.checksum_sha256 == checksum)
+        ).first()
+
+
+def blob_on_disk(checksum: str) -> bool:
+    return os.path.exists(os.path.join(UPLOAD_DIR, blob_relpath(checksum)))
+
+
+def checksum_of(file_id: int) -> str:
+    with session() as db:
+        return db.get(File, file_id).checksum_sha256
+
+
+def age_orphan(checksum: str, minutes: int = 120) -> None:
+    with session() as db:
+        db.execute(
+            update(Blob)
+            .where(Blob.checksum_sha256 == checksum)
+            .values(orphaned_at=datetime.now(timezone.utc) - timedelta(minutes=minutes))
+        )
+
+
+def test_same_content_shares_one_blob(room, upload, pdf):
+    body = pdf("shared")
+    a = upload(room["root_folder_id"], "a.pdf", body)
+    b = upload(room["root_folder_id"], "b.pdf", body)
+    checksum = checksum_of(a["id"])
+    assert checksum_of(b["id"]) == checksum
+    with session() as db:
+        names = set(db.execute(select(File.stored_name).where(File.id.in_([a["id"], b["id"]]))).scalars())
+    assert names == {blob_relpath(checksum)}
+    assert blob_row(checksum) == (2, None)
+    assert blob_on_disk(checksum)
+
+
+def test_delete_releases_and_gc_waits_for_grace(client, auth, room, upload, pdf):
+    body = pdf("released")
+    a = upload(room["root_folder_id"], "a.pdf", body)
+    b = upload(room["root_folder_id"], "b.pdf", body)
+    checksum = checksum_of(a["id"])
+
+    assert client.delete(f"/api/files/{a['id']}", headers=auth).status_code == 200
+    assert blob_row(checksum) == (1, None)
+    assert client.delete(f"/api/files/{b['id']}", headers=auth).status_code == 200
+    refcount, orphaned_at = blob_row(checksum)
+    assert refcount == 0 and orphaned_at is not None
+
+    # recién huérfano: dentro del período de gracia no se toca
+    collect_orphans(grace_minutes=60)
+    assert blob_row(checksum) is not None and blob_on_disk(checksum)
+
+    age_orphan(checksum)
+    assert collect_orphans(grace_minutes=60) >= 1
+    assert blob_row(checksum) is None
+    assert not blob_on_disk(checksum)
+
+
+def test_reupload_revives_an_aged_orphan(client, auth, room, upload, pdf):
+    body = pdf("revived")
+    doomed = upload(room["root_folder_id"], "a.pdf", body)
+    checksum = checksum_of(doomed["id"])
+    assert client.delete(f"/api/files/{doomed['id']}", headers=auth).status_code == 200
+    age_orphan(checksum)
+
+    again = upload(room["root_folder_id"], "a.pdf", body)
+    assert checksum_of(again["id"]) == checksum
+    assert blob_row(checksum) == (1, None)
+
+    collect_orphans(grace_minutes=0)
+    assert blob_row(checksum) == (1, None)
+    assert blob_on_disk(checksum)
+    assert client.get(f"/api/files/{again['id']}/stream", headers=auth).data == body
+
+
+def test_failed_upload_leaves_the_blob_orphaned(pdf):
+    body = pdf("rolled back")
+    staged = stage_pdf_stream(io.BytesIO(body))
+
+    with pytest.raises(RuntimeError):
+        with session() as db:
+            store(db, [staged])
+            # la transacción que iba a crear el File falla después de mover los bytes
+            raise RuntimeError("insert failed")
+
+    refcount, orphaned_at = blob_row(staged.checksum)
+    assert refcount == 0 and orphaned_at is not None
+    assert blob_on_disk(staged.checksum)
+
+    collect_orphans(grace_minutes=0)
+    assert blob_row(staged.checksum) is None
+    assert not blob_on_disk(staged.checksum)
+
+
+def test_copy_adds_a_reference(client, auth, room, upload, pdf):
+    src = upload(room["root_folder_id"], "a.pdf", pdf("copied"))
+    dest = client.post(
+        f"/api/datarooms/{room['id']}/folders", json={"name": "Dest", "parent_id": room["root_folder_id"]}, headers=auth
+    ).get_json()
+    res = client.post(f"/api/files/{src['id']}/copy", json={"folder_id": dest["id"]}, headers=auth)
+    assert res.status_code == 201, res.get_json()
+    assert blob_row(checksum_of(src["id"])) == (2, None)
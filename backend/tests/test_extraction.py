@@ -0,0 +1,37 @@
+"""The extraction worker when a PDF kills its pool process (services/extraction.py)."""
+import os
+import time
+from sqlalchemy import delete, select
+from backend.db import session
+from backend.models import ExtractionJob, File, FileText
+from backend.services import extraction
+
+CRASHES = set()  # stored_name de los PDFs que matan al proceso hijo
+
+
+def crashing_extract(path: str):
+    # corre en el hijo (fork); los cuerpos del fixture pdf no son PDFs reales para pdfminer,
+    # así que los demás devuelven un texto fijo y siguen en vuelo cuando éste muere
+    if os.path.basename(path) in CRASHES:
+        time.sleep(0.2)
+        os._exit(1)
+    time.sleep(0.5)
+    return ["extracted"], 0.5
+
+
+def test_pool_crash_fails_only_the_job_that_caused_it(client, auth, room, upload, pdf, monkeypatch):
+    files = [upload(room["root_folder_id"], f"{i}.pdf", pdf(f"doc {i}"))["id"] for i in range(3)]
+    with session() as db:
+        CRASHES.add(os.path.basename(db.get(File, files[0]).stored_name))
+        # los de otros tests no entran en el lote
+        db.execute(delete(ExtractionJob).where(ExtractionJob.file_id.not_in(files)))
+    monkeypatch.setattr(extraction, "_extract", crashing_extract)
+
+    extraction.run_worker(concurrency=2, once=True)
+
+    with session() as db:
+        status = dict(db.execute(select(FileText.file_id, FileText.status).where(FileText.file_id.in_(files))).all())
+        jobs = db.execute(select(ExtractionJob.file_id, ExtractionJob.status, ExtractionJob.attempts)).all()
+    assert status == {files[0]: "failed", files[1]: "done", files[2]: "done"}
+    # cada reclamo del culpable cuenta uno; los demás terminaron en el primero
+    assert jobs == [(files[0], "failed", extraction.EXTRACTION_MAX_ATTEMPTS)]
@@ -0,0 +1,45 @@
+"""Access to the Prometheus exposition (controllers/metrics.py, services/metrics.py)."""
+import urllib.error
+import urllib.request
+import pytest
+from backend.services import metrics
+
+
+def test_metrics_route_is_off_without_a_token(client, auth):
+    # sin METRICS_TOKEN no se registra, ni siquiera para usuarios autenticados
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers=auth).status_code == 404
+
+
+def test_token_ok_needs_a_configured_token(monkeypatch):
+    assert not metrics.token_ok("Bearer ")
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+    assert metrics.token_ok("Bearer s3cret")
+    assert not metrics.token_ok("Bearer wrong")
+    assert not metrics.token_ok("Bearer sécret")
+    assert not metrics.token_ok(None)
+
+
+@pytest.fixture
+def worker_server():
+    server = metrics.serve(0, host="127.0.0.1")
+    yield f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url: str, token: str | None = None) -> int:
+    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"} if token else {})
+    try:
+        with urllib.request.urlopen(req) as res:
+            return res.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_worker_server_requires_the_token(worker_server, monkeypatch):
+    assert get(worker_server) == 401
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+    assert get(worker_server) == 401
+    assert get(worker_server, "wrong") == 401
+    assert get(worker_server, "s3cret") == 200
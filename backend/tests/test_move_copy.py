@@ -0,0 +1,103 @@
+"""Folder moves, copies and deletes, and the subtree totals they keep (services/move_copy.py, folder_stats.py)."""
+import pytest
+from sqlalchemy import select
+from backend.db import session
+from backend.models import File, Folder
+from backend.services import move_copy
+from backend.services.deletion import delete_folder_tree
+from backend.services.folder_stats import remove_subtree
+
+
+def make_folder(client, auth, room, parent_id: int, name: str) -> int:
+    res = client.post(f"/api/datarooms/{room['id']}/folders", json={"name": name, "parent_id": parent_id}, headers=auth)
+    return res.get_json()["id"]
+
+
+def tree(folder_id: int) -> dict:
+    """{relative folder path: sorted file names} under folder_id, by names."""
+    with session() as db:
+        top = db.get(Folder, folder_id)
+        folders = db.execute(
+            select(Folder.id, Folder.name, Folder.parent_id).where(Folder.path.startswith(top.path))
+        ).all()
+        files = db.execute(select(File.folder_id, File.name).where(File.folder_id.in_([f.id for f in folders]))).all()
+    by_id = {f.id: f for f in folders}
+
+    def rel(fid):
+        return "" if fid == folder_id else f"{rel(by_id[fid].parent_id)}/{by_id[fid].name}"
+
+    out = {rel(f.id): [] for f in folders}
+    for folder, name in files:
+        out[rel(folder)].append(name)
+    return {k: sorted(v) for k, v in out.items()}
+
+
+@pytest.fixture
+def gapped_ids(monkeypatch):
+    # Postgres: nextval por fila, los ids nuevos pueden no ser consecutivos
+    reserve = move_copy.reserve_ids
+
+    def spaced(db, model, n):
+        ids = reserve(db, model, 3 * n)
+        return ids[::3]
+
+    monkeypatch.setattr(move_copy, "reserve_ids", spaced)
+
+
+@pytest.mark.parametrize("into_itself", [False, True])
+def test_copy_maps_files_onto_their_folder_copies(client, auth, room, upload, pdf, gapped_ids, into_itself):
+    root = room["root_folder_id"]
+    src = make_folder(client, auth, room, root, "Src")
+    a = make_folder(client, auth, room, src, "A")
+    b = make_folder(client, auth, room, a, "B")
+    c = make_folder(client, auth, room, src, "C")
+    for fid, name in [(src, "top.pdf"), (a, "a.pdf"), (b, "b1.pdf"), (b, "b2.pdf"), (c, "c.pdf")]:
+        upload(fid, name, pdf(name))
+    before = tree(src)
+
+    dest = b if into_itself else make_folder(client, auth, room, root, "Dest")
+    res = client.post(f"/api/folders/{src}/copy", json={"parent_id": dest}, headers=auth)
+    assert res.status_code == 201, res.get_json()
+    copy = res.get_json()
+    assert (copy["folders"], copy["files"]) == (4, 5)
+
+    assert tree(copy["id"]) == before
+    if into_itself:
+        # el original sólo gana la copia dentro de B
+        assert {k: v for k, v in tree(src).items() if not k.startswith("/A/B/Src")} == before
+    with session() as db:
+        stats = db.execute(select(Folder.files_total).where(Folder.id.in_([root, copy["id"]]))).scalars().all()
+    assert sorted(stats) == [5, 10]
+
+
+def totals(folder_id: int) -> tuple[int, int]:
+    with session() as db:
+        f = db.get(Folder, folder_id)
+        return f.files_total, f.bytes_total
+
+
+@pytest.mark.parametrize("action", ["delete", "move"])
+def test_subtree_totals_include_uploads_after_load(client, auth, room, upload, pdf, action):
+    root = room["root_folder_id"]
+    sub = make_folder(client, auth, room, root, "Sub")
+    inner = make_folder(client, auth, room, sub, "Inner")
+    dest = make_folder(client, auth, room, root, "Dest")
+    upload(inner, "a.pdf", pdf("a"))
+
+    with session() as db:
+        folder = db.get(Folder, sub)
+        assert folder.files_total == 1
+        # otra petición sube al subárbol después de que éste cargó la carpeta
+        late = upload(inner, "b.pdf", pdf("late"))
+        if action == "delete":
+            remove_subtree(db, folder)
+            delete_folder_tree(db, sub, room["id"])
+        else:
+            move_copy.move_folder(db, folder, db.get(Folder, dest))
+        db.commit()
+
+    if action == "delete":
+        assert totals(root) == (0, 0)
+    else:
+        assert totals(dest) == (2, len(pdf("a")) + late["size_bytes"])
+        assert totals(root) == totals(dest)
@@ -0,0 +1,143 @@
+"""Sibling name resolution and ``claim`` under a unique-index conflict (services/names.py)."""
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend import db as db_module
+from backend.db import session
+from backend.models import File, Folder
+from backend.services import names
+from backend.services.names import claim, files_in, free_name, next_collision_name
+
+
+def make_file(folder_id: int, name: str) -> File:
+    return File(
+        folder_id=folder_id, name=name, stored_name="blobs/test.pdf", mime_type="application/pdf",
+        size_bytes=1, checksum_sha256="0" * 64,
+    )
+
+
+def names_in(folder_id: int) -> list[str]:
+    with session() as db:
+        return sorted(db.execute(select(File.name).where(File.folder_id == folder_id)).scalars())
+
+
+def folder_exists(folder_id: int) -> bool:
+    with session() as db:
+        return db.get(Folder, folder_id) is not None
+
+
+@pytest.fixture
+def folder(room):
+    with session() as db:
+        db.add(make_file(room["root_folder_id"], "a.pdf"))
+        db.add(make_file(room["root_folder_id"], "a (x).pdf"))
+    return room
+
+
+@pytest.fixture
+def savepoint_db(monkeypatch):
+    """
+    A session with working savepoints (pysqlite's documented hooks) and
+    claim() on its savepoint path, as on Postgres.
+    """
+    eng = create_engine(db_module.engine.url)
+
+    @event.listens_for(eng, "connect")
+    def _connect(dbapi_conn, _):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(eng, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    monkeypatch.setattr(names, "engine", SimpleNamespace(dialect=SimpleNamespace(name="postgresql")))
+    db = Session(eng)
+    yield db
+    db.close()
+    eng.dispose()
+
+
+def pending_folder(db, room) -> int:
+    # escritura previa del llamador en la misma transacción
+    f = Folder(name="pending", dataroom_id=room["id"], parent_id=room["root_folder_id"])
+    db.add(f)
+    db.flush()
+    return f.id
+
+
+def test_next_collision_name_skips_taken_variants():
+    assert next_collision_name("a.pdf", set()) == "a.pdf"
+    assert next_collision_name("a.pdf", {"a.pdf", "a (1).pdf", "a (3).pdf"}) == "a (2).pdf"
+    assert next_collision_name("notes", {"notes"}) == "notes (1)"
+
+
+def test_free_name_ignores_lookalikes(folder):
+    with session() as db:
+        assert free_name(db, files_in(folder["root_folder_id"]), "a.pdf") == "a (1).pdf"
+        assert free_name(db, files_in(folder["root_folder_id"]), "b.pdf") == "b.pdf"
+
+
+def test_sqlite_claim_propagates_and_commits_nothing(folder):
+    root = folder["root_folder_id"]
+    calls = []
+
+    def write():
+        calls.append(1)
+        # nombre ya tomado sin resolver: el índice único lo rechaza
+        db.add(make_file(root, "a.pdf"))
+        db.flush()
+
+    with session() as db:
+        fid = pending_folder(db, folder)
+        with pytest.raises(IntegrityError):
+            claim(db, write)
+        db.rollback()
+
+    assert calls == [1]
+    assert not folder_exists(fid)
+    assert names_in(root) == ["a (x).pdf", "a.pdf"]
+
+
+def test_savepoint_claim_retries_after_conflict(folder, savepoint_db):
+    db = savepoint_db
+    root = folder["root_folder_id"]
+    calls = []
+
+    def write():
+        calls.append(1)
+        # el primer intento pierde la carrera: otro escritor ya tomó el nombre
+        name = "a.pdf" if len(calls) == 1 else free_name(db, files_in(root), "a.pdf")
+        f = make_file(root, name)
+        db.add(f)
+        db.flush()
+        return f.name
+
+    fid = pending_folder(db, folder)
+    assert claim(db, write) == "a (1).pdf"
+    assert len(calls) == 2
+    # el rollback al savepoint no deshizo lo anterior ni confirmó la transacción
+    assert not folder_exists(fid)
+    db.commit()
+    assert folder_exists(fid)
+    assert names_in(root) == ["a (1).pdf", "a (x).pdf", "a.pdf"]
+
+
+def test_savepoint_claim_gives_up_after_attempts(folder, savepoint_db):
+    db = savepoint_db
+    root = folder["root_folder_id"]
+    calls = []
+
+    def write():
+        calls.append(1)
+        db.add(make_file(root, "a.pdf"))
+        db.flush()
+
+    fid = pending_folder(db, folder)
+    with pytest.raises(IntegrityError):
+        claim(db, write, attempts=3)
+    assert len(calls) == 3
+    db.rollback()
+    assert not folder_exists(fid)
+    assert names_in(root) == ["a (x).pdf", "a.pdf"]
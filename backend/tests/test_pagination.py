@@ -0,0 +1,113 @@
+"""Keyset cursors (utils/pagination.py): every sort walks its listing once, in order, across pages."""
+import pytest
+from sqlalchemy import select, update, literal, String
+from backend.db import session
+from backend.models import Dataroom, Folder, File
+from backend.utils.pagination import ASC, DESC
+from backend.controllers.datarooms import ROOM_SORTS
+from backend.controllers.folders import FILE_SORTS, FOLDER_SORTS
+
+# texto tal como lo guarda SQLite: CURRENT_TIMESTAMP sin fracción y, en filas antiguas, con microsegundos;
+# con empates para que la paginación dependa del desempate por id
+STAMPS = [
+    "2026-01-01 12:00:00", "2026-01-01 12:00:00", "2026-01-01 12:00:00.500000",
+    "2026-01-01 12:00:01", "2026-01-01 12:00:00", "2026-01-02 12:00:00",
+]
+ORDERS = [None, ASC, DESC]
+
+
+def restamp(model, ids: list[int], *columns) -> None:
+    with session() as db:
+        for i, row_id in enumerate(ids):
+            stamp = literal(STAMPS[i % len(STAMPS)], String)
+            db.execute(update(model).where(model.id == row_id).values({c: stamp for c in columns}))
+
+
+def expected(model, column, direction: str, *criteria) -> list[int]:
+    """Ids ordered by (column, id) computed in Python from the stored values."""
+    with session() as db:
+        rows = db.execute(select(model.id, column).where(*criteria)).all()
+    return [r.id for r in sorted(rows, key=lambda r: (r[1], r.id), reverse=direction == DESC)]
+
+
+def walk(client, auth, url: str, params: dict, items: str, cursor_param: str, next_key: str) -> list[int]:
+    ids, cursor = [], None
+    for _ in range(50):
+        res = client.get(url, query_string={**params, **({cursor_param: cursor} if cursor else {})}, headers=auth)
+        assert res.status_code == 200, res.get_json()
+        body = res.get_json()
+        ids += [x["id"] for x in body[items]]
+        cursor = body[next_key]
+        if cursor is None:
+            return ids
+    pytest.fail("pagination did not terminate")
+
+
+@pytest.fixture
+def listing(client, auth, room, upload, pdf):
+    root = room["root_folder_id"]
+    # nombres con mayúsculas y sufijos; tamaños repetidos
+    specs = [("b.pdf", 300), ("B.pdf", 300), ("a (1).pdf", 500), ("a.pdf", 100), ("c.pdf", 300), ("a (2).pdf", 900), ("Z.pdf", 100)]
+    file_ids = [upload(root, name, pdf(name, size))["id"] for name, size in specs]
+    restamp(File, file_ids, "created_at")
+    restamp(File, file_ids[::-1], "updated_at")
+    # un rename escribe updated_at con el reloj de la base
+    assert client.put(f"/api/files/{file_ids[0]}", json={"name": "renamed.pdf"}, headers=auth).status_code == 200
+    folder_ids = [
+        client.post(f"/api/datarooms/{room['id']}/folders", json={"name": n, "parent_id": root}, headers=auth).get_json()["id"]
+        for n in ["beta", "Alpha", "alpha", "gamma", "beta 2"]
+    ]
+    restamp(Folder, folder_ids, "created_at")
+    return root
+
+
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("sort", list(FILE_SORTS))
+def test_file_sorts_round_trip(client, auth, listing, sort, order):
+    column, default = FILE_SORTS[sort]
+    params = {"sort": sort, "limit_files": 2, "limit_folders": 1}
+    if order:
+        params["order"] = order
+    got = walk(client, auth, f"/api/folders/{listing}/children", params, "files", "cursor_files", "next_cursor_files")
+    assert got == expected(File, column, order or default, File.folder_id == listing)
+
+
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("sort", list(FOLDER_SORTS))
+def test_folder_sorts_round_trip(client, auth, listing, sort, order):
+    column, default = FOLDER_SORTS[sort]
+    params = {"sort_folders": sort, "limit_folders": 2, "limit_files": 1}
+    if order:
+        params["order_folders"] = order
+    got = walk(client, auth, f"/api/folders/{listing}/children", params, "folders", "cursor_folders", "next_cursor_folders")
+    assert got == expected(Folder, column, order or default, Folder.parent_id == listing)
+
+
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("sort", list(ROOM_SORTS))
+def test_room_sorts_round_trip(client, auth, room, sort, order):
+    ids = [room["id"]] + [
+        client.post("/api/datarooms", json={"name": n}, headers=auth).get_json()["id"]
+        for n in ["beta", "Alpha", "alpha", "Room", "gamma"]
+    ]
+    restamp(Dataroom, ids, "created_at")
+    column, default = ROOM_SORTS[sort]
+    params = {"sort": sort, "limit": 2}
+    if order:
+        params["order"] = order
+    got = walk(client, auth, "/api/datarooms", params, "items", "cursor", "next_cursor")
+    assert got == expected(Dataroom, column, order or default, Dataroom.id.in_(ids))
+
+
+def test_cursor_is_bound_to_its_sort(client, auth, listing):
+    url = f"/api/folders/{listing}/children"
+    first = client.get(url, query_string={"sort": "name", "limit_files": 2}, headers=auth).get_json()
+    cursor = first["next_cursor_files"]
+    assert cursor
+    for params in ({"sort": "size"}, {"sort": "name", "order": DESC}):
+        res = client.get(url, query_string={**params, "cursor_files": cursor}, headers=auth)
+        assert res.status_code == 400
+    payload, sig = cursor.split(".", 1)
+    tampered = payload[:-1] + ("A" if payload[-1] != "A" else "B") + "." + sig
+    res = client.get(url, query_string={"sort": "name", "cursor_files": tampered}, headers=auth)
+    assert res.status_code == 400
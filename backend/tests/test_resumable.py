@@ -0,0 +1,124 @@
+"""Resumable uploads (controllers/uploads.py, services/resumable.py) with chunks sent out of order."""
+import os
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from backend.controllers import uploads as uploads_controller
+from backend.db import session
+from backend.models import Blob, File, UploadSession
+from backend.services.resumable import CHUNK_BYTES, data_path, claim, collect_expired_uploads
+
+
+def start_upload(client, auth, folder_id: int, filename: str, size: int) -> dict:
+    res = client.post(f"/api/folders/{folder_id}/uploads", json={"filename": filename, "size_bytes": size}, headers=auth)
+    assert res.status_code == 201, res.get_json()
+    return res.get_json()
+
+
+def put_chunk(client, auth, sid: str, body: bytes, start: int, length: int | None = None):
+    chunk = body[start:start + (length or CHUNK_BYTES)]
+    return client.put(
+        f"/api/uploads/{sid}/chunks/{start}", data=chunk, headers=auth, content_type="application/octet-stream"
+    )
+
+
+def test_chunks_out_of_order_assemble_the_file(client, auth, room, pdf):
+    # dos chunks completos y uno corto al final
+    body = pdf("resumable", 2 * CHUNK_BYTES + 12345)
+    up = start_upload(client, auth, room["root_folder_id"], "big.pdf", len(body))
+    sid = up["id"]
+    starts = [0, CHUNK_BYTES, 2 * CHUNK_BYTES]
+    assert up["chunk_size"] == CHUNK_BYTES and up["missing"] == starts
+
+    for start in (2 * CHUNK_BYTES, 0, 0):  # el último primero y uno repetido
+        res = put_chunk(client, auth, sid, body, start)
+        assert res.status_code == 200, res.get_json()
+
+    status = client.get(f"/api/uploads/{sid}", headers=auth).get_json()
+    assert status["missing"] == [CHUNK_BYTES]
+    assert status["received_bytes"] == len(body) - CHUNK_BYTES
+
+    res = client.post(f"/api/uploads/{sid}/complete", headers=auth)
+    assert res.status_code == 409 and res.get_json()["missing"] == [CHUNK_BYTES]
+
+    assert put_chunk(client, auth, sid, body, CHUNK_BYTES).status_code == 200
+    res = client.post(f"/api/uploads/{sid}/complete", headers=auth)
+    assert res.status_code == 201, res.get_json()
+    created = res.get_json()
+    assert created["name"] == "big.pdf" and created["size_bytes"] == len(body)
+
+    assert client.get(f"/api/files/{created['id']}/stream", headers=auth).data == body
+    with session() as db:
+        checksum = db.get(File, created["id"]).checksum_sha256
+        assert db.execute(select(Blob.refcount).where(Blob.checksum_sha256 == checksum)).scalar() == 1
+    # la sesión y su archivo de datos ya no existen
+    assert client.get(f"/api/uploads/{sid}", headers=auth).status_code == 404
+    assert not os.path.exists(data_path(sid))
+
+
+def test_chunk_must_match_its_boundary(client, auth, room, pdf):
+    body = pdf("bounds", CHUNK_BYTES + 10)
+    sid = start_upload(client, auth, room["root_folder_id"], "b.pdf", len(body))["id"]
+
+    res = put_chunk(client, auth, sid, body, 1)
+    assert res.status_code == 400
+    # el último chunk mide exactamente lo que queda
+    res = put_chunk(client, auth, sid, body, CHUNK_BYTES, length=5)
+    assert res.status_code == 400 and res.get_json()["expected"] == len(body) - CHUNK_BYTES
+    assert client.get(f"/api/uploads/{sid}", headers=auth).get_json()["received_bytes"] == 0
+
+
+def test_assembled_non_pdf_is_rejected_and_dropped(client, auth, room):
+    body = b"not a pdf" + b"0" * (CHUNK_BYTES + 1)
+    sid = start_upload(client, auth, room["root_folder_id"], "fake.pdf", len(body))["id"]
+    for start in (CHUNK_BYTES, 0):
+        assert put_chunk(client, auth, sid, body, start).status_code == 200
+
+    res = client.post(f"/api/uploads/{sid}/complete", headers=auth)
+    assert res.status_code == 400
+    assert client.get(f"/api/uploads/{sid}", headers=auth).status_code == 404
+    assert not os.path.exists(data_path(sid))
+
+
+@pytest.fixture
+def ready_upload(client, auth, room, pdf):
+    """An upload with every chunk received, not completed yet: (sid, body)."""
+    body = pdf("retry", CHUNK_BYTES + 100)
+    sid = start_upload(client, auth, room["root_folder_id"], "retry.pdf", len(body))["id"]
+    for start in (CHUNK_BYTES, 0):
+        assert put_chunk(client, auth, sid, body, start).status_code == 200
+    return sid, body
+
+
+@pytest.mark.parametrize("step", ["hash_pdf_file", "create_uploaded_file"])
+def test_failed_complete_reopens_the_session(client, auth, ready_upload, monkeypatch, step):
+    sid, body = ready_upload
+
+    def fail(*args, **kwargs):
+        raise OSError("disk error")
+
+    monkeypatch.setattr(uploads_controller, step, fail)
+    assert client.post(f"/api/uploads/{sid}/complete", headers=auth).status_code == 500
+    status = client.get(f"/api/uploads/{sid}", headers=auth).get_json()
+    assert status["status"] == "open" and status["missing"] == []
+    assert os.path.exists(data_path(sid))
+
+    monkeypatch.undo()
+    res = client.post(f"/api/uploads/{sid}/complete", headers=auth)
+    assert res.status_code == 201, res.get_json()
+    assert client.get(f"/api/files/{res.get_json()['id']}/stream", headers=auth).data == body
+
+
+def test_assembling_session_outlives_its_old_expiry(ready_upload):
+    sid, _ = ready_upload
+    # a punto de expirar cuando empieza el ensamblado
+    soon = datetime.utcnow() + timedelta(seconds=30)
+    with session() as db:
+        db.execute(update(UploadSession).where(UploadSession.id == sid).values(expires_at=soon))
+    with session() as db:
+        assert claim(db, sid)
+    with session() as db:
+        assert db.get(UploadSession, sid).expires_at > soon + timedelta(hours=1)
+
+    collect_expired_uploads()
+    assert os.path.exists(data_path(sid))
@@ -0,0 +1,24 @@
+"""Metadata search and its per-owner result cache (controllers/search.py, services/search_cache.py)."""
+
+
+def folder_facet(client, auth) -> list[dict]:
+    res = client.get("/api/search/meta", query_string={"name": "report", "facets": 1}, headers=auth)
+    assert res.status_code == 200, res.get_json()
+    return res.get_json()["facets"]["folder"]
+
+
+def test_folder_rename_refreshes_cached_facets(client, auth, room, upload, pdf):
+    sub = client.post(
+        f"/api/datarooms/{room['id']}/folders", json={"name": "Sub", "parent_id": room["root_folder_id"]}, headers=auth
+    ).get_json()
+    upload(sub["id"], "report.pdf", pdf("facets"))
+    assert [b["name"] for b in folder_facet(client, auth)] == ["Sub"]
+
+    res = client.put(f"/api/folders/{sub['id']}", json={"name": "Renamed"}, headers=auth)
+    assert res.status_code == 200, res.get_json()
+    assert folder_facet(client, auth) == [{"folder_id": sub["id"], "name": "Renamed", "count": 1}]
+
+
+def test_cache_stats_are_not_on_the_user_api(client, auth):
+    # contadores de todo el proceso (todos los dueños): sólo en /metrics
+    assert client.get("/api/search/cache/stats", headers=auth).status_code == 404
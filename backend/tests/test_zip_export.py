@@ -0,0 +1,48 @@
+"""Streaming ZIP export (services/zip_export.py)."""
+import io
+import zipfile
+from backend.db import engine
+from backend.services import zip_export
+
+
+def make_folder(client, auth, room, parent_id: int, name: str) -> int:
+    res = client.post(f"/api/datarooms/{room['id']}/folders", json={"name": name, "parent_id": parent_id}, headers=auth)
+    return res.get_json()["id"]
+
+
+def test_export_batches_rows_without_holding_a_connection(client, auth, room, upload, pdf, monkeypatch):
+    monkeypatch.setattr(zip_export, "ROW_BATCH", 2)
+    root = room["root_folder_id"]
+    docs = make_folder(client, auth, room, root, "Docs")
+    make_folder(client, auth, room, docs, "Empty")
+    bodies = {}
+    # "a/b.pdf" y "a_b.pdf" dan la misma entrada: la segunda se renombra aunque caiga en otro lote
+    for fid, name in [(root, "top.pdf"), (docs, "a_b.pdf"), (docs, "a/b.pdf"), (docs, "c.pdf"), (docs, "d.pdf")]:
+        bodies[(fid, name)] = pdf(name)
+        upload(fid, name, bodies[(fid, name)])
+
+    out = io.BytesIO()
+    for chunk in zip_export.stream_zip(room["id"], root, "Room"):
+        # el consumidor lento no retiene ninguna conexión del pool
+        assert engine.pool.checkedout() == 0
+        out.write(chunk)
+
+    with zipfile.ZipFile(out) as zf:
+        assert sorted(zf.namelist()) == [
+            "Room/", "Room/Docs/", "Room/Docs/Empty/",
+            "Room/Docs/a_b (1).pdf", "Room/Docs/a_b.pdf", "Room/Docs/c.pdf", "Room/Docs/d.pdf",
+            "Room/top.pdf",
+        ]
+        assert zf.read("Room/top.pdf") == bodies[(root, "top.pdf")]
+        assert zf.read("Room/Docs/d.pdf") == bodies[(docs, "d.pdf")]
+        pair = {zf.read("Room/Docs/a_b.pdf"), zf.read("Room/Docs/a_b (1).pdf")}
+        assert pair == {bodies[(docs, "a_b.pdf")], bodies[(docs, "a/b.pdf")]}
+
+
+def test_export_route_streams_the_folder(client, auth, room, upload, pdf):
+    body = pdf("exported")
+    upload(room["root_folder_id"], "x.pdf", body)
+    res = client.get(f"/api/folders/{room['root_folder_id']}/export", headers=auth)
+    assert res.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(res.data)) as zf:
+        assert zf.read("root/x.pdf") == body
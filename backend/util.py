@@ -12,25 +12,6 @@ def is_pdf(file_storage) -> bool:
     return head.startswith(PDF_MAGIC)
 
 
-_name_suffix_re = re.compile(r"^(.*?)( \((\d+)\))?(\.[^.]*)?$")
-
-
-def next_collision_name(name: str, taken: set[str]) -> str:
-    base, num, ext = None, None, None
-    m = _name_suffix_re.match(name)
-    if m:
-        base = (m.group(1) or "").strip()
-        num = int(m.group(3) or 0)
-        ext = m.group(4) or ""
-    else:
-        base, ext, num = name, "", 0
-    candidate = name
-    while candidate in taken:
-        num += 1
-        candidate = f"{base} ({num}){ext}"
-    return candidate
-
-
 def safe_original_name(filename: str) -> str:
     s = secure_filename(filename)
     return s if s else "file.pdf"
@@ -1,5 +1,29 @@
-import base64, json
+"""
+Keyset pagination with opaque, signed cursors.
+
+A Keyset is a named, ordered list of (expression, direction) whose last
+key is unique (the id), so every row has exactly one position:
+
+    BY_NAME = Keyset("name", [(File.name, ASC), (File.id, ASC)])
+    rows, next_cursor = BY_NAME.page(db, select(...).where(...), limit, cursor)
+
+Pages continue from the last row's values with a predicate the index can
+seek to, never OFFSET. Cursors carry the sort spec and an HMAC, so a
+cursor from another sort (or an edited one) is rejected with BadCursor
+instead of silently restarting. Keys must be NOT NULL columns.
+"""
+import base64, hashlib, hmac, json, os
 from datetime import datetime
+from sqlalchemy import and_, or_, tuple_, literal, String
+from ..db import engine
+
+ASC, DESC = "asc", "desc"
+
+
+class BadCursor(ValueError):
+    def __init__(self):
+        super().__init__("bad cursor")
+
 
 def _b64e(b: bytes) -> str:
     return base64.urlsafe_b64encode(b).decode().rstrip("=")
@@ -8,12 +32,102 @@ def _b64d(s: str) -> bytes:
     pad = "=" * ((4 - len(s) % 4) % 4)
     return base64.urlsafe_b64decode((s + pad).encode())
 
-def encode_cursor(dt: datetime, id_: int) -> str:
-    return _b64e(json.dumps([dt.isoformat(), id_]).encode())
+def _sign(payload: str) -> str:
+    secret = os.getenv("SECRET_KEY", "dev-secret").encode()
+    return _b64e(hmac.new(secret, payload.encode(), hashlib.sha256).digest()[:16])
+
+
+def _dump(v):
+    return {"dt": v.isoformat()} if isinstance(v, datetime) else v
+
+def _load(v):
+    return datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v
+
+
+def _bound(v):
+    if isinstance(v, datetime) and engine.dialect.name == "sqlite":
+        # SQLite guarda CURRENT_TIMESTAMP como texto "YYYY-MM-DD HH:MM:SS" y un datetime
+        # se enlaza siempre con microsegundos: comparamos contra el mismo formato
+        s = v.strftime("%Y-%m-%d %H:%M:%S")
+        if v.microsecond:
+            s += f".{v.microsecond:06d}"
+        return literal(s, String)
+    return v
+
+
+class Keyset:
+    def __init__(self, name: str, keys: list[tuple]):
+        self.name = name
+        self.keys = keys
+        # nombre de cada clave en las filas devueltas (columna o label)
+        self.attrs = [expr.key for expr, _ in keys]
+        self.spec = name + ":" + ",".join(f"{a} {d}" for a, (_, d) in zip(self.attrs, keys))
+
+    def order_by(self, stmt):
+        return stmt.order_by(*[expr.desc() if d == DESC else expr.asc() for expr, d in self.keys])
+
+    def after(self, values: list):
+        """Rows strictly after values in this order."""
+        # de un label (p. ej. score) se compara la expresión, no el alias
+        exprs = [getattr(expr, "element", expr) for expr, _ in self.keys]
+        bounds = [_bound(v) for v in values]
+        directions = {d for _, d in self.keys}
+        if len(directions) == 1:
+            # misma dirección en todas las claves: comparación de filas, un solo rango del índice
+            return tuple_(*exprs) < tuple_(*bounds) if DESC in directions else tuple_(*exprs) > tuple_(*bounds)
+
+        def past(i):
+            return exprs[i] < bounds[i] if self.keys[i][1] == DESC else exprs[i] > bounds[i]
+
+        ors = [and_(*[exprs[j] == bounds[j] for j in range(i)], past(i)) for i in range(len(exprs))]
+        # direcciones mixtas: cota sobre la primera clave para que el índice busque la posición
+        first = exprs[0] <= bounds[0] if self.keys[0][1] == DESC else exprs[0] >= bounds[0]
+        return and_(first, or_(*ors))
+
+    def encode(self, row) -> str:
+        payload = _b64e(json.dumps(
+            {"s": self.spec, "v": [_dump(getattr(row, a)) for a in self.attrs]}, separators=(",", ":")
+        ).encode())
+        return f"{payload}.{_sign(payload)}"
+
+    def decode(self, cursor: str) -> list:
+        try:
+            payload, sig = cursor.split(".", 1)
+            if not hmac.compare_digest(sig, _sign(payload)):
+                raise BadCursor()
+            data = json.loads(_b64d(payload).decode())
+            if data["s"] != self.spec or len(data["v"]) != len(self.keys):
+                raise BadCursor()
+            return [_load(v) for v in data["v"]]
+        except BadCursor:
+            raise
+        except Exception as e:
+            raise BadCursor() from e
+
+    def apply(self, stmt, cursor: str | None):
+        """Order stmt and position it after cursor (raises BadCursor)."""
+        stmt = self.order_by(stmt)
+        if cursor:
+            stmt = stmt.where(self.after(self.decode(cursor)))
+        return stmt
+
+    def page(self, db, stmt, limit: int, cursor: str | None) -> tuple[list, str | None]:
+        """(up to limit rows, cursor of the next page or None)."""
+        rows = db.execute(self.apply(stmt, cursor).limit(limit + 1)).all()
+        if len(rows) > limit:
+            return rows[:limit], self.encode(rows[limit - 1])
+        return rows, None
+
 
-def decode_cursor(s: str) -> tuple[datetime, int]:
-    try:
-        iso, id_ = json.loads(_b64d(s).decode())
-        return datetime.fromisoformat(iso), int(id_)
-    except Exception as e:
-        raise ValueError("bad cursor") from e
+def sort_keyset(options: dict, sort: str | None, order: str | None, tiebreak) -> Keyset | None:
+    """
+    Keyset for a listing's ?sort=&order= (None if invalid). options maps
+    sort names to (column, default direction); the tiebreak follows the
+    same direction, so one (scope, column, id) index serves both orders.
+    """
+    sort = sort or next(iter(options))
+    if sort not in options or order not in (None, "", ASC, DESC):
+        return None
+    column, default = options[sort]
+    d = order or default
+    return Keyset(sort, [(column, d), (tiebreak, d)])
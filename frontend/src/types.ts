@@ -20,6 +20,7 @@ export interface FileItem {
   folder_id: ID;
   size_bytes: number;
   mime_type: string;
+  text_status?: "pending" | "done" | "failed" | null;
 }
 
 export interface FolderChildren {